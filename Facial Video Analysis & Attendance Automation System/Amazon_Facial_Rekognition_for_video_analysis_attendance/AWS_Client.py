@@ -0,0 +1,161 @@
+import os
+import csv
+import threading
+import configparser
+import boto3
+from botocore.config import Config
+
+# ================= Settings =================
+# Every setting can come from an environment variable (REKOGNITION_<NAME>),
+# from the [rekognition] section of the config file, or from the defaults
+# below, in that order of precedence.
+CONFIG_FILE = os.environ.get('FACIAL_ANALYSIS_CONFIG', 'facial_video_analysis.ini')
+LEGACY_CREDENTIALS_FILE = 'facial_video_analysis_accessKeys.csv'
+
+DEFAULTS = {
+    'region': 'us-east-2',
+    'access_key_id': '',
+    'secret_access_key': '',
+    'ca_bundle': '',
+    'max_pool_connections': 32,
+    'connect_timeout': 5,
+    'read_timeout': 15,
+    'retry_mode': 'standard',  # botocore retries of clients built directly; get_client's client is retried by
+    'max_attempts': 3,         # the rate controller instead, throttle_retries times, network errors included
+    'local_detector': 'off',   # off, gate or local, see Local_Detector
+    'local_detector_model': '',  # optional YuNet .onnx model instead of the Haar cascade
+    'backend': 'aws',          # aws, or fake for the offline stand-in in Fake_Rekognition
+    'fake_latency': 'default',
+    'fake_throttle_rate': 0.0,
+    'fake_fixtures': '',
+    'fake_seed': 0,
+    'metrics': 'off',          # on to collect the stage timings and API counters served at /metrics
+    'calls_per_minute': 0,     # process wide Rekognition call ceiling, 0 for none
+    'cost_per_hour': 0.0,      # process wide estimated spend ceiling in USD, 0 for none
+    'operation_rates': '',     # per-operation calls per second, see Rate_Controller
+    'throttle_retries': 2,
+    'camera_sources': '',      # extra cameras as 'name=source@collection;...', see Multi_Camera
+    'recognition_workers': 4,  # recognition threads shared by the camera_sources
+    'local_embeddings': 'off', # on to match faces locally first, see Local_Embeddings
+    'embedding_model': '',     # SFace .onnx model; also needs local_detector_model for alignment
+    'embedding_threshold': 0.5,
+}
+
+_client = None
+_settings = None
+_lock = threading.Lock()
+
+
+def _read_config_file(path):
+    parser = configparser.ConfigParser()
+    if not parser.read(path):
+        return {}
+    if not parser.has_section('rekognition'):
+        return {}
+    return dict(parser.items('rekognition'))
+
+
+def _read_legacy_credentials(path):
+    """Read the access keys CSV downloaded from the IAM console, if present"""
+    try:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            row = next(csv.DictReader(f), None)
+    except OSError:
+        return {}
+    if not row:
+        return {}
+    return {'access_key_id': row.get('Access key ID', ''),
+            'secret_access_key': row.get('Secret access key', '')}
+
+
+def load_settings():
+    """Merge defaults, config file and environment into one settings dict"""
+    settings = dict(DEFAULTS)
+    settings.update(_read_config_file(CONFIG_FILE))
+    for name in DEFAULTS:
+        value = os.environ.get('REKOGNITION_' + name.upper())
+        if value:
+            settings[name] = value
+    if not os.environ.get('REKOGNITION_REGION'):
+        settings['region'] = os.environ.get('AWS_REGION', os.environ.get('AWS_DEFAULT_REGION', settings['region']))
+
+    # Fall back to the legacy CSV only when neither the environment nor the
+    # config file provides keys, so the normal boto3 chain (profiles,
+    # instance roles) still works when the CSV is absent.
+    if not settings['access_key_id'] and not os.environ.get('AWS_ACCESS_KEY_ID'):
+        settings.update(_read_legacy_credentials(LEGACY_CREDENTIALS_FILE))
+
+    for name in ('max_pool_connections', 'max_attempts', 'fake_seed', 'calls_per_minute', 'throttle_retries',
+                 'recognition_workers'):
+        settings[name] = int(settings[name])
+    for name in ('connect_timeout', 'read_timeout', 'fake_throttle_rate', 'cost_per_hour',
+                 'embedding_threshold'):
+        settings[name] = float(settings[name])
+    return settings
+
+
+def get_settings():
+    global _settings
+    if _settings is None:
+        with _lock:
+            if _settings is None:
+                _settings = load_settings()
+    return _settings
+
+
+def create_client(settings, max_attempts=None):
+    """Build a Rekognition client from a settings dict.
+
+    max_attempts overrides the max_attempts setting for botocore's own
+    retries; get_client passes 1 so throttles reach the rate controller.
+    """
+    if settings['backend'] == 'fake':
+        from Fake_Rekognition import FakeRekognition
+        return FakeRekognition.from_settings(settings)
+    kwargs = {
+        'region_name': settings['region'],
+        'config': Config(
+            max_pool_connections=settings['max_pool_connections'],
+            connect_timeout=settings['connect_timeout'],
+            read_timeout=settings['read_timeout'],
+            retries={'mode': settings['retry_mode'],
+                     'max_attempts': max_attempts or settings['max_attempts']},
+        ),
+    }
+    if settings['access_key_id']:
+        kwargs['aws_access_key_id'] = settings['access_key_id']
+        kwargs['aws_secret_access_key'] = settings['secret_access_key']
+    if settings['ca_bundle']:
+        kwargs['verify'] = settings['ca_bundle']
+    return boto3.client('rekognition', **kwargs)
+
+
+def get_client():
+    """Return the process wide Rekognition client, creating it on first use"""
+    global _client
+    if _client is None:
+        settings = get_settings()
+        with _lock:
+            if _client is None:
+                from Metrics import InstrumentedClient
+                from Rate_Controller import RateLimitedClient, rate_controller
+                # the rate controller sits outside so metrics see every retried attempt, and
+                # botocore does not retry at all so the controller sees every raw throttle
+                _client = RateLimitedClient(InstrumentedClient(create_client(settings, max_attempts=1)),
+                                            rate_controller)
+    return _client
+
+
+def use_client(client):
+    """Install an already built client, e.g. a Fake_Rekognition instance for a benchmark"""
+    global _client
+    with _lock:
+        _client = client
+
+
+def reset_client():
+    """Forget the cached settings and client so the next call rebuilds them"""
+    global _client, _settings
+    with _lock:
+        _client = None
+        _settings = None
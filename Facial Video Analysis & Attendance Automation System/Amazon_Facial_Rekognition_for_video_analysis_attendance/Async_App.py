@@ -0,0 +1,253 @@
+import json
+import time
+import asyncio
+import threading
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+import app as flask_app
+from Face_recognize import describe_face
+
+# ================= Async server settings =================
+# Run with:  uvicorn Async_App:app --port 5002
+# /video_feed, /events (Server-Sent Events) and /ws (WebSocket) are served
+# on the event loop; every other route is the Flask app, run by asgiref on
+# its thread pool. Blocking work (capture, recognition, AWS calls, JPEG
+# encoding) stays on the camera hub's threads, never on the loop.
+VIEWER_QUEUE_SIZE = 2      # encoded frames buffered per viewer before old ones are dropped
+EVENT_QUEUE_SIZE = 100     # recognition events buffered per SSE / WebSocket client
+HEARTBEAT_INTERVAL = 15    # seconds between SSE keep-alive comments
+RELAY_POLL = 1.0           # seconds a relay thread waits for a frame before checking for viewers
+
+
+def _offer(queue, item):
+    """put_nowait that drops the oldest item of a full asyncio.Queue"""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(item)
+
+
+class FrameRelay:
+    """Hand the frames of one camera hub channel to any number of async viewers.
+
+    One thread per collection reads the channel and pushes every frame to
+    the viewers' asyncio queues, so viewers cost no thread of their own.
+    """
+
+    def __init__(self, hub, collection_name, loop):
+        self.hub = hub
+        self.collection_name = collection_name
+        self.loop = loop
+        self.viewers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self):
+        queue = asyncio.Queue(VIEWER_QUEUE_SIZE)
+        with self._lock:
+            self.viewers.add(queue)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f'relay-{self.collection_name}', daemon=True)
+                self._thread.start()
+        return queue
+
+    def remove(self, queue):
+        with self._lock:
+            self.viewers.discard(queue)
+
+    def _run(self):
+        channel, frames = self.hub.subscribe(self.collection_name)
+        try:
+            while True:
+                with self._lock:
+                    viewers = list(self.viewers)
+                    if not viewers:
+                        self._thread = None
+                        return
+                part = frames.get(RELAY_POLL)
+                if part is None:
+                    if frames.closed:
+                        break
+                    continue
+                for queue in viewers:
+                    self.loop.call_soon_threadsafe(_offer, queue, part)
+            # the camera stopped: end every viewer's stream
+            with self._lock:
+                viewers, self.viewers = list(self.viewers), set()
+                self._thread = None
+            for queue in viewers:
+                self.loop.call_soon_threadsafe(_offer, queue, None)
+        finally:
+            self.hub.unsubscribe(channel, frames)
+
+
+class EventBus:
+    """Fan recognition results out from worker threads to SSE and WebSocket clients"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.subscribers = {}      # asyncio.Queue -> collection filter or None
+        self.published = 0
+
+    def publish(self, collection_name, faces):
+        """Called on recognition threads"""
+        event = {
+            'collection': collection_name,
+            'ts': time.time(),
+            'names': [describe_face(name) for box, name in faces],
+            'faces': [{'name': name, 'box': box} for box, name in faces],
+        }
+        self.published += 1
+        self.loop.call_soon_threadsafe(self._dispatch, event)
+
+    def _dispatch(self, event):
+        for queue, collection_name in list(self.subscribers.items()):
+            if collection_name in (None, event['collection']):
+                _offer(queue, event)
+
+    def subscribe(self, collection_name=None):
+        queue = asyncio.Queue(EVENT_QUEUE_SIZE)
+        self.subscribers[queue] = collection_name
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.pop(queue, None)
+
+
+class AsyncApp:
+    """ASGI application: streaming routes on asyncio, everything else via Flask"""
+
+    def __init__(self, wsgi_app=flask_app.app, hub=flask_app.camera_hub):
+        self.flask = WsgiToAsgi(wsgi_app)
+        self.hub = hub
+        self.relays = {}
+        self.events = None
+        self.loop = None
+
+    def _start(self):
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+            self.events = EventBus(self.loop)
+            flask_app.recognition_listeners.append(self.events.publish)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        self._start()
+        path = scope['path']
+        if scope['type'] == 'websocket':
+            if path == '/ws':
+                return await self.websocket(scope, receive, send)
+            return await send({'type': 'websocket.close', 'code': 1000})
+        if path == '/video_feed':
+            return await self.video_feed(scope, receive, send)
+        if path == '/events':
+            return await self.sse(scope, receive, send)
+        return await self.flask(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self._start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.events is not None and self.events.publish in flask_app.recognition_listeners:
+                    flask_app.recognition_listeners.remove(self.events.publish)
+                await self.loop.run_in_executor(None, self.hub.close)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # ================= Streaming routes =================
+    async def _until_disconnect(self, receive, pump):
+        """Run pump until it finishes or the client disconnects"""
+        async def watch():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+        watcher = asyncio.ensure_future(watch())
+        worker = asyncio.ensure_future(pump())
+        done, pending = await asyncio.wait({watcher, worker}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            if task is worker and task.exception() is not None:
+                raise task.exception()
+
+    async def video_feed(self, scope, receive, send):
+        collection_name = parse_qs(scope['query_string'].decode()).get('collection', [''])[0]
+        relay = self.relays.get(collection_name)
+        if relay is None:
+            relay = self.relays[collection_name] = FrameRelay(self.hub, collection_name, self.loop)
+        queue = relay.add()
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'multipart/x-mixed-replace; boundary=frame'),
+                                (b'cache-control', b'no-cache, no-store, must-revalidate')]})
+
+        async def pump():
+            while True:
+                part = await queue.get()
+                if part is None:
+                    break
+                await send({'type': 'http.response.body', 'body': part, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        try:
+            await self._until_disconnect(receive, pump)
+        finally:
+            relay.remove(queue)
+
+    async def sse(self, scope, receive, send):
+        collection_name = parse_qs(scope['query_string'].decode()).get('collection', [None])[0]
+        queue = self.events.subscribe(collection_name)
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream'),
+                                (b'cache-control', b'no-cache'),
+                                (b'x-accel-buffering', b'no')]})
+
+        async def pump():
+            await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+                    body = f'event: recognition\ndata: {json.dumps(event)}\n\n'.encode()
+                except asyncio.TimeoutError:
+                    body = b': keep-alive\n\n'
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+        try:
+            await self._until_disconnect(receive, pump)
+        finally:
+            self.events.unsubscribe(queue)
+
+    async def websocket(self, scope, receive, send):
+        if (await receive())['type'] != 'websocket.connect':
+            return
+        collection_name = parse_qs(scope['query_string'].decode()).get('collection', [None])[0]
+        await send({'type': 'websocket.accept'})
+        queue = self.events.subscribe(collection_name)
+
+        async def watch():
+            while (await receive())['type'] != 'websocket.disconnect':
+                pass  # clients only listen; anything they send is ignored
+
+        async def pump():
+            while True:
+                await send({'type': 'websocket.send', 'text': json.dumps(await queue.get())})
+
+        watcher = asyncio.ensure_future(watch())
+        worker = asyncio.ensure_future(pump())
+        try:
+            await asyncio.wait({watcher, worker}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            watcher.cancel()
+            worker.cancel()
+            self.events.unsubscribe(queue)
+
+
+app = AsyncApp()
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, port=5002)
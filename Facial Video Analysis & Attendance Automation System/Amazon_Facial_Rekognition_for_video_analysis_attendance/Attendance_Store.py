@@ -0,0 +1,259 @@
+import os
+import time
+import queue
+import atexit
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+
+# ================= Settings =================
+DB_PATH = os.environ.get('ATTENDANCE_DB', 'attendance.db')
+DEDUP_WINDOW = 60          # seconds during which repeat sightings of a person are not logged again
+SESSION_GAP = 30 * 60      # seconds without any sighting that close a session
+BATCH_SIZE = 200           # events written per transaction at most
+FLUSH_INTERVAL = 1.0       # seconds the writer waits to fill a batch
+QUEUE_SIZE = 10000
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    collection TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_started ON sessions (started_at);
+CREATE INDEX IF NOT EXISTS idx_sessions_collection ON sessions (collection, started_at);
+
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    session_id INTEGER NOT NULL REFERENCES sessions (id),
+    collection TEXT NOT NULL,
+    name TEXT NOT NULL,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS idx_events_name ON events (name, ts);
+
+CREATE TABLE IF NOT EXISTS attendance (
+    session_id INTEGER NOT NULL REFERENCES sessions (id),
+    name TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    sightings INTEGER NOT NULL,
+    PRIMARY KEY (session_id, name)
+);
+'''
+
+
+def parse_time(value):
+    """Accept epoch seconds or an ISO date / datetime and return epoch seconds.
+
+    Raises ValueError for anything else.
+    """
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+class AttendanceStore:
+    """Append-only log of recognition events with per-session attendance.
+
+    record() only puts the event on a bounded queue; a background thread
+    writes batches in single transactions, so the video loop never waits
+    for the disk. A person seen again within dedup_window seconds extends
+    their attendance but is not logged as a new event.
+    """
+
+    def __init__(self, path=DB_PATH, dedup_window=DEDUP_WINDOW, session_gap=SESSION_GAP,
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.dedup_window = dedup_window
+        self.session_gap = session_gap
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.events_queued = 0
+        self.events_dropped = 0
+        self.events_written = 0
+        self.events_deduplicated = 0
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._last_logged = {}     # (collection, name) -> ts of last logged event
+        self._sessions = {}        # collection -> [session_id, last_event_ts]
+
+        with closing(connect(self.path)) as conn:
+            conn.executescript(SCHEMA)
+        self._writer = threading.Thread(target=self._run, name='attendance-writer', daemon=True)
+        self._writer.start()
+        # flush what is queued and close the writer's connection when the process exits
+        atexit.register(self.close)
+
+    def record(self, collection_name, names, ts=None, source=None):
+        """Queue a sighting of names; never blocks"""
+        ts = time.time() if ts is None else ts
+        for name in names:
+            try:
+                self._queue.put_nowait((ts, collection_name, name, source))
+                self.events_queued += 1
+            except queue.Full:
+                self.events_dropped += 1
+
+    # ================= Writer =================
+    def _run(self):
+        conn = connect(self.path)
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    break
+                if not batch:
+                    continue
+                try:
+                    self._write(conn, batch)
+                except sqlite3.Error as e:
+                    # the transaction was rolled back, so forget sessions it may have created
+                    print(f"⚠ Could not write {len(batch)} attendance events: {e}")
+                    self._sessions.clear()
+        finally:
+            conn.close()
+
+    def _next_batch(self):
+        """Collect up to batch_size events, waiting at most flush_interval; None means stop"""
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # stop after this batch
+                break
+            batch.append(item)
+        return batch
+
+    def _session_for(self, conn, collection_name, ts):
+        session = self._sessions.get(collection_name)
+        if session is None or ts - session[1] > self.session_gap:
+            cursor = conn.execute('INSERT INTO sessions (collection, started_at, ended_at) VALUES (?, ?, ?)',
+                                  (collection_name, ts, ts))
+            session = [cursor.lastrowid, ts]
+            self._sessions[collection_name] = session
+        session[1] = max(session[1], ts)
+        return session[0]
+
+    def _write(self, conn, batch):
+        events = []
+        attendance = {}
+        session_end = {}
+        logged = {}                # only applied to _last_logged once the transaction commits
+        deduplicated = 0
+        with conn:
+            for ts, collection_name, name, source in sorted(batch, key=lambda e: e[0]):
+                session_id = self._session_for(conn, collection_name, ts)
+                session_end[session_id] = ts
+                seen = attendance.get((session_id, name))
+                attendance[(session_id, name)] = [seen[0] if seen else ts, ts, (seen[2] if seen else 0) + 1]
+
+                key = (collection_name, name)
+                if ts - logged.get(key, self._last_logged.get(key, float('-inf'))) < self.dedup_window:
+                    deduplicated += 1
+                    continue
+                logged[key] = ts
+                events.append((ts, session_id, collection_name, name, source))
+
+            conn.executemany('INSERT INTO events (ts, session_id, collection, name, source) VALUES (?, ?, ?, ?, ?)',
+                             events)
+            conn.executemany(
+                'INSERT INTO attendance (session_id, name, first_seen, last_seen, sightings) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (session_id, name) DO UPDATE SET '
+                'first_seen = MIN(first_seen, excluded.first_seen), '
+                'last_seen = MAX(last_seen, excluded.last_seen), '
+                'sightings = sightings + excluded.sightings',
+                [(session_id, name, first, last, count)
+                 for (session_id, name), (first, last, count) in attendance.items()])
+            conn.executemany('UPDATE sessions SET ended_at = MAX(ended_at, ?) WHERE id = ?',
+                             [(ts, session_id) for session_id, ts in session_end.items()])
+        self._last_logged.update(logged)
+        self.events_deduplicated += deduplicated
+        self.events_written += len(events)
+
+    def close(self):
+        """Flush queued events and stop the writer; safe to call more than once"""
+        if not self._writer.is_alive():
+            return
+        self._queue.put(None)
+        self._writer.join()
+
+    # ================= Queries =================
+    def sessions(self, collection_name=None, start=None, end=None, limit=100):
+        sql = 'SELECT s.*, COUNT(a.name) AS attendees FROM sessions s LEFT JOIN attendance a ON a.session_id = s.id WHERE 1 = 1'
+        params = []
+        if collection_name:
+            sql += ' AND s.collection = ?'
+            params.append(collection_name)
+        if start is not None:
+            sql += ' AND s.started_at >= ?'
+            params.append(start)
+        if end is not None:
+            sql += ' AND s.started_at < ?'
+            params.append(end)
+        sql += ' GROUP BY s.id ORDER BY s.started_at DESC LIMIT ?'
+        params.append(limit)
+        with closing(connect(self.path)) as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def session_attendance(self, session_id):
+        with closing(connect(self.path)) as conn:
+            session = conn.execute('SELECT * FROM sessions WHERE id = ?', (session_id,)).fetchone()
+            if session is None:
+                return None
+            rows = conn.execute('SELECT name, first_seen, last_seen, sightings FROM attendance '
+                                'WHERE session_id = ? ORDER BY first_seen', (session_id,))
+            return {'session': dict(session), 'attendance': [dict(row) for row in rows]}
+
+    def events(self, start=None, end=None, collection_name=None, name=None, limit=1000):
+        sql = 'SELECT ts, session_id, collection, name, source FROM events WHERE 1 = 1'
+        params = []
+        if start is not None:
+            sql += ' AND ts >= ?'
+            params.append(start)
+        if end is not None:
+            sql += ' AND ts < ?'
+            params.append(end)
+        if collection_name:
+            sql += ' AND collection = ?'
+            params.append(collection_name)
+        if name:
+            sql += ' AND name = ?'
+            params.append(name)
+        sql += ' ORDER BY ts LIMIT ?'
+        params.append(limit)
+        with closing(connect(self.path)) as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def stats(self):
+        return {
+            'events_queued': self.events_queued,
+            'events_written': self.events_written,
+            'events_deduplicated': self.events_deduplicated,
+            'events_dropped': self.events_dropped,
+            'queue_depth': self._queue.qsize(),
+        }
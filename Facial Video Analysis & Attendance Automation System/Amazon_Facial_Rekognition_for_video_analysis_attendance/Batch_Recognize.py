@@ -0,0 +1,210 @@
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from PIL import Image
+
+from Face_Engine import recognize_faces
+from Face_recognize import annotate_image, describe_face
+from Bulk_Register import zip_source, directory_source, is_image
+import Metrics
+
+# ================= Batch recognition settings =================
+# Images are decoded and recognized in memory; nothing is written to
+# static/. Each image already searches its faces concurrently on the
+# Face_Engine pool, so a few images in flight keep the API busy.
+MAX_WORKERS = 4            # images recognized at once
+READ_AHEAD = 2             # images read per worker before earlier ones finish
+ANNOTATED_IMAGES = 500     # recognized images kept for annotating on request, oldest dropped first
+ANNOTATED_BYTES = 256 * 1024 * 1024  # source bytes those images may hold in memory at most
+ANNOTATED_QUALITY = 90
+
+
+# ================= Sources =================
+# Like Bulk_Register, a source yields (key, name, read); name is unused here.
+def upload_source(uploads):
+    """Images of uploaded (filename, file object) pairs, zip archives expanded.
+
+    Files are only read when their image is recognized, so the caller must
+    keep them open until the source is exhausted.
+    """
+    for filename, stream in uploads:
+        if filename.lower().endswith('.zip'):
+            yield from zip_source(stream)
+        elif is_image(filename):
+            yield filename, None, lambda stream=stream: stream.read()
+
+
+def path_source(paths):
+    """Images of files, directories and zip archives given on the command line"""
+    for path in paths:
+        if os.path.isdir(path):
+            yield from directory_source(path)
+        elif path.lower().endswith('.zip'):
+            yield from zip_source(path)
+        elif is_image(path):
+            yield path, None, lambda path=path: open(path, 'rb').read()
+
+
+# ================= Annotated images =================
+class AnnotationStore:
+    """Source bytes and faces of recognized images, annotated only when asked for.
+
+    Holds at most max_size images and max_bytes of image data, dropping
+    the oldest first; an image larger than max_bytes is not kept at all.
+    """
+
+    def __init__(self, max_size=ANNOTATED_IMAGES, max_bytes=ANNOTATED_BYTES):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, image_id, data, faces):
+        with self._lock:
+            previous = self._entries.pop(image_id, None)
+            if previous is not None:
+                self.size_bytes -= len(previous[0])
+            if len(data) > self.max_bytes:
+                return
+            self._entries[image_id] = (data, faces)
+            self.size_bytes += len(data)
+            while len(self._entries) > self.max_size or self.size_bytes > self.max_bytes:
+                _, (dropped, _) = self._entries.popitem(last=False)
+                self.size_bytes -= len(dropped)
+
+    def render(self, image_id):
+        """JPEG bytes of the image with its faces drawn, or None when it is no longer kept"""
+        with self._lock:
+            entry = self._entries.get(image_id)
+        if entry is None:
+            return None
+        data, faces = entry
+        return render_annotated(data, faces)
+
+
+def render_annotated(data, faces):
+    image = Image.open(io.BytesIO(data)).convert('RGB')
+    annotate_image(image, faces)
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=ANNOTATED_QUALITY)
+    return buffer.getvalue()
+
+
+annotation_store = AnnotationStore()
+
+
+# ================= Recognition =================
+def recognize_image(key, read, collection_name):
+    """Recognize one image in memory and return (result, image bytes)"""
+    result = {'key': key, 'status': 'failed', 'faces': [], 'names': [], 'error': None}
+    started = time.monotonic()
+    data = None
+    try:
+        data = read()
+        image = Image.open(io.BytesIO(data))
+        with Metrics.timer('recognize_image'):
+            faces = [(box, name) for box, name in recognize_faces(image, collection_name) if name]
+        result['faces'] = [{'name': name, 'box': box} for box, name in faces]
+        result['names'] = [describe_face(name) for box, name in faces]
+        result['status'] = 'ok'
+    except Exception as e:
+        result['error'] = str(e)
+    result['elapsed_ms'] = round((time.monotonic() - started) * 1000, 1)
+    return result, data
+
+
+def recognize_batch(source, collection_name, workers=MAX_WORKERS, annotate=None):
+    """Yield one result per image of source, in the order they finish, then a summary.
+
+    At most workers * READ_AHEAD images are held in memory at once. When
+    annotate is a callable, it is called with (index, image bytes, result)
+    for every recognized image and may add fields to its result.
+    """
+    summary = {'done': True, 'images': 0, 'recognized': 0, 'failed': 0, 'faces': 0}
+    started = time.monotonic()
+    source = iter(source)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-recognize') as pool:
+        pending = {}
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < workers * READ_AHEAD:
+                entry = next(source, None)
+                if entry is None:
+                    exhausted = True
+                    break
+                key, _, read = entry
+                pending[pool.submit(recognize_image, key, read, collection_name)] = summary['images']
+                summary['images'] += 1
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                index = pending.pop(future)
+                result, data = future.result()
+                result['index'] = index
+                if result['status'] == 'ok':
+                    summary['recognized'] += 1
+                    summary['faces'] += len(result['faces'])
+                    if annotate is not None:
+                        annotate(index, data, result)
+                else:
+                    summary['failed'] += 1
+                yield result
+    summary['elapsed_seconds'] = round(time.monotonic() - started, 2)
+    yield summary
+
+
+def ndjson(results):
+    for result in results:
+        yield json.dumps(result) + '\n'
+
+
+def store_annotations(batch_id, url_prefix):
+    """annotate callback for recognize_batch keeping images in annotation_store for url_prefix/<index>.jpg"""
+    def annotate(index, data, result):
+        annotation_store.put(f'{batch_id}/{index}', data,
+                             [(face['box'], face['name']) for face in result['faces']])
+        result['annotated_url'] = f'{url_prefix}/{batch_id}/{index}.jpg'
+    return annotate
+
+
+def new_batch_id():
+    return uuid.uuid4().hex
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recognize many images against a collection, printing NDJSON results')
+    parser.add_argument('collection')
+    parser.add_argument('sources', nargs='+', help='image files, directories or zip archives')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--annotated-dir', help='also write annotated copies of the images to this directory')
+    parser.add_argument('--output', help='write the NDJSON results to this path instead of stdout')
+    args = parser.parse_args()
+
+    def write_annotated(index, data, result):
+        name = f"{index:05d}_{os.path.splitext(os.path.basename(result['key']))[0]}.jpg"
+        path = os.path.join(args.annotated_dir, name)
+        with open(path, 'wb') as f:
+            f.write(render_annotated(data, [(face['box'], face['name']) for face in result['faces']]))
+        result['annotated_path'] = path
+
+    if args.annotated_dir:
+        os.makedirs(args.annotated_dir, exist_ok=True)
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        for line in ndjson(recognize_batch(path_source(args.sources), args.collection, args.workers,
+                                           write_annotated if args.annotated_dir else None)):
+            out.write(line)
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
@@ -0,0 +1,295 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import AWS_Client
+from Fake_Rekognition import FakeRekognition
+
+# ================= Benchmark settings =================
+COLLECTION_NAME = 'benchmark_collection'
+TARGETS = ('image', 'frame', 'feed', 'gen_frames')
+FRAME_SIZES = ((640, 480), (1280, 720), (1920, 1080))
+FACE_COUNTS = (1, 4, 8)
+FRAMES = 30                # frames (or images) timed per scenario
+MEMORY_FRAMES = 5          # frames run again under tracemalloc for the peak memory figure
+LATENCY = 'default'        # Fake_Rekognition latency spec
+REPEATS = 3                # timed passes per scenario; the report keeps their medians and spread
+TOLERANCE = 0.15           # relative slowdown reported as a regression by --compare
+NOISE_FACTOR = 2.0         # changes within this many times the measured run to run spread are noise
+CALLS_SLACK = 0.01         # calls/frame increase always treated as noise, calls/frame being rounded
+PEOPLE = ['Student_%02d' % i for i in range(30)]
+
+
+def make_frames(size, count, seed=0):
+    """Distinct BGR frames so neither the motion gate nor the search cache sees repeats"""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    return [cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (0, 0), 2)
+            for _ in range(count)]
+
+
+def write_video(frames, path, fps=30):
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) * 1000 if values else 0.0
+
+
+def spread(values, relative=True):
+    """Range of repeated measurements, relative to their median unless relative is false"""
+    middle = float(np.median(values))
+    width = max(values) - min(values)
+    if not relative:
+        return round(width, 3)
+    return round(width / middle, 3) if middle else 0.0
+
+
+# ================= Targets =================
+# Every runner yields once per processed frame, so the time between two
+# yields is the per-frame latency of that path.
+def run_image(frames, workdir):
+    from Face_recognize import face_recognition_saving_image
+    images = [Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)) for frame in frames]
+    for image in images:
+        face_recognition_saving_image(image, COLLECTION_NAME)
+        yield
+
+
+def run_frame(frames, workdir):
+    from Video_Analysis import recognize_faces_in_frame
+    from Face_Tracker import FaceTracker
+    tracker = FaceTracker()
+    for frame in frames:
+        recognize_faces_in_frame(frame.copy(), COLLECTION_NAME, tracker)
+        yield
+
+
+def run_feed(frames, workdir):
+    from Video_Analysis import rekognition_video_feed
+    source = write_video(frames, os.path.join(workdir, 'feed.avi'))
+    for _ in rekognition_video_feed(COLLECTION_NAME, source):
+        yield
+
+
+def run_gen_frames(frames, workdir):
+    import app
+    from Camera_Hub import CameraHub
+    source = write_video(frames, os.path.join(workdir, 'gen_frames.avi'))
+    hub = CameraHub(source, idle_timeout=0)
+    previous, app.camera_hub = app.camera_hub, hub
+    try:
+        for _ in app.gen_frames(COLLECTION_NAME):
+            yield
+    finally:
+        app.camera_hub = previous
+        hub.close()
+
+
+RUNNERS = {'image': run_image, 'frame': run_frame, 'feed': run_feed, 'gen_frames': run_gen_frames}
+
+
+def fresh_backend(faces, latency, seed):
+    """Install a new fake client with one collection, returning it"""
+    from Search_Cache import search_cache
+    client = FakeRekognition(latency, fixtures={'collections': {COLLECTION_NAME: PEOPLE},
+                                                'faces_per_image': faces}, seed=seed)
+    AWS_Client.use_client(client)
+    search_cache.invalidate(COLLECTION_NAME)
+    return client
+
+
+def time_target(target, frames, workdir, faces, latency, seed):
+    """One timed pass of a target: (per-frame latencies, elapsed seconds, calls by operation)"""
+    client = fresh_backend(faces, latency, seed)
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = last = time.perf_counter()
+        for _ in RUNNERS[target](frames, workdir):
+            now = time.perf_counter()
+            latencies.append(now - last)
+            last = now
+        elapsed = time.perf_counter() - started
+    return latencies, elapsed, {op: n for op, n in client.stats()['calls'].items() if op != 'list_collections'}
+
+
+def run_scenario(target, size, faces, frames_count=FRAMES, latency=LATENCY, seed=0, memory=True, repeats=REPEATS):
+    """Time one target on frames of one size showing a number of faces.
+
+    The threaded feed targets drop frames and gate them on wall clock
+    time, so their figures vary between runs. Each scenario is timed
+    repeats times; the medians are reported with their spread, which
+    compare() treats as the noise floor of that scenario.
+    """
+    frames = make_frames(size, frames_count, seed)
+    workdir = tempfile.mkdtemp(prefix='benchmark-')
+    try:
+        passes = []
+        for _ in range(repeats):
+            latencies, elapsed, calls = time_target(target, frames, workdir, faces, latency, seed)
+            count = len(latencies)
+            passes.append({
+                'frames': count,
+                'fps': count / elapsed if elapsed > 0 else 0.0,
+                'p50_ms': percentile(latencies, 50),
+                'p95_ms': percentile(latencies, 95),
+                'p99_ms': percentile(latencies, 99),
+                'calls_per_frame': sum(calls.values()) / count if count else 0.0,
+                'calls': calls,
+            })
+
+        peak_mb = None
+        if memory:
+            fresh_backend(faces, 'off', seed)
+            tracemalloc.start()
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in RUNNERS[target](frames[:MEMORY_FRAMES], workdir):
+                    pass
+            peak_mb = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 2)
+            tracemalloc.stop()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    def median(key):
+        return float(np.median([p[key] for p in passes]))
+
+    return {
+        'target': target,
+        'size': f'{size[0]}x{size[1]}',
+        'faces': faces,
+        'frames': int(median('frames')),
+        'fps': round(median('fps'), 2),
+        'p50_ms': round(median('p50_ms'), 2),
+        'p95_ms': round(median('p95_ms'), 2),
+        'p99_ms': round(median('p99_ms'), 2),
+        'calls_per_frame': round(median('calls_per_frame'), 3),
+        'calls': passes[-1]['calls'],
+        'repeats': repeats,
+        'spread': {
+            'fps': spread([p['fps'] for p in passes]),
+            'p95_ms': spread([p['p95_ms'] for p in passes]),
+            'calls_per_frame': spread([p['calls_per_frame'] for p in passes], relative=False),
+        },
+        'peak_memory_mb': peak_mb,
+    }
+
+
+def run_suite(targets=TARGETS, sizes=FRAME_SIZES, face_counts=FACE_COUNTS, frames=FRAMES,
+              latency=LATENCY, seed=0, memory=True, progress=print, repeats=REPEATS):
+    results = []
+    for target in targets:
+        for size in sizes:
+            for faces in face_counts:
+                result = run_scenario(target, size, faces, frames, latency, seed, memory, repeats)
+                results.append(result)
+                if progress:
+                    progress(format_result(result))
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'opencv': cv2.__version__,
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'latency': latency,
+            'frames': frames,
+            'seed': seed,
+            'repeats': repeats,
+        },
+        'results': results,
+    }
+
+
+# ================= Reporting =================
+def scenario_key(result):
+    return result['target'], result['size'], result['faces']
+
+
+def format_result(result):
+    memory = f"{result['peak_memory_mb']:7.1f} MB" if result['peak_memory_mb'] is not None else ''
+    return (f"{result['target']:10s} {result['size']:>9s} {result['faces']:2d} faces  "
+            f"{result['fps']:7.2f} fps  p50 {result['p50_ms']:7.1f}  p95 {result['p95_ms']:7.1f}  "
+            f"p99 {result['p99_ms']:7.1f} ms  {result['calls_per_frame']:5.2f} calls/frame  {memory}")
+
+
+def allowance(old, new, key, floor):
+    """Change of key accepted as noise: floor, or more when either run measured a wider spread"""
+    noise = max(old.get('spread', {}).get(key, 0.0), new.get('spread', {}).get(key, 0.0))
+    return max(floor, NOISE_FACTOR * noise)
+
+
+def compare(baseline, current, tolerance=TOLERANCE):
+    """Print per-scenario changes against a baseline run and return the regressions.
+
+    fps and p95 may move by tolerance, calls/frame by CALLS_SLACK, or by
+    NOISE_FACTOR times the spread either run measured for the scenario
+    when that is wider.
+    """
+    before = {scenario_key(r): r for r in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        old = before.get(scenario_key(result))
+        if old is None:
+            continue
+        fps_change = (result['fps'] - old['fps']) / old['fps'] if old['fps'] else 0.0
+        p95_change = (result['p95_ms'] - old['p95_ms']) / old['p95_ms'] if old['p95_ms'] else 0.0
+        calls_change = result['calls_per_frame'] - old['calls_per_frame']
+        regressed = (fps_change < -allowance(old, result, 'fps', tolerance)
+                     or p95_change > allowance(old, result, 'p95_ms', tolerance)
+                     or calls_change > allowance(old, result, 'calls_per_frame', CALLS_SLACK))
+        if regressed:
+            regressions.append(scenario_key(result))
+        print(f"{'❌' if regressed else '✔'} {result['target']:10s} {result['size']:>9s} {result['faces']:2d} faces  "
+              f"fps {fps_change:+7.1%}  p95 {p95_change:+7.1%}  calls/frame {calls_change:+.2f}")
+    return regressions
+
+
+def parse_sizes(value):
+    return tuple(tuple(int(v) for v in size.split('x')) for size in value.split(','))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the recognition and streaming paths against the offline backend')
+    parser.add_argument('--targets', default=','.join(TARGETS), help='comma separated, from ' + ', '.join(TARGETS))
+    parser.add_argument('--sizes', default=','.join(f'{w}x{h}' for w, h in FRAME_SIZES))
+    parser.add_argument('--faces', default=','.join(str(n) for n in FACE_COUNTS))
+    parser.add_argument('--frames', type=int, default=FRAMES)
+    parser.add_argument('--latency', default=LATENCY, help="Fake_Rekognition latency spec, e.g. 'fixed:150'")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--repeats', type=int, default=REPEATS, help='timed passes per scenario')
+    parser.add_argument('--output', help='write the results as JSON to this path')
+    parser.add_argument('--compare', help='baseline JSON to compare this run against')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    os.environ.setdefault('ATTENDANCE_DB', os.path.join(tempfile.gettempdir(), 'benchmark_attendance.db'))
+    report = run_suite(args.targets.split(','), parse_sizes(args.sizes),
+                       [int(n) for n in args.faces.split(',')], args.frames, args.latency, args.seed,
+                       not args.no_memory, repeats=args.repeats)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} scenario(s) regressed")
+            sys.exit(1)
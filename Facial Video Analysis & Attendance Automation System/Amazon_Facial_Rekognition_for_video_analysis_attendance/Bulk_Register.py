@@ -0,0 +1,312 @@
+import io
+import os
+import re
+import csv
+import json
+import time
+import uuid
+import zipfile
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from botocore.exceptions import ClientError, BotoCoreError
+from PIL import Image
+
+from Register_Faces import index_face
+from Image_Payload import image_request, MAX_ENROLL_SIDE
+
+# ================= Bulk enrollment settings =================
+# index_faces calls are paced and retried by Rate_Controller like every
+# other call; its rate is set with operation_rates = index_faces=N.
+MAX_WORKERS = 8            # index_faces calls in flight at once
+CHECKPOINT_DIR = 'bulk_checkpoints'
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
+DONE_STATUSES = ('indexed', 'no_face')
+COLLECTION_ID_PATTERN = re.compile(r'^[a-zA-Z0-9_.\-]+$')
+HASH_CHUNK = 1024 * 1024
+
+
+def external_image_id(name):
+    """Turn a person name into a valid ExternalImageId ([a-zA-Z0-9_.-:]+)"""
+    return re.sub(r'[^A-Za-z0-9_.\-:]+', '_', name.strip()).strip('_')
+
+
+def is_image(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in IMAGE_EXTENSIONS
+
+
+def is_collection_id(name):
+    """Whether name is a valid Rekognition CollectionId, and so also safe in a file name"""
+    return bool(COLLECTION_ID_PATTERN.match(name or '')) and name not in ('.', '..')
+
+
+# ================= Sources =================
+# Every source yields (key, name, read) where key identifies the image in
+# the checkpoint and read() returns its bytes; images are only read when
+# they are about to be indexed.
+def _name_from_path(path, root_depth=1):
+    """Person name of an image path whose first root_depth folders are the roster root.
+
+    With the default of one root folder:
+    people/Ann_Lee/front.jpg -> Ann_Lee (a folder per person)
+    people/Ann_Lee.jpg -> Ann_Lee (a file per person)
+    """
+    parts = path.replace('\\', '/').split('/')
+    parts = parts[min(root_depth, len(parts) - 1):]
+    if len(parts) > 1:
+        return parts[-2]
+    return os.path.splitext(parts[-1])[0]
+
+
+def _root_depth(paths):
+    """1 when every image of an archive sits below one top folder (a zipped roster folder), else 0.
+
+    An archive holding only one person's folder therefore needs that
+    folder inside a roster folder, or a manifest.
+    """
+    tops = {path.replace('\\', '/').split('/')[0] for path in paths}
+    nested = all('/' in path.replace('\\', '/') for path in paths)
+    return 1 if paths and nested and len(tops) == 1 else 0
+
+
+def _manifest_rows(text):
+    """(name, image path) rows of a CSV manifest with 'name' and 'image' columns"""
+    for row in csv.DictReader(io.StringIO(text)):
+        name = (row.get('name') or '').strip()
+        path = (row.get('image') or row.get('path') or '').strip()
+        if name and path:
+            yield name, path
+
+
+def directory_source(root):
+    for folder, _, files in sorted(os.walk(root)):
+        for filename in sorted(files):
+            if is_image(filename):
+                path = os.path.join(folder, filename)
+                relative = os.path.relpath(path, root)
+                yield relative, _name_from_path(relative, 0), lambda path=path: open(path, 'rb').read()
+
+
+def manifest_source(manifest_path):
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, newline='', encoding='utf-8-sig') as f:
+        rows = list(_manifest_rows(f.read()))
+    for name, path in rows:
+        path = os.path.join(base, path)
+        yield f'{name}:{os.path.relpath(path, base)}', name, lambda path=path: open(path, 'rb').read()
+
+
+def zip_source(archive):
+    """Images of a zip archive (path, file object or open ZipFile), laid out
+    like a directory or listed in a manifest.csv at its root"""
+    # left open: worker threads read members after the listing is consumed
+    zf = archive if isinstance(archive, zipfile.ZipFile) else zipfile.ZipFile(archive)
+    names = set(zf.namelist())
+    if 'manifest.csv' in names:
+        entries = [(f'{name}:{path}', name, path)
+                   for name, path in _manifest_rows(zf.read('manifest.csv').decode('utf-8-sig'))]
+    else:
+        paths = [path for path in sorted(names) if is_image(path) and not path.startswith('__MACOSX/')]
+        root_depth = _root_depth(paths)
+        entries = [(path, _name_from_path(path, root_depth), path) for path in paths]
+    for key, name, path in entries:
+        yield key, name, lambda path=path: zf.read(path)
+
+
+def open_source(path):
+    if os.path.isdir(path):
+        return directory_source(path)
+    if path.lower().endswith('.zip'):
+        return zip_source(path)
+    if path.lower().endswith('.csv'):
+        return manifest_source(path)
+    raise ValueError(f"{path} is not a directory, zip archive or CSV manifest")
+
+
+# ================= Enrollment =================
+class Checkpoint:
+    """Append-only JSON lines log of finished images, used to resume a run"""
+
+    def __init__(self, path):
+        self.path = path
+        self.results = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        result = json.loads(line)
+                        self.results[result['key']] = result
+
+    def done(self, key):
+        result = self.results.get(key)
+        return result is not None and result['status'] in DONE_STATUSES
+
+    def save(self, result):
+        with self._lock:
+            self.results[result['key']] = result
+            if self.path:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(result) + '\n')
+
+
+def enroll_image(key, name, read, collection_name):
+    """Encode one image in memory and index it; throttles are retried by the rate controller"""
+    result = {'key': key, 'name': name, 'status': 'failed', 'face_ids': [], 'error': None}
+    try:
+        payload = image_request(Image.open(io.BytesIO(read())), 'index_faces', MAX_ENROLL_SIDE)['Bytes']
+    except Exception as e:
+        result['error'] = f"Could not read image: {e}"
+        return result
+
+    try:
+        records = index_face(payload, name, collection_name)
+    except ClientError as e:
+        result['error'] = f"{e.response.get('Error', {}).get('Code', '')}: {e}"
+        return result
+    except BotoCoreError as e:
+        # connection failures and timeouts, so the image is checkpointed as failed like any other
+        result['error'] = f"{type(e).__name__}: {e}"
+        return result
+    result['face_ids'] = [record['Face']['FaceId'] for record in records]
+    result['status'] = 'indexed' if records else 'no_face'
+    return result
+
+
+def build_report(results):
+    """Per-person summary of image results"""
+    report = {}
+    for result in results:
+        entry = report.setdefault(result['name'], {'name': result['name'], 'images': 0, 'indexed': 0,
+                                                   'no_face': 0, 'failed': 0, 'face_ids': [], 'errors': []})
+        entry['images'] += 1
+        entry[result['status']] += 1
+        entry['face_ids'].extend(result['face_ids'])
+        if result['error']:
+            entry['errors'].append(f"{result['key']}: {result['error']}")
+    return sorted(report.values(), key=lambda e: e['name'])
+
+
+def bulk_enroll(source, collection_name, checkpoint_path=None, workers=MAX_WORKERS, progress=None):
+    """Index every image of source into the collection and return (report, stats).
+
+    Images already finished according to the checkpoint are skipped, so an
+    interrupted run can be started again with the same checkpoint file.
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    stats = {'images': 0, 'skipped': 0, 'indexed': 0, 'no_face': 0, 'failed': 0}
+    started = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bulk-enroll') as pool:
+        futures = []
+        for key, name, read in source:
+            stats['images'] += 1
+            name = external_image_id(name)
+            if checkpoint.done(key):
+                stats['skipped'] += 1
+                continue
+            futures.append(pool.submit(enroll_image, key, name, read, collection_name))
+        for future in as_completed(futures):
+            result = future.result()
+            checkpoint.save(result)
+            stats[result['status']] += 1
+            stats['elapsed_seconds'] = round(time.monotonic() - started, 1)
+            if progress:
+                progress(dict(stats))
+
+    stats['elapsed_seconds'] = round(time.monotonic() - started, 1)
+    return build_report(checkpoint.results.values()), stats
+
+
+def report_csv(report):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=['name', 'images', 'indexed', 'no_face', 'failed', 'face_ids', 'errors'])
+    writer.writeheader()
+    for entry in report:
+        writer.writerow(dict(entry, face_ids=' '.join(entry['face_ids']), errors=' | '.join(entry['errors'])))
+    return buffer.getvalue()
+
+
+def print_progress(stats):
+    done = stats['indexed'] + stats['no_face'] + stats['failed']
+    print(f"{done}/{stats['images'] - stats['skipped']} images, {stats['indexed']} indexed, "
+          f"{stats['no_face']} without a face, {stats['failed']} failed")
+
+
+# ================= Background jobs for the Flask app =================
+jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def start_job(archive_path, collection_name, remove_archive=True):
+    """Enroll a zip archive on disk on a background thread and return its job id.
+
+    The checkpoint is keyed by collection and archive content, so uploading
+    the same archive again resumes where the last run stopped. The archive
+    is deleted when the job ends unless remove_archive is false. Raises
+    ValueError for a collection name Rekognition would not accept.
+    """
+    if not is_collection_id(collection_name):
+        raise ValueError(f"Invalid collection name {collection_name!r}")
+    job_id = uuid.uuid4().hex
+    checkpoint_path = os.path.join(CHECKPOINT_DIR, f'{collection_name}_{file_digest(archive_path)[:16]}.jsonl')
+    job = {'id': job_id, 'status': 'running', 'collection': collection_name,
+           'progress': None, 'report': None, 'error': None}
+    with _jobs_lock:
+        jobs[job_id] = job
+
+    def run():
+        result = {'status': 'failed'}
+        try:
+            with zipfile.ZipFile(archive_path) as archive:
+                report, stats = bulk_enroll(zip_source(archive), collection_name, checkpoint_path,
+                                            progress=lambda s: job.update(progress=s))
+            result = {'status': 'done', 'report': report, 'progress': stats}
+        except Exception as e:
+            print(f"⚠ Bulk enrollment failed for {collection_name}: {e}")
+            result['error'] = str(e)
+        finally:
+            # the archive is gone by the time the job reports that it ended
+            if remove_archive and os.path.exists(archive_path):
+                os.remove(archive_path)
+            job.update(result)
+
+    threading.Thread(target=run, name=f'bulk-job-{job_id}', daemon=True).start()
+    return job_id
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        return jobs.get(job_id)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Enroll a roster of face images into a Rekognition collection')
+    parser.add_argument('source', help='directory (one folder or file per person), zip archive or CSV manifest (name,image)')
+    parser.add_argument('collection')
+    parser.add_argument('--checkpoint', help='resume from / record progress in this file')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--report', help='write the per-person report as CSV to this path')
+    args = parser.parse_args()
+
+    report, stats = bulk_enroll(open_source(args.source), args.collection, args.checkpoint,
+                                args.workers, progress=print_progress)
+    if args.report:
+        with open(args.report, 'w', newline='') as f:
+            f.write(report_csv(report))
+    for entry in report:
+        status = '✔' if entry['indexed'] else '❌'
+        print(f"{status} {entry['name']}: {entry['indexed']}/{entry['images']} images indexed")
+    print(f"{stats['indexed']} indexed, {stats['no_face']} without a face, {stats['failed']} failed, "
+          f"{stats['skipped']} skipped in {stats['elapsed_seconds']}s")
@@ -0,0 +1,153 @@
+import threading
+import time
+
+from Frame_Pipeline import CaptureThread, DropQueue, LivePipeline, JOIN_TIMEOUT
+
+IDLE_TIMEOUT = 30          # seconds the camera stays open after the last viewer leaves
+SUBSCRIBER_QUEUE_SIZE = 2  # encoded frames buffered per viewer before old ones are dropped
+
+
+class Channel:
+    """Recognition and encoding for one collection, broadcast to its viewers"""
+
+    def __init__(self, capture, collection_name, on_result=None):
+        self.collection_name = collection_name
+        self.pipeline = LivePipeline(collection_name, on_result=on_result, capture=capture)
+        self.subscribers = []
+        self.idle_since = None
+        self.frames_sent = 0
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._broadcast, name=f'broadcast-{collection_name}', daemon=True)
+
+    def start(self):
+        self.pipeline.start()
+        self._thread.start()
+
+    def _broadcast(self):
+        # every frame is recognized and encoded once, whatever the number of viewers
+        for part in self.pipeline.frames():
+            with self._lock:
+                subscribers = list(self.subscribers)
+            for queue in subscribers:
+                queue.put(part)
+            self.frames_sent += 1
+        with self._lock:
+            subscribers, self.subscribers = self.subscribers, []
+        for queue in subscribers:
+            queue.close()
+
+    def add(self):
+        queue = DropQueue(SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self.subscribers.append(queue)
+            self.idle_since = None
+        return queue
+
+    def remove(self, queue):
+        with self._lock:
+            if queue in self.subscribers:
+                self.subscribers.remove(queue)
+            if not self.subscribers:
+                self.idle_since = time.monotonic()
+        queue.close()
+
+    def stats(self):
+        with self._lock:
+            viewers = len(self.subscribers)
+        return dict(self.pipeline.worker.stats(), viewers=viewers, frames_sent=self.frames_sent)
+
+    def stop(self):
+        self.pipeline.stop()
+        if self._thread.is_alive():
+            self._thread.join(JOIN_TIMEOUT)
+
+
+class CameraHub:
+    """Share one camera between every /video_feed viewer.
+
+    The camera is opened when the first viewer subscribes and closed once
+    no viewer has been connected for idle_timeout seconds. Viewers of the
+    same collection share one Channel, so a frame is recognized and
+    encoded once and then copied into each viewer's bounded buffer.
+    """
+
+    def __init__(self, source=0, idle_timeout=IDLE_TIMEOUT, on_result=None):
+        self.source = source
+        self.idle_timeout = idle_timeout
+        self.on_result = on_result
+        self.capture = None
+        self.channels = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, collection_name):
+        with self._lock:
+            if self.capture is None or not self.capture.is_alive():
+                # first viewer, or the camera stopped: start from a fresh capture
+                self._stop_channels_locked()
+                self._close_locked()
+                self.capture = CaptureThread(self.source)
+                self.capture.start()
+            channel = self.channels.get(collection_name)
+            if channel is None:
+                on_result = None
+                if self.on_result:
+                    on_result = lambda faces: self.on_result(collection_name, faces)
+                channel = Channel(self.capture, collection_name, on_result)
+                channel.start()
+                self.channels[collection_name] = channel
+            return channel, channel.add()
+
+    def unsubscribe(self, channel, queue):
+        channel.remove(queue)
+        timer = threading.Timer(self.idle_timeout, self.close_idle)
+        timer.daemon = True
+        timer.start()
+
+    def stream(self, collection_name):
+        """Generator of multipart JPEG chunks for one viewer"""
+        channel, queue = self.subscribe(collection_name)
+        try:
+            while True:
+                part = queue.get()
+                if part is None:
+                    break
+                yield part
+        finally:
+            self.unsubscribe(channel, queue)
+
+    def stats(self):
+        with self._lock:
+            capture, channels = self.capture, list(self.channels.values())
+        return {
+            'capturing': capture is not None and capture.is_alive(),
+            'capture_fps': round(capture.fps, 1) if capture is not None else 0.0,
+            'channels': [channel.stats() for channel in channels],
+        }
+
+    def close_idle(self):
+        """Stop channels nobody watched for idle_timeout and the camera once all are gone"""
+        now = time.monotonic()
+        with self._lock:
+            for name, channel in list(self.channels.items()):
+                if channel.idle_since is not None and now - channel.idle_since >= self.idle_timeout:
+                    del self.channels[name]
+                    channel.stop()
+            if not self.channels:
+                self._close_locked()
+
+    def close(self):
+        with self._lock:
+            self._stop_channels_locked()
+            self._close_locked()
+
+    def _stop_channels_locked(self):
+        for channel in self.channels.values():
+            channel.stop()
+        self.channels = {}
+
+    def _close_locked(self):
+        if self.capture is not None:
+            self.capture.stop()
+            if self.capture.is_alive():
+                self.capture.join(JOIN_TIMEOUT)
+            self.capture = None
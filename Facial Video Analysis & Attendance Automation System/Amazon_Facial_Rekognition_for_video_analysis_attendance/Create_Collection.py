@@ -1,29 +1,137 @@
-import pandas as pd
-import boto3
-from botocore.exceptions import ClientError
-
-credential = pd.read_csv("facial_video_analysis_accessKeys.csv")
-access_key_id = credential['Access key ID'][0]
-secret_access_key = credential['Secret access key'][0]
-region_name = 'us-east-2'  # Specify your AWS region here
-
-client = boto3.client(
-    'rekognition',
-    aws_access_key_id=access_key_id,
-    aws_secret_access_key=secret_access_key,
-    region_name=region_name  # Add this line to specify the region
-)
+import time
+import threading
+
+from botocore.exceptions import ClientError, BotoCoreError
+
+from AWS_Client import get_client
+from Search_Cache import search_cache
+from Local_Embeddings import local_matcher
+
+# ================= Collection registry settings =================
+REGISTRY_TTL = 60          # seconds before the cached collection list is refreshed in the background
+PAGE_SIZE = 1000           # MaxResults of one list_collections page
+
+
+def fetch_collections():
+    """Return every collection id of the account, following NextToken"""
+    print('Displaying collections...')
+    client = get_client()
+    collections = []
+    kwargs = {'MaxResults': PAGE_SIZE}
+    while True:
+        response = client.list_collections(**kwargs)
+        collections.extend(response['CollectionIds'])
+        if not response.get('NextToken'):
+            return collections
+        kwargs['NextToken'] = response['NextToken']
+
+
+class CollectionRegistry:
+    """Cached list of the account's collections.
+
+    Only the very first call waits for AWS, and callers arriving while it
+    runs wait for that same fetch. After that, an expired list is still
+    served while a background thread refreshes it, and create / delete
+    update the list directly. Creates and deletes made while a fetch is
+    in flight are replayed over its result, so a slow fetch cannot undo them.
+    """
+
+    def __init__(self, ttl=REGISTRY_TTL):
+        self.ttl = ttl
+        self._collections = None
+        self._fetched_at = 0.0
+        self._refreshing = False
+        self._edits = {}           # collection id -> exists, changed since the running fetch started
+        self._lock = threading.Lock()
+        self._fetched = threading.Condition(self._lock)
+
+    def _start_fetch(self):
+        """Caller holds self._lock; False when another fetch is already running"""
+        if self._refreshing:
+            return False
+        self._refreshing = True
+        self._edits = {}
+        return True
+
+    def _fetch(self):
+        """Fetch all pages; keeps the old list if the call fails"""
+        try:
+            collections = fetch_collections()
+        except (ClientError, BotoCoreError) as e:
+            print(f"⚠ Could not list collections: {e}")
+            collections = None
+        with self._lock:
+            if collections is not None:
+                current = set(collections)
+                for collection_name, exists in self._edits.items():
+                    if exists:
+                        current.add(collection_name)
+                    else:
+                        current.discard(collection_name)
+                self._collections = sorted(current)
+                self._fetched_at = time.monotonic()
+            self._refreshing = False
+            self._edits = {}
+            self._fetched.notify_all()
+        return collections is not None
+
+    def refresh(self):
+        """Fetch the list now, or wait for the fetch already running; False if it failed"""
+        with self._lock:
+            if not self._start_fetch():
+                while self._refreshing:
+                    self._fetched.wait()
+                return self._collections is not None
+        return self._fetch()
+
+    def refresh_async(self):
+        with self._lock:
+            if not self._start_fetch():
+                return
+        threading.Thread(target=self._fetch, name='collection-refresh', daemon=True).start()
+
+    def collections(self):
+        """Return the cached collection ids, or None if they were never fetched"""
+        if self._collections is None:
+            self.refresh()
+        elif time.monotonic() - self._fetched_at > self.ttl:
+            self.refresh_async()
+        with self._lock:
+            return None if self._collections is None else list(self._collections)
+
+    def _edit(self, collection_name, exists):
+        with self._lock:
+            if self._refreshing:
+                self._edits[collection_name] = exists
+            if self._collections is None:
+                return
+            if exists and collection_name not in self._collections:
+                self._collections = sorted(self._collections + [collection_name])
+            elif not exists and collection_name in self._collections:
+                self._collections = [c for c in self._collections if c != collection_name]
+
+    def add(self, collection_name):
+        self._edit(collection_name, True)
+
+    def remove(self, collection_name):
+        self._edit(collection_name, False)
+
+
+collection_registry = CollectionRegistry()
 
 def create(COLLECTION_NAME):
+    client = get_client()
     print('Creating collection: {}'.format(COLLECTION_NAME))
     try:
         response = client.create_collection(CollectionId=COLLECTION_NAME)
         print('Collection ARN: {}'.format(response['CollectionArn']))
         print('Status code: {}'.format(str(response['StatusCode'])))
+        collection_registry.add(COLLECTION_NAME)
         st1 = 'Collection: {} has been created.'.format(COLLECTION_NAME)
         return st1
     except client.exceptions.ResourceAlreadyExistsException:
         print('Collection: {} already exists.'.format(COLLECTION_NAME))
+        collection_registry.add(COLLECTION_NAME)
         st1 = 'Collection: {} already exists.'.format(COLLECTION_NAME)
         return st1
     except ClientError as e:
@@ -31,15 +139,20 @@ def create(COLLECTION_NAME):
         return st
 
 def delete(COLLECTION_NAME):
+    client = get_client()
     print('Deleting collection: {}'.format(COLLECTION_NAME))
     try:
         response = client.delete_collection(CollectionId=COLLECTION_NAME)
+        search_cache.invalidate(COLLECTION_NAME)
+        local_matcher.drop(COLLECTION_NAME)
+        collection_registry.remove(COLLECTION_NAME)
         print('Deleting collection: {}'.format(COLLECTION_NAME))
         print('Status code: {}'.format(str(response['StatusCode'])))
         st1 = 'Collection: {} has been deleted.'.format(COLLECTION_NAME)
         return st1
     except client.exceptions.ResourceNotFoundException:
         print('No such Collection: {}'.format(COLLECTION_NAME))
+        collection_registry.remove(COLLECTION_NAME)
         st2 = 'No such Collection: {}'.format(COLLECTION_NAME)
         return st2
     except ClientError as e:
@@ -47,14 +160,10 @@ def delete(COLLECTION_NAME):
         return st
 
 def list_collections():
-    try:
-        print('Displaying collections...')
-        response = client.list_collections()
-        collections = response['CollectionIds']
-        print(len(collections), collections)
-        return len(collections), collections
-    except ClientError as e:
+    collections = collection_registry.collections()
+    if collections is None:
         return 0, "Problem in client"
+    return len(collections), collections
 
 # if __name__ == '__main__':
 #     COLLECTION_NAME = 'Face_recognition_collection'
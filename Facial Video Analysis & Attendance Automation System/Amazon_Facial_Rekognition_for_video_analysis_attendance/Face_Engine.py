@@ -0,0 +1,158 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import Metrics
+
+from AWS_Client import get_client, get_settings
+from Image_Payload import image_request, face_crop, MAX_CROP_SIDE
+from Local_Detector import LocalDetector
+from Search_Cache import search_cache, phash
+from Local_Embeddings import local_matcher
+
+# Faces of one image are searched concurrently; the worker pool matches the
+# client's HTTP connection pool so no worker waits for a connection.
+MAX_FACE_WORKERS = get_settings()['max_pool_connections']
+
+face_search_pool = ThreadPoolExecutor(max_workers=MAX_FACE_WORKERS, thread_name_prefix='face-search')
+
+# Optional CPU face detector in front of detect_faces
+local_detector = LocalDetector(get_settings()['local_detector'], get_settings()['local_detector_model'])
+
+# ================= Search filter =================
+# A face is only sent to search_faces_by_image when the frame level
+# detect_faces result says it is good enough to be matched.
+FACE_MATCH_THRESHOLD = 70
+MIN_CONFIDENCE = 90
+MIN_SHARPNESS = 10
+MIN_BRIGHTNESS = 10
+MAX_YAW = 60
+MAX_PITCH = 45
+
+
+def detect_faces(request):
+    """Run detect_faces once for the whole image and return its FaceDetails.
+
+    The DEFAULT attribute set already contains BoundingBox, Confidence,
+    Quality and Pose, which is all the search filter needs.
+    """
+    response = get_client().detect_faces(Image=request, Attributes=['DEFAULT'])
+    return response['FaceDetails']
+
+
+def is_searchable(details):
+    """Decide from a FaceDetails entry whether the face is worth a search call"""
+    if details.get('Confidence', 0) < MIN_CONFIDENCE:
+        return False
+    quality = details.get('Quality', {})
+    if quality.get('Sharpness', 100) < MIN_SHARPNESS or quality.get('Brightness', 100) < MIN_BRIGHTNESS:
+        return False
+    pose = details.get('Pose', {})
+    return abs(pose.get('Yaw', 0)) <= MAX_YAW and abs(pose.get('Pitch', 0)) <= MAX_PITCH
+
+
+def box_to_pixels(box, img_width, img_height):
+    """Convert a relative Rekognition BoundingBox to (left, top, width, height) in pixels"""
+    return (img_width * box['Left'], img_height * box['Top'],
+            img_width * box['Width'], img_height * box['Height'])
+
+
+def is_no_face_error(error):
+    """Whether a search failed because the crop holds no face, e.g. a local detector false positive"""
+    info = (getattr(error, 'response', None) or {}).get('Error', {})
+    return info.get('Code') == 'InvalidParameterException' and 'no faces' in info.get('Message', '').lower()
+
+
+def search_face(box, image, collection_name):
+    """Crop one face out of the image and search it in the collection.
+
+    Near-identical crops searched before in the same collection are
+    answered from Search_Cache, and confident matches of the local
+    embedding index, when enabled, without a Rekognition call. A crop in
+    which Rekognition finds no face gets '', like a filtered out face.
+    """
+    try:
+        local_matcher.note_search()
+        with Metrics.timer('crop'):
+            crop = face_crop(image, box)
+            crop_hash = phash(crop)
+        cached = search_cache.get(collection_name, crop_hash)
+        if cached is not None:
+            return cached[0]
+        with Metrics.timer('local_match'):
+            local_match = local_matcher.match(crop, collection_name)
+        if local_match is not None:
+            search_cache.put(collection_name, crop_hash, *local_match)
+            return local_match[0]
+        response = get_client().search_faces_by_image(
+            CollectionId=collection_name,
+            Image=image_request(crop, 'search_faces_by_image', MAX_CROP_SIDE),
+            FaceMatchThreshold=FACE_MATCH_THRESHOLD
+        )
+        if response.get('FaceMatches'):
+            match = response['FaceMatches'][0]
+            name, similarity = match['Face']['ExternalImageId'], match['Similarity']
+        else:
+            name, similarity = 'Not recognized', 0.0
+        search_cache.put(collection_name, crop_hash, name, similarity)
+        return name
+    except Exception as e:
+        if is_no_face_error(e):
+            local_detector.note_false_positive()
+            search_cache.put(collection_name, crop_hash, '', 0.0)
+            return ''
+        print(f"⚠ Rekognition error in search_face: {e}")
+        return 'Error'
+
+
+def search_faces(boxes, image, collection_name):
+    """Search several faces concurrently, keeping the order of boxes"""
+    if len(boxes) <= 1:
+        return [search_face(box, image, collection_name) for box in boxes]
+    if hasattr(image, 'load'):
+        image.load()  # make sure worker threads only read the decoded pixels of a PIL image
+    return list(face_search_pool.map(lambda box: search_face(box, image, collection_name), boxes))
+
+
+def detect_searchable_faces(image):
+    """Return (bounding_boxes, searchable flags) for an image.
+
+    With the local detector in 'gate' mode an image without local candidates
+    never reaches detect_faces; in 'local' mode the local boxes are used as
+    they are and every one of them is searched.
+    """
+    if local_detector.mode != 'off':
+        with Metrics.timer('local_detect'):
+            local_boxes = local_detector.detect(image)
+        if not local_boxes:
+            return [], []
+        if local_detector.mode == 'local':
+            return local_boxes, [True] * len(local_boxes)
+    face_details = detect_faces(image_request(image, 'detect_faces'))
+    return ([details['BoundingBox'] for details in face_details],
+            [is_searchable(details) for details in face_details])
+
+
+def recognize_faces(image, collection_name, tracker=None, now=None):
+    """Detect every face of an image and search the ones worth searching.
+
+    image is a PIL image or a NumPy BGR frame.
+
+    Returns a list of (bounding_box, name) in detection order. name is ''
+    for faces that were filtered out or in which Rekognition found no face,
+    'Not recognized' when the collection has no match and 'Error' when the
+    search call failed.
+
+    With a Face_Tracker.FaceTracker, faces that continue a known track
+    reuse its cached name and only new, moved or expired tracks are searched.
+    now is the tracker's clock, in seconds; the default is time.monotonic(),
+    recorded videos pass the position of the frame instead.
+    """
+    boxes, searchable = detect_searchable_faces(image)
+    if tracker is None:
+        names = iter(search_faces([box for box, ok in zip(boxes, searchable) if ok], image, collection_name))
+        return [(box, next(names) if ok else '') for box, ok in zip(boxes, searchable)]
+
+    tracks = tracker.update(boxes, now)
+    pending = tracker.pending(tracks, searchable, now)
+    for track, name in zip(pending, search_faces([track.box for track in pending], image, collection_name)):
+        tracker.set_identity(track, name, now)
+    return [(box, track.name or '') for box, track in zip(boxes, tracks)]
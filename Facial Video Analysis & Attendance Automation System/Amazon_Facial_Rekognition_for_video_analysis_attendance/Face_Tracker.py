@@ -0,0 +1,122 @@
+import time
+from itertools import count
+
+# ================= Tracking settings =================
+IOU_THRESHOLD = 0.3        # minimum overlap for a box to continue a track
+MOVE_THRESHOLD = 0.5       # centroid shift, in face widths, that forces a re-search
+IDENTITY_TTL = 120         # seconds a recognized name is trusted without a search
+UNKNOWN_TTL = 15           # seconds a 'Not recognized' result is trusted
+MAX_TRACK_AGE = 10         # seconds a track survives without being seen
+MAX_TRACKS = 200
+
+
+def iou(a, b):
+    """Intersection over union of two relative Rekognition bounding boxes"""
+    left = max(a['Left'], b['Left'])
+    top = max(a['Top'], b['Top'])
+    right = min(a['Left'] + a['Width'], b['Left'] + b['Width'])
+    bottom = min(a['Top'] + a['Height'], b['Top'] + b['Height'])
+    inter = max(0.0, right - left) * max(0.0, bottom - top)
+    union = a['Width'] * a['Height'] + b['Width'] * b['Height'] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def centroid_shift(a, b):
+    """Distance between the centres of two boxes, measured in widths of a"""
+    dx = (a['Left'] + a['Width'] / 2) - (b['Left'] + b['Width'] / 2)
+    dy = (a['Top'] + a['Height'] / 2) - (b['Top'] + b['Height'] / 2)
+    return (dx * dx + dy * dy) ** 0.5 / max(a['Width'], 1e-6)
+
+
+class Track:
+    """One face followed across frames, with its cached identity"""
+
+    def __init__(self, track_id, box, now):
+        self.track_id = track_id
+        self.box = box
+        self.anchor = box          # box at the time of the last search
+        self.name = None
+        self.verified_at = None
+        self.last_seen = now
+
+
+class FaceTracker:
+    """Match faces across frames by bounding box so known faces are not re-searched"""
+
+    def __init__(self, iou_threshold=IOU_THRESHOLD, move_threshold=MOVE_THRESHOLD,
+                 identity_ttl=IDENTITY_TTL, unknown_ttl=UNKNOWN_TTL,
+                 max_age=MAX_TRACK_AGE, max_tracks=MAX_TRACKS):
+        self.iou_threshold = iou_threshold
+        self.move_threshold = move_threshold
+        self.identity_ttl = identity_ttl
+        self.unknown_ttl = unknown_ttl
+        self.max_age = max_age
+        self.max_tracks = max_tracks
+        self.tracks = []
+        self._ids = count(1)
+        self.searches = 0
+        self.reused = 0
+
+    def update(self, boxes, now=None):
+        """Assign every box to a track, creating tracks for new faces.
+
+        Returns the tracks in the same order as boxes.
+        """
+        now = time.monotonic() if now is None else now
+        self.tracks = [t for t in self.tracks if now - t.last_seen <= self.max_age]
+
+        pairs = sorted(((iou(track.box, box), t, b)
+                        for t, track in enumerate(self.tracks)
+                        for b, box in enumerate(boxes)), key=lambda p: p[0], reverse=True)
+        matched = [None] * len(boxes)
+        used = set()
+        for overlap, t, b in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if t in used or matched[b] is not None:
+                continue
+            used.add(t)
+            matched[b] = self.tracks[t]
+
+        for b, box in enumerate(boxes):
+            track = matched[b]
+            if track is None:
+                track = Track(next(self._ids), box, now)
+                self.tracks.append(track)
+                matched[b] = track
+            track.box = box
+            track.last_seen = now
+
+        if len(self.tracks) > self.max_tracks:
+            self.tracks.sort(key=lambda t: t.last_seen, reverse=True)
+            del self.tracks[self.max_tracks:]
+        return matched
+
+    def needs_search(self, track, now=None):
+        """True when the track is new, has moved a lot or its identity expired"""
+        now = time.monotonic() if now is None else now
+        if track.name is None or track.name == 'Error':
+            return True
+        ttl = self.unknown_ttl if track.name == 'Not recognized' else self.identity_ttl
+        if now - track.verified_at > ttl:
+            return True
+        return centroid_shift(track.anchor, track.box) > self.move_threshold
+
+    def pending(self, tracks, searchable, now=None):
+        """Return the searchable tracks that need a search call, counting the rest as cache hits"""
+        now = time.monotonic() if now is None else now
+        result = []
+        for track, ok in zip(tracks, searchable):
+            if not ok:
+                continue
+            if self.needs_search(track, now):
+                result.append(track)
+            else:
+                self.reused += 1
+        self.searches += len(result)
+        return result
+
+    def set_identity(self, track, name, now=None):
+        track.name = name
+        track.verified_at = time.monotonic() if now is None else now
+        track.anchor = track.box
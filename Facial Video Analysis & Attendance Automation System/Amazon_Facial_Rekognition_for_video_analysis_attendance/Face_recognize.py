@@ -1,82 +1,44 @@
-import pandas as pd
-import boto3
-import io
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 
-# Read AWS credentials from CSV file
+from Face_Engine import recognize_faces, box_to_pixels
+from Frame_Draw import load_font
+import Metrics
 
-credential = pd.read_csv("facial_video_analysis_accessKeys.csv")
-access_key_id = credential['Access key ID'][0]
-secret_access_key = credential['Secret access key'][0]
-region_name = 'us-east-2'  # Specify your AWS region here
 
-# Initialize AWS Rekognition client
-AWS_REKOG = boto3.client(
-    'rekognition',
-    aws_access_key_id=access_key_id,
-    aws_secret_access_key=secret_access_key,
-    region_name=region_name  # Add this line to specify the region
-)
+def describe_face(face_name):
+    """Message shown to the user for one recognized face"""
+    if face_name == "Not recognized":
+        return "Not recognized face"
+    if face_name == "Error":
+        return "Face could not be searched"
+    return f'A face has been recognized. Name: {face_name}'
 
 
-def get_bounding_boxes(request):
-    response = AWS_REKOG.detect_faces(Image=request, Attributes=['ALL'])
-    bounding_boxes = [details['BoundingBox'] for details in response['FaceDetails']]
-    return bounding_boxes
-
-
-def face_exists(request):
-    response = AWS_REKOG.detect_faces(Image=request, Attributes=['ALL'])
-    return bool(response['FaceDetails'])
-
-
-def get_face_name(face, image, COLLECTION_NAME):
-    img_width, img_height = image.size
-    width = img_width * face['Width']
-    height = img_height * face['Height']
-    left = img_width * face['Left']
-    top = img_height * face['Top']
-    area = (left, top, left + width, top + height)
-    cropped_image = image.crop(area)
-    bytes_array = io.BytesIO()
-    cropped_image.save(bytes_array, format="PNG")
-    request = {'Bytes': bytes_array.getvalue()}
-
-    if face_exists(request):
-        response = AWS_REKOG.search_faces_by_image(
-            CollectionId=COLLECTION_NAME, Image=request, FaceMatchThreshold=70)
-        if response['FaceMatches']:
-            return response['FaceMatches'][0]['Face']['ExternalImageId']
-        else:
-            return 'Not recognized'
-    return ''
-
-
-def face_recognition_saving_image(image, COLLECTION_NAME):
-    bytes_array = io.BytesIO()
-    image.save(bytes_array, format="PNG")
-    request = {'Bytes': bytes_array.getvalue()}
-    bounding_boxes = get_bounding_boxes(request)
+def annotate_image(image, faces):
+    """Draw the recognized faces onto image in place and return their descriptions"""
     img_width, img_height = image.size
-    faces_name = [get_face_name(face, image, COLLECTION_NAME) for face in bounding_boxes]
 
     draw = ImageDraw.Draw(image)
-    font = ImageFont.truetype("arial.ttf", size=40)
+    font = load_font(40)
     recognized_faces = []
 
-    for i, face_name in enumerate(faces_name):
-        if not face_name:
-            continue
-        width = img_width * bounding_boxes[i]['Width']
-        height = img_height * bounding_boxes[i]['Height']
-        left = img_width * bounding_boxes[i]['Left']
-        top = img_height * bounding_boxes[i]['Top']
-        points = ((left, top), (left + width, top), (left + width, top + height), (left, top + height), (left, top))
-        draw.line(points, fill='#00d400', width=4)
-        draw.text((left, top), face_name, font=font)
-        recognized_faces.append(
-            f'A face has been recognized. Name: {face_name}' if face_name != "Not recognized" else "Not recognized face")
-        print(recognized_faces[-1])
+    with Metrics.timer('draw'):
+        for box, face_name in faces:
+            if not face_name:
+                continue
+            left, top, width, height = box_to_pixels(box, img_width, img_height)
+            points = ((left, top), (left + width, top), (left + width, top + height), (left, top + height), (left, top))
+            draw.line(points, fill='#00d400', width=4)
+            draw.text((left, top), face_name, font=font)
+            recognized_faces.append(describe_face(face_name))
+    return recognized_faces
+
+
+def face_recognition_saving_image(image, COLLECTION_NAME):
+    faces = recognize_faces(image, COLLECTION_NAME)
+    recognized_faces = annotate_image(image, faces)
+    for description in recognized_faces:
+        print(description)
 
     print('Faces recognition has finished.')
     return image, recognized_faces
@@ -0,0 +1,237 @@
+import json
+import time
+import uuid
+import random
+import hashlib
+import threading
+from collections import Counter
+
+from botocore.exceptions import ClientError
+
+# ================= Fake backend settings =================
+# Latency specs are 'fixed:MS', 'uniform:MIN_MS:MAX_MS', 'lognormal:MEDIAN_MS:SIGMA'
+# or 'off'. The defaults are rough figures for Rekognition from a nearby region.
+DEFAULT_LATENCY = {
+    'detect_faces': 'lognormal:180:0.35',
+    'search_faces_by_image': 'lognormal:220:0.35',
+    'index_faces': 'lognormal:350:0.3',
+    'list_collections': 'lognormal:90:0.3',
+    'create_collection': 'lognormal:120:0.3',
+    'delete_collection': 'lognormal:120:0.3',
+}
+FACES_PER_IMAGE = 2        # faces detect_faces reports for an image without a fixture
+MATCH_RATE = 0.9           # share of searches that match an indexed face
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+
+
+def parse_latency(spec):
+    """Turn a latency spec into a function of a random.Random returning seconds"""
+    kind, *params = spec.split(':')
+    params = [float(p) for p in params]
+    if kind == 'off':
+        return lambda rng: 0.0
+    if kind == 'fixed':
+        return lambda rng: params[0] / 1000
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(params[0], params[1]) / 1000
+    if kind == 'lognormal':
+        median, sigma = params
+        return lambda rng: median / 1000 * rng.lognormvariate(0, sigma)
+    raise ValueError(f"Unknown latency distribution {spec!r}")
+
+
+def parse_latencies(value):
+    """'default', one spec for every operation, or 'operation=spec;operation=spec'"""
+    specs = dict(DEFAULT_LATENCY)
+    if value and value != 'default':
+        for part in value.split(';'):
+            if '=' in part:
+                operation, spec = part.split('=', 1)
+                specs[operation.strip()] = spec.strip()
+            else:
+                specs = {operation: part.strip() for operation in specs}
+    return {operation: parse_latency(spec) for operation, spec in specs.items()}
+
+
+def _error_class(code):
+    class ModeledError(ClientError):
+        def __init__(self, message, operation):
+            super().__init__({'Error': {'Code': code, 'Message': message}}, operation)
+    ModeledError.__name__ = code
+    return ModeledError
+
+
+class FakeExceptions:
+    """Mirror of client.exceptions for the error types the app handles"""
+    ResourceAlreadyExistsException = _error_class('ResourceAlreadyExistsException')
+    ResourceNotFoundException = _error_class('ResourceNotFoundException')
+    InvalidParameterException = _error_class('InvalidParameterException')
+    ImageTooLargeException = _error_class('ImageTooLargeException')
+    ThrottlingException = _error_class('ThrottlingException')
+
+
+def _face_grid(count):
+    """Fixed, non-overlapping boxes so trackers see the same faces every frame"""
+    boxes = []
+    for i in range(count):
+        boxes.append({'Left': 0.05 + (i % 4) * 0.24, 'Top': 0.15 + (i // 4) * 0.4,
+                      'Width': 0.14, 'Height': 0.22})
+    return boxes
+
+
+class FakeRekognition:
+    """In-process stand-in for the boto3 Rekognition client.
+
+    Implements the calls the app makes with the same request and response
+    shapes, sleeps for a configurable latency and can fail a share of calls
+    with ThrottlingException. Collections live in memory and can be seeded
+    from a JSON fixtures file:
+
+        {"collections": {"classroom": ["Ann_Lee", "Bob"]},
+         "faces_per_image": 3, "match_rate": 0.8,
+         "images": {"<sha1 of image bytes>": [{"BoundingBox": {...}, "ExternalImageId": "Ann_Lee"}]}}
+
+    Search results are derived from a hash of the image bytes, so a run
+    over the same input gives the same answers.
+    """
+
+    exceptions = FakeExceptions
+
+    def __init__(self, latency='default', throttle_rate=0.0, fixtures=None, seed=0):
+        fixtures = fixtures or {}
+        self.latency = parse_latencies(latency)
+        self.throttle_rate = throttle_rate
+        self.faces_per_image = fixtures.get('faces_per_image', FACES_PER_IMAGE)
+        self.match_rate = fixtures.get('match_rate', MATCH_RATE)
+        self.images = fixtures.get('images', {})
+        self.collections = {}      # collection -> {face_id: external_image_id}
+        for collection_name, names in fixtures.get('collections', {}).items():
+            # stable face ids, so fixture runs are comparable
+            self.collections[collection_name] = {
+                str(uuid.UUID(int=random.Random(f'{collection_name}/{name}').getrandbits(128))): name
+                for name in names}
+        self.calls = Counter()
+        self.throttled = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings):
+        fixtures = None
+        if settings['fake_fixtures']:
+            with open(settings['fake_fixtures']) as f:
+                fixtures = json.load(f)
+        return cls(settings['fake_latency'], settings['fake_throttle_rate'], fixtures, settings['fake_seed'])
+
+    def _call(self, operation):
+        """Count the call, wait its latency and maybe throttle it; operation is the client method name"""
+        with self._lock:
+            self.calls[operation] += 1
+            delay = self.latency.get(operation, lambda rng: 0.0)(self._rng)
+            throttled = self._rng.random() < self.throttle_rate
+        time.sleep(delay)
+        if throttled:
+            with self._lock:
+                self.throttled[operation] += 1
+            raise self.exceptions.ThrottlingException('Rate exceeded', operation)
+
+    def _faces(self, collection_name, operation):
+        faces = self.collections.get(collection_name)
+        if faces is None:
+            raise self.exceptions.ResourceNotFoundException(
+                f'The collection id: {collection_name} does not exist', operation)
+        return faces
+
+    def _image_bytes(self, image, operation):
+        data = image.get('Bytes', b'')
+        if len(data) > MAX_IMAGE_BYTES:
+            raise self.exceptions.ImageTooLargeException('Image size is too large', operation)
+        if not data:
+            raise self.exceptions.InvalidParameterException('Request has invalid image format', operation)
+        return data
+
+    def _detected(self, data, default_count):
+        fixture = self.images.get(hashlib.sha1(data).hexdigest())
+        if fixture is not None:
+            return fixture
+        return [{'BoundingBox': box} for box in _face_grid(default_count)]
+
+    # ================= Collections =================
+    def create_collection(self, CollectionId, **kwargs):
+        self._call('create_collection')
+        with self._lock:
+            if CollectionId in self.collections:
+                raise self.exceptions.ResourceAlreadyExistsException(
+                    f'The collection id: {CollectionId} already exists', 'CreateCollection')
+            self.collections[CollectionId] = {}
+        return {'StatusCode': 200, 'CollectionArn': f'aws:rekognition:fake:collection/{CollectionId}',
+                'FaceModelVersion': '6.0'}
+
+    def delete_collection(self, CollectionId, **kwargs):
+        self._call('delete_collection')
+        with self._lock:
+            if self.collections.pop(CollectionId, None) is None:
+                raise self.exceptions.ResourceNotFoundException(
+                    f'The collection id: {CollectionId} does not exist', 'DeleteCollection')
+        return {'StatusCode': 200}
+
+    def list_collections(self, MaxResults=1000, NextToken=None, **kwargs):
+        self._call('list_collections')
+        with self._lock:
+            names = sorted(self.collections)
+        start = int(NextToken or 0)
+        page = names[start:start + MaxResults]
+        response = {'CollectionIds': page, 'FaceModelVersions': ['6.0'] * len(page)}
+        if start + MaxResults < len(names):
+            response['NextToken'] = str(start + MaxResults)
+        return response
+
+    # ================= Faces =================
+    def index_faces(self, CollectionId, Image, ExternalImageId=None, **kwargs):
+        self._call('index_faces')
+        data = self._image_bytes(Image, 'IndexFaces')
+        records = []
+        with self._lock:
+            faces = self._faces(CollectionId, 'IndexFaces')
+            # an enrollment photo without a fixture holds one face
+            for detected in self._detected(data, 1)[:kwargs.get('MaxFaces', 100)]:
+                face_id = str(uuid.uuid4())
+                faces[face_id] = ExternalImageId
+                records.append({'Face': {'FaceId': face_id, 'BoundingBox': detected['BoundingBox'],
+                                         'ImageId': str(uuid.uuid4()), 'ExternalImageId': ExternalImageId,
+                                         'Confidence': 99.9},
+                                'FaceDetail': {'BoundingBox': detected['BoundingBox'], 'Confidence': 99.9}})
+        return {'FaceRecords': records, 'UnindexedFaces': [], 'FaceModelVersion': '6.0'}
+
+    def detect_faces(self, Image, Attributes=None, **kwargs):
+        self._call('detect_faces')
+        data = self._image_bytes(Image, 'DetectFaces')
+        details = [{'BoundingBox': detected['BoundingBox'],
+                    'Confidence': detected.get('Confidence', 99.5),
+                    'Quality': {'Brightness': 80.0, 'Sharpness': 80.0},
+                    'Pose': {'Roll': 0.0, 'Yaw': 0.0, 'Pitch': 0.0},
+                    'Landmarks': []}
+                   for detected in self._detected(data, self.faces_per_image)]
+        return {'FaceDetails': details}
+
+    def search_faces_by_image(self, CollectionId, Image, FaceMatchThreshold=80, MaxFaces=1, **kwargs):
+        self._call('search_faces_by_image')
+        data = self._image_bytes(Image, 'SearchFacesByImage')
+        with self._lock:
+            faces = sorted(self._faces(CollectionId, 'SearchFacesByImage').items())
+        digest = int(hashlib.sha1(data).hexdigest(), 16)
+        response = {'SearchedFaceBoundingBox': {'Left': 0.1, 'Top': 0.1, 'Width': 0.8, 'Height': 0.8},
+                    'SearchedFaceConfidence': 99.9, 'FaceMatches': [], 'FaceModelVersion': '6.0'}
+        if faces and (digest % 1000) / 1000 < self.match_rate:
+            face_id, name = faces[digest // 1000 % len(faces)]
+            similarity = 90.0 + (digest // 7 % 1000) / 100
+            if similarity >= FaceMatchThreshold:
+                response['FaceMatches'] = [{'Similarity': similarity,
+                                            'Face': {'FaceId': face_id, 'ExternalImageId': name,
+                                                     'Confidence': 99.9}}][:MaxFaces]
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {'calls': dict(self.calls), 'throttled': dict(self.throttled),
+                    'collections': {name: len(faces) for name, faces in self.collections.items()}}
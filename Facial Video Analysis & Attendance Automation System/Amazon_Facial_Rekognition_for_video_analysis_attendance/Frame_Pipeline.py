@@ -0,0 +1,215 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+
+from Face_Engine import recognize_faces
+from Frame_Draw import draw_faces, encode_frame
+from Face_Tracker import FaceTracker
+from Motion_Gate import MotionGate
+from Rate_Controller import rate_controller
+import Metrics
+
+ENCODER_QUEUE_SIZE = 2     # captured frames waiting to be encoded
+RECOGNITION_QUEUE_SIZE = 1  # recognition always works on the newest frame
+JOIN_TIMEOUT = 5
+
+
+class DropQueue:
+    """Bounded queue that drops the oldest item instead of blocking the producer"""
+
+    def __init__(self, maxsize):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Return the oldest item, or None when the queue is closed or the wait timed out"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self.closed, timeout)
+            return self._items.popleft() if self._items else None
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class CaptureThread(threading.Thread):
+    """Read frames from a camera and hand each one to every subscribed queue.
+
+    source is a device index, a URL / file path or an already opened
+    cv2.VideoCapture; only captures opened here are released here.
+    """
+
+    def __init__(self, source=0):
+        super().__init__(name=f'capture-{source}', daemon=True)
+        self.source = source
+        self.subscribers = []
+        self.frames_read = 0
+        self.fps = 0.0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def subscribe(self, maxsize):
+        queue = DropQueue(maxsize)
+        with self._lock:
+            self.subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            if queue in self.subscribers:
+                self.subscribers.remove(queue)
+        queue.close()
+
+    def run(self):
+        owns_capture = not isinstance(self.source, cv2.VideoCapture)
+        cap = cv2.VideoCapture(self.source) if owns_capture else self.source
+        started = time.monotonic()
+        try:
+            if not cap.isOpened():
+                print(f"❌ Could not open video source {self.source}.")
+                return
+            while not self._stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                self.frames_read += 1
+                self.fps = self.frames_read / max(time.monotonic() - started, 1e-6)
+                with self._lock:
+                    subscribers = list(self.subscribers)
+                for queue in subscribers:
+                    queue.put(frame)
+        finally:
+            if owns_capture:
+                cap.release()
+            with self._lock:
+                subscribers, self.subscribers = self.subscribers, []
+            for queue in subscribers:
+                queue.close()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class RecognitionWorker(threading.Thread):
+    """Recognize the newest captured frame and keep the latest results.
+
+    Frames that arrive while a recognition is running replace each other in
+    a one slot queue, so the worker never falls behind the camera.
+    """
+
+    def __init__(self, frames, collection_name, on_result=None):
+        super().__init__(name=f'recognition-{collection_name}', daemon=True)
+        self.frames = frames
+        self.collection_name = collection_name
+        self.on_result = on_result
+        self.tracker = FaceTracker()
+        self.gate = MotionGate(controller=rate_controller)
+        self.faces = []
+        self.frames_recognized = 0
+        self._lock = threading.Lock()
+
+    def run(self):
+        while True:
+            frame = self.frames.get()
+            if frame is None:
+                if self.frames.closed:
+                    break
+                continue
+            if not self.gate.should_process(frame):
+                continue
+            try:
+                with Metrics.timer('recognize'):
+                    faces = recognize_faces(frame, self.collection_name, self.tracker)
+            except Exception as e:
+                print(f"⚠ Rekognition error in RecognitionWorker: {e}")
+                continue
+            faces = [(box, name) for box, name in faces if name]
+            with self._lock:
+                self.faces = faces
+            self.frames_recognized += 1
+            if self.on_result:
+                self.on_result(faces)
+
+    def latest(self):
+        with self._lock:
+            return self.faces
+
+    def stats(self):
+        return {
+            'collection': self.collection_name,
+            'frames_skipped': self.frames.dropped,
+            'frames_recognized': self.frames_recognized,
+            'tracker_searches': self.tracker.searches,
+            'tracker_reused': self.tracker.reused,
+            'motion_gate': self.gate.stats(),
+        }
+
+
+def mjpeg_part(jpeg_bytes):
+    return (b'--frame\r\n'
+            b'Content-Type: image/jpeg\r\n\r\n' + jpeg_bytes + b'\r\n')
+
+
+class LivePipeline:
+    """Capture, recognition and encoding of one live stream on separate threads.
+
+    The stream is encoded at the camera's frame rate with the most recent
+    recognition results drawn on every frame, while recognition runs as
+    fast as the API allows on the newest frame. Pass capture to run on a
+    CaptureThread shared with other pipelines; it is then left running
+    when this pipeline stops.
+    """
+
+    def __init__(self, collection_name, source=0, on_result=None, capture=None):
+        self.owns_capture = capture is None
+        self.capture = CaptureThread(source) if capture is None else capture
+        self.worker = RecognitionWorker(self.capture.subscribe(RECOGNITION_QUEUE_SIZE),
+                                        collection_name, on_result)
+        self.encoder_frames = self.capture.subscribe(ENCODER_QUEUE_SIZE)
+
+    def start(self):
+        self.worker.start()
+        if self.owns_capture:
+            self.capture.start()
+        return self
+
+    def frames(self):
+        """Yield multipart JPEG chunks until the camera stops or the client goes away"""
+        try:
+            while True:
+                frame = self.encoder_frames.get()
+                if frame is None:
+                    break
+                faces = self.worker.latest()
+                if faces:
+                    # the recognition worker may still be reading this frame
+                    with Metrics.timer('draw'):
+                        frame = draw_faces(frame.copy(), faces)
+                with Metrics.timer('imencode'):
+                    jpeg_bytes = encode_frame(frame)
+                if jpeg_bytes:
+                    yield mjpeg_part(jpeg_bytes)
+        finally:
+            self.stop()
+
+    def stop(self):
+        if self.owns_capture:
+            self.capture.stop()
+            if self.capture.is_alive():
+                self.capture.join(JOIN_TIMEOUT)
+        self.capture.unsubscribe(self.encoder_frames)
+        self.capture.unsubscribe(self.worker.frames)
+        if self.worker.is_alive():
+            self.worker.join(JOIN_TIMEOUT)
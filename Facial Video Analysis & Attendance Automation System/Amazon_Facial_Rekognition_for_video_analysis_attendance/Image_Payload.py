@@ -0,0 +1,109 @@
+import io
+import logging
+import threading
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import Metrics
+
+# ================= Payload settings =================
+# Bounding boxes come back relative to the image, so whole frames can be
+# downscaled before detect_faces without changing where faces are drawn.
+MAX_FRAME_SIDE = 1280      # longest side of a frame sent to detect_faces
+MAX_CROP_SIDE = 480        # longest side of a face crop sent to search_faces_by_image
+MAX_ENROLL_SIDE = 1920     # longest side of an enrollment photo sent to index_faces
+MIN_CROP_SIDE = 80         # Rekognition rejects images smaller than 80 px
+CROP_MARGIN = 0.15         # context added around a face box, as a share of its size
+JPEG_QUALITY = 85
+
+logger = logging.getLogger(__name__)
+
+_stats_lock = threading.Lock()
+_stats = {}                # operation -> {'calls': n, 'bytes': n}
+
+
+def image_size(image):
+    """(width, height) of a PIL image or of a NumPy frame"""
+    if isinstance(image, np.ndarray):
+        return image.shape[1], image.shape[0]
+    return image.size
+
+
+def encode_jpeg(image, max_side=MAX_FRAME_SIDE, quality=JPEG_QUALITY):
+    """Downscale an image so its longest side is at most max_side and encode it as JPEG.
+
+    NumPy BGR frames are resized and encoded by OpenCV straight from their
+    buffer; PIL images go through Pillow.
+    """
+    if isinstance(image, np.ndarray):
+        height, width = image.shape[:2]
+        if max(width, height) > max_side:
+            scale = max_side / max(width, height)
+            image = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        success, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not success:
+            raise ValueError('Could not encode frame as JPEG')
+        return buffer.tobytes()
+
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    if max(image.size) > max_side:
+        scale = max_side / max(image.size)
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                             Image.BILINEAR)
+    bytes_array = io.BytesIO()
+    image.save(bytes_array, format='JPEG', quality=quality)
+    return bytes_array.getvalue()
+
+
+def image_request(image, operation, max_side=MAX_FRAME_SIDE, quality=JPEG_QUALITY):
+    """Build a Rekognition Image request for operation and account for its size"""
+    with Metrics.timer('encode_payload'):
+        payload = encode_jpeg(image, max_side, quality)
+    record_payload(operation, len(payload))
+    return {'Bytes': payload}
+
+
+def record_payload(operation, size):
+    with _stats_lock:
+        entry = _stats.setdefault(operation, {'calls': 0, 'bytes': 0})
+        entry['calls'] += 1
+        entry['bytes'] += size
+    logger.info('%s payload: %d bytes', operation, size)
+
+
+def payload_stats():
+    """Calls and bytes sent so far, per Rekognition operation"""
+    with _stats_lock:
+        return {operation: dict(entry) for operation, entry in _stats.items()}
+
+
+def face_crop(image, box, margin=CROP_MARGIN, min_side=MIN_CROP_SIDE):
+    """Crop a face with some margin and upscale it if it is below Rekognition's minimum size.
+
+    For NumPy frames the crop is a view into the frame, not a copy.
+    """
+    img_width, img_height = image_size(image)
+    width = img_width * box['Width']
+    height = img_height * box['Height']
+    left = int(max(0, img_width * box['Left'] - width * margin))
+    top = int(max(0, img_height * box['Top'] - height * margin))
+    right = max(left + 1, int(min(img_width, img_width * box['Left'] + width * (1 + margin))))
+    bottom = max(top + 1, int(min(img_height, img_height * box['Top'] + height * (1 + margin))))
+
+    if isinstance(image, np.ndarray):
+        cropped = image[top:bottom, left:right]
+        if min(cropped.shape[:2]) < min_side:
+            scale = min_side / min(cropped.shape[:2])
+            cropped = cv2.resize(cropped, (round(cropped.shape[1] * scale), round(cropped.shape[0] * scale)),
+                                 interpolation=cv2.INTER_CUBIC)
+        return cropped
+
+    cropped = image.crop((left, top, right, bottom))
+    if min(cropped.size) < min_side:
+        scale = min_side / min(cropped.size)
+        cropped = cropped.resize((round(cropped.width * scale), round(cropped.height * scale)), Image.BICUBIC)
+    return cropped
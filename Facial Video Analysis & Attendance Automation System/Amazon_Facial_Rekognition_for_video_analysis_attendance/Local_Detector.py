@@ -0,0 +1,111 @@
+import threading
+
+import cv2
+import numpy as np
+
+# ================= Detector settings =================
+# off   - every frame goes to detect_faces
+# gate  - frames without a local candidate face skip detect_faces
+# local - local boxes are searched directly and detect_faces is never called
+MODES = ('off', 'gate', 'local')
+CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+DETECT_WIDTH = 640         # frames are scaled down to this width before detection
+SCALE_FACTOR = 1.1
+MIN_NEIGHBORS = 4          # lower finds more faces but also more false positives
+MIN_FACE_SIZE = 20         # pixels, at DETECT_WIDTH
+YUNET_SCORE_THRESHOLD = 0.6
+
+
+class LocalDetector:
+    """CPU face detector run in front of Rekognition.
+
+    Uses the Haar cascade shipped with OpenCV, or OpenCV's YuNet DNN
+    detector when a model file is given (OpenCV builds without the Haar
+    cascade API need the latter).
+    """
+
+    def __init__(self, mode='off', model_path='', cascade_path=CASCADE_PATH, detect_width=DETECT_WIDTH,
+                 scale_factor=SCALE_FACTOR, min_neighbors=MIN_NEIGHBORS, min_face_size=MIN_FACE_SIZE):
+        if mode not in MODES:
+            raise ValueError(f"Local detector mode must be one of {', '.join(MODES)}, not {mode!r}")
+        self.mode = mode
+        self.model_path = model_path
+        self.cascade_path = cascade_path
+        self.detect_width = detect_width
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_face_size = min_face_size
+        self.frames_checked = 0
+        self.frames_with_faces = 0
+        self.false_positives = 0
+        self._local = threading.local()   # OpenCV detectors are not safe to share between threads
+        self._lock = threading.Lock()
+
+    def _scaled(self, image):
+        """BGR copy of the image scaled down to detect_width"""
+        if not isinstance(image, np.ndarray):
+            image = cv2.cvtColor(np.asarray(image.convert('RGB')), cv2.COLOR_RGB2BGR)
+        height, width = image.shape[:2]
+        if width > self.detect_width:
+            image = cv2.resize(image, (self.detect_width, max(1, int(height * self.detect_width / width))),
+                               interpolation=cv2.INTER_AREA)
+        return image
+
+    def _detect_haar(self, frame):
+        classifier = getattr(self._local, 'classifier', None)
+        if classifier is None:
+            if not hasattr(cv2, 'CascadeClassifier'):
+                raise ValueError("This OpenCV build has no Haar cascades; set local_detector_model to a YuNet model")
+            classifier = cv2.CascadeClassifier(self.cascade_path)
+            if classifier.empty():
+                raise ValueError(f"Could not load face cascade from {self.cascade_path}")
+            self._local.classifier = classifier
+        gray = cv2.equalizeHist(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame)
+        return classifier.detectMultiScale(gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+                                           minSize=(self.min_face_size, self.min_face_size))
+
+    def _detect_yunet(self, frame):
+        height, width = frame.shape[:2]
+        detector = getattr(self._local, 'yunet', None)
+        if detector is None:
+            detector = cv2.FaceDetectorYN.create(self.model_path, '', (width, height), YUNET_SCORE_THRESHOLD)
+            self._local.yunet = detector
+        detector.setInputSize((width, height))
+        _, faces = detector.detect(frame)
+        if faces is None:
+            return []
+        return [face[:4] for face in faces if min(face[2], face[3]) >= self.min_face_size]
+
+    def detect(self, image):
+        """Return candidate faces as relative Rekognition style bounding boxes"""
+        frame = self._scaled(image)
+        height, width = frame.shape[:2]
+        faces = self._detect_yunet(frame) if self.model_path else self._detect_haar(frame)
+        boxes = [{'Left': max(0.0, float(x) / width), 'Top': max(0.0, float(y) / height),
+                  'Width': float(w) / width, 'Height': float(h) / height}
+                 for x, y, w, h in faces]
+        with self._lock:
+            self.frames_checked += 1
+            if boxes:
+                self.frames_with_faces += 1
+        return boxes
+
+    def note_false_positive(self):
+        """Count a local box in which Rekognition found no face"""
+        with self._lock:
+            self.false_positives += 1
+
+    def stats(self):
+        with self._lock:
+            checked = self.frames_checked
+            hits = self.frames_with_faces
+            false_positives = self.false_positives
+        return {
+            'mode': self.mode,
+            'frames_checked': checked,
+            'frames_with_faces': hits,
+            'frames_without_faces': checked - hits,
+            'hit_rate': round(hits / checked, 3) if checked else 0.0,
+            'detect_calls_skipped': checked if self.mode == 'local' else checked - hits,
+            'false_positives': false_positives,
+        }
@@ -0,0 +1,270 @@
+import os
+import atexit
+import threading
+
+import cv2
+import numpy as np
+
+import Metrics
+from AWS_Client import get_settings
+
+# ================= Local embedding settings =================
+# With local_embeddings = on, enrolled faces are also embedded with
+# OpenCV's SFace model (embedding_model) after being located and aligned
+# with YuNet (local_detector_model). Faces searched later are matched
+# against those embeddings first and only go to search_faces_by_image
+# when the best cosine similarity is below embedding_threshold.
+EMBEDDINGS_DIR = 'embeddings'   # one <collection>.npz index per collection
+EMBEDDING_SIZE = 128
+MATCH_THRESHOLD = 0.5      # cosine similarity; SFace's same-person threshold is 0.363, higher keeps only confident matches
+DETECT_SCORE_THRESHOLD = 0.6
+MAX_DETECT_SIDE = 640      # enrollment photos are scaled down to this before YuNet
+SAVE_DELAY = 2.0           # seconds enrollments are collected before their index is written
+INITIAL_CAPACITY = 64      # rows allocated for a new index, doubled whenever it is full
+
+
+def _bgr(image):
+    """BGR NumPy array of a PIL image, NumPy frame or encoded image bytes"""
+    if isinstance(image, (bytes, bytearray)):
+        return cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
+    if isinstance(image, np.ndarray):
+        return image
+    return cv2.cvtColor(np.asarray(image.convert('RGB')), cv2.COLOR_RGB2BGR)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def write_index(path, matrix, names):
+    """Write an index file atomically and return its new modification time"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temporary = path + '.tmp.npz'
+    np.savez(temporary, matrix=matrix, names=np.array(names))
+    os.replace(temporary, path)
+    return _mtime(path)
+
+
+class EmbeddingIndex:
+    """Unit length embeddings of one collection as a float32 matrix with a name per row.
+
+    Rows live in a preallocated buffer that doubles when full, so adding
+    a face does not copy the whole matrix.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.names = []
+        self._rows = np.empty((INITIAL_CAPACITY, EMBEDDING_SIZE), np.float32)
+        self.mtime = _mtime(path) if path else None
+        if self.mtime is not None:
+            with np.load(path) as data:
+                self._rows = data['matrix'].astype(np.float32)
+                self.names = [str(name) for name in data['names']]
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def matrix(self):
+        return self._rows[:len(self.names)]
+
+    def add(self, name, vector):
+        count = len(self.names)
+        if count == len(self._rows):
+            grown = np.empty((max(INITIAL_CAPACITY, 2 * count), EMBEDDING_SIZE), np.float32)
+            grown[:count] = self._rows
+            self._rows = grown
+        self._rows[count] = vector.reshape(-1)
+        self.names.append(name)
+
+    def best(self, vector):
+        """(name, cosine similarity) of the closest row, or (None, 0.0) for an empty index"""
+        if not self.names:
+            return None, 0.0
+        scores = self.matrix @ vector
+        index = int(np.argmax(scores))
+        return self.names[index], float(scores[index])
+
+    def snapshot(self):
+        """(matrix, names) copies that can be written while the index keeps changing"""
+        return self.matrix.copy(), list(self.names)
+
+    def save(self):
+        if self.path:
+            self.mtime = write_index(self.path, *self.snapshot())
+
+
+class LocalMatcher:
+    """Match faces against locally computed embeddings before asking Rekognition.
+
+    OpenCV models are not safe to share between threads, so every thread
+    loads its own YuNet and SFace instances. Enrollments are written to
+    disk save_delay seconds after the first unsaved one, in one write per
+    collection, and an index is reloaded when another process rewrote its
+    file.
+    """
+
+    def __init__(self, enabled=False, model_path='', detector_model_path='', threshold=MATCH_THRESHOLD,
+                 directory=EMBEDDINGS_DIR, save_delay=SAVE_DELAY):
+        if enabled and not (model_path and detector_model_path):
+            raise ValueError("local_embeddings = on needs embedding_model (SFace) and local_detector_model (YuNet)")
+        self.enabled = enabled
+        self.model_path = model_path
+        self.detector_model_path = detector_model_path
+        self.threshold = threshold
+        self.directory = directory
+        self.save_delay = save_delay
+        self.indexes = {}
+        self.searches = 0
+        self.lookups = 0
+        self.local_matches = 0
+        self.fallbacks = 0
+        self.no_face = 0
+        self.enrolled = 0
+        self.saves = 0
+        self._dirty = set()        # collections with enrollments not written yet
+        self._save_timer = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # taken before self._lock, never after it
+        # write pending enrollments when the process exits
+        atexit.register(self.flush)
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(str(settings['local_embeddings']).lower() in ('on', 'true', '1', 'yes'),
+                   settings['embedding_model'], settings['local_detector_model'], settings['embedding_threshold'])
+
+    def _models(self):
+        models = getattr(self._local, 'models', None)
+        if models is None:
+            detector = cv2.FaceDetectorYN.create(self.detector_model_path, '', (320, 320), DETECT_SCORE_THRESHOLD)
+            recognizer = cv2.FaceRecognizerSF.create(self.model_path, '')
+            models = self._local.models = (detector, recognizer)
+        return models
+
+    def embed(self, image):
+        """Unit length embedding of the largest face in image, or None when no face is found"""
+        frame = _bgr(image)
+        if frame is None:
+            return None
+        height, width = frame.shape[:2]
+        if max(height, width) > MAX_DETECT_SIDE:
+            scale = MAX_DETECT_SIDE / max(height, width)
+            frame = cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+            height, width = frame.shape[:2]
+        detector, recognizer = self._models()
+        detector.setInputSize((width, height))
+        _, faces = detector.detect(frame)
+        if faces is None or not len(faces):
+            return None
+        face = max(faces, key=lambda f: f[2] * f[3])
+        vector = recognizer.feature(recognizer.alignCrop(frame, face)).reshape(-1)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def _path(self, collection_name):
+        return os.path.join(self.directory, f'{collection_name}.npz')
+
+    def _index(self, collection_name):
+        """Caller holds self._lock; unsaved enrollments win over a file rewritten by another process"""
+        index = self.indexes.get(collection_name)
+        if index is None or (collection_name not in self._dirty and index.mtime != _mtime(index.path)):
+            index = self.indexes[collection_name] = EmbeddingIndex(self._path(collection_name))
+        return index
+
+    def enroll(self, image, name, collection_name):
+        """Add the largest face of an enrollment image to the collection's index; False when none was found"""
+        if not self.enabled:
+            return False
+        vector = self.embed(image)
+        if vector is None:
+            return False
+        with self._lock:
+            self._index(collection_name).add(name, vector)
+            self.enrolled += 1
+            self._dirty.add(collection_name)
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.save_delay, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+        return True
+
+    def flush(self):
+        """Write the indexes of every collection with unsaved enrollments"""
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                pending = [(self.indexes[name], *self.indexes[name].snapshot()) for name in self._dirty]
+                self._dirty.clear()
+            for index, matrix, names in pending:
+                mtime = write_index(index.path, matrix, names)
+                with self._lock:
+                    self.saves += 1
+                    if len(index) == len(names):
+                        index.mtime = mtime
+
+    def note_search(self):
+        """Count one search_face call, the base of calls_avoided_share"""
+        if self.enabled:
+            with self._lock:
+                self.searches += 1
+
+    def match(self, crop, collection_name):
+        """(name, similarity percent) of a confidently matched face crop, or None when Rekognition should decide"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            index = self._index(collection_name)
+            empty = not len(index)
+        if empty:
+            return None
+        vector = self.embed(crop)
+        with self._lock:
+            self.lookups += 1
+            if vector is None:
+                self.no_face += 1
+                outcome, name = 'no_face', None
+            else:
+                name, score = index.best(vector)
+                if score >= self.threshold:
+                    self.local_matches += 1
+                    outcome = 'matched'
+                else:
+                    self.fallbacks += 1
+                    outcome, name = 'fallback', None
+        Metrics.count('local_matches_total', outcome=outcome)
+        return None if name is None else (name, round(score * 100, 2))
+
+    def drop(self, collection_name):
+        """Forget a deleted collection's index"""
+        with self._save_lock, self._lock:
+            self.indexes.pop(collection_name, None)
+            self._dirty.discard(collection_name)
+            path = self._path(collection_name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'threshold': self.threshold,
+                'faces_enrolled': self.enrolled,
+                'index_saves': self.saves,
+                'indexed': {name: len(index) for name, index in self.indexes.items()},
+                'searches': self.searches,
+                'lookups': self.lookups,
+                'local_matches': self.local_matches,
+                'fallbacks': self.fallbacks,
+                'no_face': self.no_face,
+                'calls_avoided_share': round(self.local_matches / self.searches, 3) if self.searches else 0.0,
+            }
+
+
+local_matcher = LocalMatcher.from_settings(get_settings())
@@ -0,0 +1,177 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import nullcontext
+
+from AWS_Client import get_settings
+
+# ================= Metrics settings =================
+# Enabled with metrics = on in the [rekognition] settings (or
+# REKOGNITION_METRICS=on). When off, timer() hands out one shared no-op
+# context manager and the counters return at once.
+PREFIX = 'facial_analysis'
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# USD per call at the first Rekognition image pricing tier; the other
+# operations the app uses are free.
+PRICE_PER_CALL = {
+    'detect_faces': 0.001,
+    'search_faces_by_image': 0.001,
+    'index_faces': 0.001,
+}
+THROTTLING_ERRORS = {'ThrottlingException', 'ProvisionedThroughputExceededException', 'LimitExceededException'}
+
+enabled = str(get_settings()['metrics']).lower() in ('on', 'true', '1', 'yes')
+
+_lock = threading.Lock()
+_counters = {}             # (name, labels) -> value
+_histograms = {}           # (name, labels) -> [bucket counts..., sum, count]
+_help = {
+    'stage_seconds': ('histogram', 'Time spent per pipeline stage'),
+    'api_calls_total': ('counter', 'Rekognition calls by operation'),
+    'api_errors_total': ('counter', 'Failed Rekognition calls by operation and error code'),
+    'api_throttles_total': ('counter', 'Throttled Rekognition calls by operation'),
+    'api_bytes_sent_total': ('counter', 'Image bytes sent to Rekognition by operation'),
+    'api_estimated_cost_usd_total': ('counter', 'Estimated Rekognition cost in USD'),
+    'local_matches_total': ('counter', 'Local embedding lookups by outcome; matched ones avoid a search call'),
+}
+_NULL_TIMER = nullcontext()
+
+
+def set_enabled(flag):
+    global enabled
+    enabled = bool(flag)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def count(name, value=1, **labels):
+    if not enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(stage, seconds):
+    if not enabled:
+        return
+    key = ('stage_seconds', (('stage', stage),))
+    with _lock:
+        entry = _histograms.get(key)
+        if entry is None:
+            entry = _histograms[key] = [0] * len(BUCKETS) + [0.0, 0]
+        index = bisect_left(BUCKETS, seconds)
+        if index < len(BUCKETS):
+            entry[index] += 1
+        entry[-2] += seconds
+        entry[-1] += 1
+
+
+class _Timer:
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+def timer(stage):
+    """Context manager timing one pipeline stage"""
+    return _Timer(stage) if enabled else _NULL_TIMER
+
+
+# ================= Rekognition client proxy =================
+class InstrumentedClient:
+    """Wrap a Rekognition client to count and time every call made through it"""
+
+    def __init__(self, client):
+        self._client = client
+        self.exceptions = client.exceptions
+
+    def __getattr__(self, operation):
+        method = getattr(self._client, operation)
+        if not callable(method):
+            return method
+
+        def call(*args, **kwargs):
+            if not enabled:
+                return method(*args, **kwargs)
+            count('api_calls_total', operation=operation)
+            image = kwargs.get('Image')
+            if image and 'Bytes' in image:
+                count('api_bytes_sent_total', len(image['Bytes']), operation=operation)
+            started = time.perf_counter()
+            try:
+                response = method(*args, **kwargs)
+            except Exception as e:
+                # botocore's HTTP errors have a response attribute that is None
+                code = (getattr(e, 'response', None) or {}).get('Error', {}).get('Code', type(e).__name__)
+                count('api_errors_total', operation=operation, code=code)
+                if code in THROTTLING_ERRORS:
+                    count('api_throttles_total', operation=operation)
+                raise
+            finally:
+                observe(operation, time.perf_counter() - started)
+            # failed and throttled calls are not billed
+            if operation in PRICE_PER_CALL:
+                count('api_estimated_cost_usd_total', PRICE_PER_CALL[operation])
+            return response
+
+        return call
+
+
+# ================= Prometheus exposition =================
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs) + '}'
+
+
+def _value(value):
+    return str(value) if isinstance(value, int) else repr(round(value, 6))
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(entry) for key, entry in _histograms.items()}
+
+    lines = [f'# HELP {PREFIX}_metrics_enabled Whether metrics are being collected',
+             f'# TYPE {PREFIX}_metrics_enabled gauge',
+             f'{PREFIX}_metrics_enabled {int(enabled)}']
+    for name, (kind, help_text) in _help.items():
+        full_name = f'{PREFIX}_{name}'
+        if kind == 'counter':
+            series = sorted((labels, value) for (n, labels), value in counters.items() if n == name)
+        else:
+            series = sorted((labels, entry) for (n, labels), entry in histograms.items() if n == name)
+        if not series:
+            continue
+        lines.append(f'# HELP {full_name} {help_text}')
+        lines.append(f'# TYPE {full_name} {kind}')
+        for labels, value in series:
+            if kind == 'counter':
+                lines.append(f'{full_name}{_labels(labels)} {_value(value)}')
+                continue
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS, value):
+                cumulative += bucket
+                lines.append(f'{full_name}_bucket{_labels(labels, [("le", f"{bound:g}")])} {cumulative}')
+            lines.append(f'{full_name}_bucket{_labels(labels, [("le", "+Inf")])} {value[-1]}')
+            lines.append(f'{full_name}_sum{_labels(labels)} {_value(value[-2])}')
+            lines.append(f'{full_name}_count{_labels(labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,91 @@
+import time
+import cv2
+import numpy as np
+
+# ================= Gate settings =================
+GATE_WIDTH = 160           # frames are compared at this width, in grayscale
+PIXEL_THRESHOLD = 25       # grey level change that counts a pixel as changed
+CHANGED_FRACTION = 0.01    # share of changed pixels that means the scene changed
+MIN_INTERVAL = 0.2         # seconds between two processed frames, at most 5 per second
+MAX_INTERVAL = 10.0        # seconds after which a frame is processed even without change
+
+
+class MotionGate:
+    """Decide which frames are worth sending to Rekognition.
+
+    Each frame is downscaled, converted to grayscale and compared with the
+    last frame that was processed. Frames are processed when enough pixels
+    changed, or when MAX_INTERVAL passed so cached identities still get
+    refreshed in a static room.
+
+    With a Rate_Controller.RateController the minimum interval grows with
+    the controller's sample_interval(), so live feeds slow down when the
+    API is slow, throttling or close to the configured budget.
+    """
+
+    def __init__(self, width=GATE_WIDTH, pixel_threshold=PIXEL_THRESHOLD,
+                 changed_fraction=CHANGED_FRACTION, min_interval=MIN_INTERVAL,
+                 max_interval=MAX_INTERVAL, controller=None):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.changed_fraction = changed_fraction
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.controller = controller
+        self.reference = None
+        self.last_processed = None
+        self.last_change = 0.0
+        self.frames_seen = 0
+        self.frames_gated = 0
+        self.triggered_by_change = 0
+        self.triggered_by_timeout = 0
+
+    def _small_gray(self, frame):
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, int(height * self.width / width)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def should_process(self, frame, now=None):
+        now = time.monotonic() if now is None else now
+        self.frames_seen += 1
+        gray = self._small_gray(frame)
+
+        if self.reference is None or self.reference.shape != gray.shape:
+            self.triggered_by_change += 1
+            return self._accept(gray, now)
+
+        diff = cv2.absdiff(gray, self.reference)
+        self.last_change = float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+        elapsed = now - self.last_processed
+        min_interval = self.min_interval
+        if self.controller is not None:
+            min_interval = max(min_interval, self.controller.sample_interval())
+        if self.last_change >= self.changed_fraction and elapsed >= min_interval:
+            self.triggered_by_change += 1
+            return self._accept(gray, now)
+        if elapsed >= self.max_interval:
+            self.triggered_by_timeout += 1
+            return self._accept(gray, now)
+
+        self.frames_gated += 1
+        return False
+
+    def _accept(self, gray, now):
+        self.reference = gray
+        self.last_processed = now
+        if self.controller is not None:
+            self.controller.note_frame()
+        return True
+
+    def stats(self):
+        return {
+            'frames_seen': self.frames_seen,
+            'frames_processed': self.frames_seen - self.frames_gated,
+            'frames_gated': self.frames_gated,
+            'triggered_by_change': self.triggered_by_change,
+            'triggered_by_timeout': self.triggered_by_timeout,
+            'last_change': round(self.last_change, 4),
+        }
@@ -0,0 +1,241 @@
+import time
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import Metrics
+from AWS_Client import get_settings
+from Face_Engine import recognize_faces
+from Face_Tracker import FaceTracker
+from Frame_Draw import draw_faces, encode_frame
+from Frame_Pipeline import CaptureThread, mjpeg_part, ENCODER_QUEUE_SIZE, JOIN_TIMEOUT
+from Motion_Gate import MotionGate
+from Rate_Controller import rate_controller
+
+# ================= Scheduler settings =================
+# Sources come from the camera_sources setting as 'name=source@collection'
+# entries separated by ';', e.g. 'room101=0@class_a;room102=rtsp://cam2/stream@class_b'.
+RECOGNITION_WORKERS = 4    # frames recognized at once, shared by every source
+MIN_DISPATCH_INTERVAL = 0.05  # seconds between two frames handed to the workers, at least
+ACTIVITY_WEIGHT = 4.0      # how much more often a source showing motion is picked than an idle one
+POLL_INTERVAL = 0.01       # seconds the scheduler sleeps when no source has a frame due
+LAG_SAMPLES = 100          # recent lags kept per source for its stats
+STREAM_POLL = 1.0          # seconds a viewer waits for a frame before checking the camera is still running
+
+
+def parse_sources(value):
+    """'name=source@collection;...' -> [(name, source, collection)]; numeric sources are device indices"""
+    sources = []
+    for entry in filter(None, (part.strip() for part in str(value).split(';'))):
+        name, rest = entry.split('=', 1)
+        source, collection_name = rest.rsplit('@', 1)
+        sources.append((name.strip(), int(source) if source.strip().isdigit() else source.strip(),
+                        collection_name.strip()))
+    return sources
+
+
+class Source:
+    """One camera: its capture thread, motion gate, tracker and latest results"""
+
+    def __init__(self, name, source, collection_name):
+        self.name = name
+        self.collection_name = collection_name
+        self.capture = CaptureThread(source)
+        self.frames = self.capture.subscribe(1)
+        self.gate = MotionGate(min_interval=0)
+        self.tracker = FaceTracker()
+        self.faces = []
+        self.due = None            # (frame, picked_up_at) waiting for a recognition worker
+        self.busy = False
+        self.activity = 0.0        # EWMA of the motion gate's changed share
+        self.last_dispatched = 0.0
+        self.frames_recognized = 0
+        self.errors = 0
+        self.lags = deque(maxlen=LAG_SAMPLES)
+        self.started = None
+        self._lock = threading.Lock()
+
+    def poll(self, now):
+        """Pick up the newest captured frame and keep it if the gate says it is due"""
+        frame = self.frames.get(0)
+        if frame is None:
+            return
+        if self.due is not None:
+            self.due = (frame, now)  # already due: a newer frame replaces it
+            return
+        if self.gate.should_process(frame, now):
+            self.due = (frame, now)
+        self.activity += 0.2 * (self.gate.last_change - self.activity)
+
+    def priority(self, now):
+        """Longer waits and more motion rank higher"""
+        activity = min(1.0, self.activity / self.gate.changed_fraction)
+        return (now - self.last_dispatched) * (1 + ACTIVITY_WEIGHT * activity)
+
+    def latest(self):
+        with self._lock:
+            return self.faces
+
+    def stats(self):
+        now = time.monotonic()
+        lags = sorted(self.lags)
+        elapsed = max(now - self.started, 1e-6) if self.started else 0
+        return {
+            'name': self.name,
+            'collection': self.collection_name,
+            'capturing': self.capture.is_alive(),
+            'capture_fps': round(self.capture.fps, 1),
+            'frames_read': self.capture.frames_read,
+            'frames_skipped': self.frames.dropped,
+            'frames_recognized': self.frames_recognized,
+            'recognition_fps': round(self.frames_recognized / elapsed, 2) if elapsed else 0.0,
+            'errors': self.errors,
+            'activity': round(self.activity, 4),
+            'lag_ms_p50': round(lags[len(lags) // 2] * 1000, 1) if lags else None,
+            'lag_ms_max': round(lags[-1] * 1000, 1) if lags else None,
+            'faces': len(self.faces),
+        }
+
+
+class MultiCamera:
+    """Capture N sources, each on its own thread, and recognize them with one shared worker pool.
+
+    A scheduler thread hands at most one frame per source at a time to the
+    workers, paced by the process wide rate controller so all sources
+    together keep to the API budget. When several sources have a frame due,
+    the one that waited longest wins, with waits of sources showing motion
+    counted up to 1 + ACTIVITY_WEIGHT times.
+    """
+
+    def __init__(self, sources, workers=RECOGNITION_WORKERS, on_result=None, controller=rate_controller):
+        self.sources = {name: Source(name, source, collection_name) for name, source, collection_name in sources}
+        self.workers = workers
+        self.on_result = on_result
+        self.controller = controller
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='multi-recognition')
+        self.dispatched = 0
+        self._slots = threading.Semaphore(workers)
+        self._stop_event = threading.Event()
+        self._scheduler = threading.Thread(target=self._schedule, name='multi-scheduler', daemon=True)
+
+    def start(self):
+        now = time.monotonic()
+        for source in self.sources.values():
+            source.started = now
+            source.capture.start()
+        self._scheduler.start()
+        return self
+
+    def dispatch_interval(self):
+        """Seconds between dispatches so that all sources together fit the API budget"""
+        latency_floor = self.controller.sample_interval() / self.workers
+        return max(MIN_DISPATCH_INTERVAL, self.controller.budget_interval(), latency_floor)
+
+    def _schedule(self):
+        next_dispatch = 0.0
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            for source in self.sources.values():
+                source.poll(now)
+            ready = [s for s in self.sources.values() if s.due is not None and not s.busy]
+            if not ready or now < next_dispatch or not self._slots.acquire(blocking=False):
+                time.sleep(POLL_INTERVAL)
+                continue
+            source = max(ready, key=lambda s: s.priority(now))
+            frame, picked_up = source.due
+            source.due = None
+            source.busy = True
+            source.last_dispatched = now
+            self.dispatched += 1
+            if self.controller is not None:
+                self.controller.note_frame()
+            self.pool.submit(self._recognize, source, frame, picked_up)
+            next_dispatch = now + self.dispatch_interval()
+
+    def _recognize(self, source, frame, picked_up):
+        try:
+            with Metrics.timer('recognize'):
+                faces = recognize_faces(frame, source.collection_name, source.tracker)
+            faces = [(box, name) for box, name in faces if name]
+            with source._lock:
+                source.faces = faces
+            source.frames_recognized += 1
+            source.lags.append(time.monotonic() - picked_up)
+            if self.on_result:
+                self.on_result(source.collection_name, faces)
+        except Exception as e:
+            source.errors += 1
+            print(f"⚠ Rekognition error for camera {source.name}: {e}")
+        finally:
+            source.busy = False
+            self._slots.release()
+
+    def stream(self, name):
+        """Generator of multipart JPEG chunks of one source with its latest results drawn"""
+        source = self.sources[name]
+        frames = source.capture.subscribe(ENCODER_QUEUE_SIZE)
+        try:
+            while True:
+                frame = frames.get(STREAM_POLL)
+                if frame is None:
+                    if frames.closed or not source.capture.is_alive():
+                        break
+                    continue
+                faces = source.latest()
+                if faces:
+                    frame = draw_faces(frame.copy(), faces)
+                jpeg_bytes = encode_frame(frame)
+                if jpeg_bytes:
+                    yield mjpeg_part(jpeg_bytes)
+        finally:
+            source.capture.unsubscribe(frames)
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'dispatched': self.dispatched,
+            'dispatch_interval': round(self.dispatch_interval(), 3),
+            'sources': [source.stats() for source in self.sources.values()],
+        }
+
+    def stop(self):
+        self._stop_event.set()
+        if self._scheduler.is_alive():
+            self._scheduler.join(JOIN_TIMEOUT)
+        for source in self.sources.values():
+            source.capture.stop()
+        for source in self.sources.values():
+            if source.capture.is_alive():
+                source.capture.join(JOIN_TIMEOUT)
+        self.pool.shutdown(wait=True)
+
+
+def from_settings(on_result=None):
+    """MultiCamera for the camera_sources setting, or None when it is empty"""
+    settings = get_settings()
+    sources = parse_sources(settings['camera_sources'])
+    if not sources:
+        return None
+    return MultiCamera(sources, settings['recognition_workers'], on_result)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recognize faces on several cameras with one shared budget')
+    parser.add_argument('sources', nargs='+', help='name=source@collection, source being a device index, URL or file')
+    parser.add_argument('--workers', type=int, default=RECOGNITION_WORKERS)
+    parser.add_argument('--report-every', type=float, default=5.0, help='seconds between stats lines')
+    args = parser.parse_args()
+
+    cameras = MultiCamera(parse_sources(';'.join(args.sources)), args.workers).start()
+    try:
+        while any(source.capture.is_alive() for source in cameras.sources.values()):
+            time.sleep(args.report_every)
+            for entry in cameras.stats()['sources']:
+                print(f"{entry['name']:12s} capture {entry['capture_fps']:5.1f} fps  "
+                      f"recognition {entry['recognition_fps']:5.2f} fps  lag p50 {entry['lag_ms_p50']} ms  "
+                      f"activity {entry['activity']:.3f}  errors {entry['errors']}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cameras.stop()
@@ -0,0 +1,256 @@
+import time
+import random
+import threading
+
+from botocore.exceptions import EndpointConnectionError, ConnectTimeoutError, ReadTimeoutError, ConnectionClosedError
+
+from AWS_Client import get_settings
+from Metrics import PRICE_PER_CALL, THROTTLING_ERRORS
+
+# ================= Rate controller settings =================
+# Ceilings come from the [rekognition] settings: calls_per_minute and
+# cost_per_hour (USD) apply to the whole process, 0 means no ceiling;
+# operation_rates sets per-operation calls per second as
+# 'detect_faces=50;search_faces_by_image=50'.
+DEFAULT_OPERATION_RATE = 50.0  # calls per second, the default Rekognition quota in the larger regions
+DEFAULT_OPERATION_RATES = {'index_faces': 5.0}  # operations with a lower default quota
+BURST_SECONDS = 2.0        # a bucket holds this many seconds of its rate
+MIN_OPERATION_RATE = 0.5   # calls per second an operation is never throttled below
+RECOVERY_STEP = 0.2        # calls per second an operation's rate regains per successful call
+BACKOFF_BASE = 0.25        # seconds, doubled on every retry, with full jitter
+BACKOFF_CAP = 5.0
+MAX_SAMPLE_INTERVAL = 10.0  # seconds between live frames sent for recognition, at most
+PRESSURE_DECAY = 0.9       # share of throttle pressure kept after every successful call
+EWMA_WEIGHT = 0.2
+# Server side failures retried like throttles, but without slowing down;
+# botocore's own retries are off for the client behind the controller.
+TRANSIENT_ERRORS = {'InternalServerError', 'ServiceUnavailableException', 'ServiceUnavailable'}
+# Network failures botocore used to retry itself
+TRANSIENT_EXCEPTIONS = (EndpointConnectionError, ConnectTimeoutError, ReadTimeoutError, ConnectionClosedError)
+
+
+def _error_code(error):
+    # botocore's HTTP errors have a response attribute that is None
+    return (getattr(error, 'response', None) or {}).get('Error', {}).get('Code')
+
+
+def is_throttle(error):
+    return _error_code(error) in THROTTLING_ERRORS
+
+
+def is_transient(error):
+    return isinstance(error, TRANSIENT_EXCEPTIONS) or _error_code(error) in TRANSIENT_ERRORS
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at rate tokens per second"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate * BURST_SECONDS)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, tokens=1.0):
+        """Take tokens now, possibly going into debt, and return the seconds to wait for them"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= tokens
+            return max(0.0, -self.tokens / self.rate) if self.rate > 0 else 0.0
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+
+class RateController:
+    """Process wide budget for Rekognition calls.
+
+    Every call waits for a token of its operation's bucket and of the
+    global calls-per-minute and cost-per-hour buckets. A throttled call
+    halves its operation's rate (increased again by RECOVERY_STEP per
+    success), is retried with exponential backoff and full jitter, and
+    raises the throttle pressure that stretches sample_interval() for the
+    live feeds. Transient server errors, connection errors and read
+    timeouts are retried the same way without touching the rates.
+
+    Processes splitting one budget, like the workers of
+    Video_File_Analysis, each call set_share() with their part of it.
+    """
+
+    def __init__(self, calls_per_minute=0, cost_per_hour=0.0, operation_rates=None, retries=2):
+        self.retries = retries
+        self.calls_per_minute = calls_per_minute
+        self.cost_per_hour = cost_per_hour
+        self.operation_rates = dict(DEFAULT_OPERATION_RATES, **(operation_rates or {}))
+        self.share = 1.0
+        self._build_buckets()
+        self.latency = {}          # operation -> EWMA seconds
+        self.pressure = 1.0        # >= 1, multiplied on throttles and decayed on success
+        self.calls_per_frame = 1.0
+        self._calls_since_frame = 0
+        self.calls = 0
+        self.throttles = 0
+        self.retried = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings):
+        rates = {}
+        for part in str(settings['operation_rates']).split(';'):
+            if '=' in part:
+                operation, rate = part.split('=', 1)
+                rates[operation.strip()] = float(rate)
+        return cls(settings['calls_per_minute'], settings['cost_per_hour'], rates, settings['throttle_retries'])
+
+    def _build_buckets(self):
+        """Caller holds self._lock, or is __init__"""
+        self.max_rates = {operation: rate * self.share for operation, rate in self.operation_rates.items()}
+        self.default_rate = DEFAULT_OPERATION_RATE * self.share
+        self.buckets = {}
+        self.calls_bucket = None
+        if self.calls_per_minute:
+            self.calls_bucket = TokenBucket(self.calls_per_minute * self.share / 60.0)
+        self.cost_bucket = None
+        if self.cost_per_hour:
+            # capacity of one minute of spend, so a burst cannot use up the hour
+            cost_per_hour = self.cost_per_hour * self.share
+            self.cost_bucket = TokenBucket(cost_per_hour / 3600.0, capacity=cost_per_hour / 60.0)
+
+    def set_share(self, share):
+        """Keep to share (0 < share <= 1) of every ceiling, when several processes split one budget"""
+        with self._lock:
+            self.share = share
+            self._build_buckets()
+
+    def _bucket(self, operation):
+        with self._lock:
+            bucket = self.buckets.get(operation)
+            if bucket is None:
+                bucket = self.buckets[operation] = TokenBucket(self.max_rates.get(operation, self.default_rate))
+            return bucket
+
+    def acquire(self, operation):
+        """Block until operation may be called within every budget"""
+        delay = self._bucket(operation).reserve()
+        if self.calls_bucket is not None:
+            delay = max(delay, self.calls_bucket.reserve())
+        if self.cost_bucket is not None and operation in PRICE_PER_CALL:
+            delay = max(delay, self.cost_bucket.reserve(PRICE_PER_CALL[operation]))
+        if delay > 0:
+            with self._lock:
+                self.waited += delay
+            time.sleep(delay)
+
+    def record_success(self, operation, latency):
+        bucket = self._bucket(operation)
+        max_rate = self.max_rates.get(operation, self.default_rate)
+        if bucket.rate < max_rate:
+            bucket.set_rate(min(max_rate, bucket.rate + RECOVERY_STEP))
+        with self._lock:
+            previous = self.latency.get(operation, latency)
+            self.latency[operation] = previous + EWMA_WEIGHT * (latency - previous)
+            self.pressure = max(1.0, self.pressure * PRESSURE_DECAY)
+
+    def record_throttle(self, operation):
+        bucket = self._bucket(operation)
+        bucket.set_rate(max(MIN_OPERATION_RATE, bucket.rate / 2))
+        with self._lock:
+            self.throttles += 1
+            self.pressure = min(MAX_SAMPLE_INTERVAL, self.pressure * 2)
+
+    def call(self, operation, method, *args, **kwargs):
+        """Call method within the budget, retrying throttled and transient failures with backoff"""
+        for attempt in range(self.retries + 1):
+            self.acquire(operation)
+            with self._lock:
+                self.calls += 1
+                self._calls_since_frame += 1
+            started = time.monotonic()
+            try:
+                result = method(*args, **kwargs)
+            except Exception as e:
+                if is_throttle(e):
+                    self.record_throttle(operation)
+                elif not is_transient(e):
+                    raise
+                if attempt == self.retries:
+                    raise
+                with self._lock:
+                    self.retried += 1
+                time.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)))
+                continue
+            self.record_success(operation, time.monotonic() - started)
+            return result
+
+    # ================= Adaptive sampling =================
+    def note_frame(self):
+        """Called when a live frame is sent for recognition, to learn the calls per frame"""
+        with self._lock:
+            calls, self._calls_since_frame = self._calls_since_frame, 0
+            self.calls_per_frame += EWMA_WEIGHT * (max(1, calls) - self.calls_per_frame)
+
+    def budget_interval(self):
+        """Seconds between frames that keep the learned calls per frame within the global ceilings"""
+        with self._lock:
+            calls_per_frame = self.calls_per_frame
+        interval = 0.0
+        if self.calls_bucket is not None:
+            interval = max(interval, calls_per_frame / self.calls_bucket.rate)
+        if self.cost_bucket is not None:
+            price = max(PRICE_PER_CALL.values())
+            interval = max(interval, calls_per_frame * price / self.cost_bucket.rate)
+        return min(MAX_SAMPLE_INTERVAL, interval)
+
+    def sample_interval(self):
+        """Seconds a live feed should leave between frames sent for recognition.
+
+        At least one detect_faces round trip, stretched by throttle pressure
+        and long enough that the calls per frame fit the global ceilings.
+        """
+        with self._lock:
+            interval = self.latency.get('detect_faces', 0.0) * self.pressure
+        return min(MAX_SAMPLE_INTERVAL, max(interval, self.budget_interval()))
+
+    def stats(self):
+        with self._lock:
+            rates = {operation: round(bucket.rate, 2) for operation, bucket in self.buckets.items()}
+            latency = {operation: round(seconds * 1000, 1) for operation, seconds in self.latency.items()}
+            stats = {
+                'calls': self.calls,
+                'throttles': self.throttles,
+                'retried': self.retried,
+                'seconds_waited': round(self.waited, 2),
+                'operation_rates': rates,
+                'latency_ms': latency,
+                'pressure': round(self.pressure, 2),
+                'calls_per_frame': round(self.calls_per_frame, 2),
+            }
+        stats['sample_interval'] = round(self.sample_interval(), 3)
+        return stats
+
+
+class RateLimitedClient:
+    """Wrap a Rekognition client so every call goes through a RateController"""
+
+    def __init__(self, client, controller):
+        self._client = client
+        self.controller = controller
+        self.exceptions = client.exceptions
+
+    def __getattr__(self, operation):
+        method = getattr(self._client, operation)
+        if not callable(method):
+            return method
+        return lambda *args, **kwargs: self.controller.call(operation, method, *args, **kwargs)
+
+
+rate_controller = RateController.from_settings(get_settings())
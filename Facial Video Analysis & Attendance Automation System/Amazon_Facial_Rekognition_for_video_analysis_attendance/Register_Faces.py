@@ -1,20 +1,31 @@
-import pandas as pd
-import boto3
 from botocore.exceptions import ClientError
 
-# Load AWS credentials
-credential = pd.read_csv("facial_video_analysis_accessKeys.csv")
-access_key_id = credential['Access key ID'][0]
-secret_access_key = credential['Secret access key'][0]
-region_name = 'us-east-2'  # Your AWS region
+from AWS_Client import get_client
+from Search_Cache import search_cache
+from Local_Embeddings import local_matcher
 
-# Initialize Rekognition client
-client = boto3.client(
-    'rekognition',
-    aws_access_key_id=access_key_id,
-    aws_secret_access_key=secret_access_key,
-    region_name=region_name
-)
+
+def index_face(source_img_bytes, image_name, COLLECTION_NAME):
+    """Index the faces of one image under image_name and return their FaceRecords.
+
+    Raises botocore's ClientError when the call fails.
+    """
+    response = get_client().index_faces(
+        CollectionId=COLLECTION_NAME,
+        Image={'Bytes': source_img_bytes},
+        ExternalImageId=image_name,
+        QualityFilter='AUTO',
+        DetectionAttributes=['ALL']
+    )
+    face_records = response.get('FaceRecords', [])
+    if face_records:
+        search_cache.invalidate(COLLECTION_NAME)  # cached 'Not recognized' results may now match
+        try:
+            if local_matcher.enabled and not local_matcher.enroll(source_img_bytes, image_name, COLLECTION_NAME):
+                print(f"⚠ No face found locally for {image_name}; it will only be matched by Rekognition")
+        except Exception as e:
+            print(f"⚠ Could not compute a local embedding for {image_name}: {e}")
+    return face_records
 
 
 def add_face_to_collection(source_img_bytes, image_name, COLLECTION_NAME):
@@ -33,16 +44,7 @@ def add_face_to_collection(source_img_bytes, image_name, COLLECTION_NAME):
     try:
         print(f'Adding face for {image_name} into {COLLECTION_NAME}...')
 
-        request = {'Bytes': source_img_bytes}
-        response = client.index_faces(
-            CollectionId=COLLECTION_NAME,
-            Image=request,
-            ExternalImageId=image_name,
-            QualityFilter='AUTO',
-            DetectionAttributes=['ALL']
-        )
-
-        face_records = response.get('FaceRecords', [])
+        face_records = index_face(source_img_bytes, image_name, COLLECTION_NAME)
 
         if not face_records:
             lst.append(f"No faces found in {image_name}'s image")
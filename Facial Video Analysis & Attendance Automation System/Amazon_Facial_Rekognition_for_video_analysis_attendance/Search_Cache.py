@@ -0,0 +1,102 @@
+import time
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# ================= Cache settings =================
+CACHE_SIZE = 1024          # cached crops per collection at most
+CACHE_TTL = 300            # seconds a cached search result is trusted
+HASH_TOLERANCE = 2         # bits two crop hashes may differ by and still match; faces of
+                           # different people can be 6 bits apart on a 64 bit hash
+HASH_SIZE = 32             # side of the normalised crop the DCT is taken from
+
+
+def phash(crop):
+    """64 bit perceptual hash of a face crop (PIL image or NumPy BGR array).
+
+    The crop is normalised to a histogram equalised 32x32 grayscale image,
+    and each bit of the hash says whether one of the 8x8 lowest DCT
+    frequencies is above their median.
+    """
+    if isinstance(crop, np.ndarray):
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    else:
+        gray = np.asarray(crop.convert('L'))
+    gray = cv2.equalizeHist(cv2.resize(gray, (HASH_SIZE, HASH_SIZE), interpolation=cv2.INTER_AREA))
+    low = cv2.dct(np.float32(gray))[:8, :8].flatten()
+    bits = low > np.median(low[1:])
+    return int(''.join('1' if bit else '0' for bit in bits), 2)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class SearchCache:
+    """LRU cache of search_faces_by_image results keyed by crop hash.
+
+    A lookup matches the nearest cached hash of the same collection within
+    tolerance bits, so slightly different crops of the same face reuse
+    one search. When cached crops within tolerance disagree on the name,
+    the lookup is a miss. Every collection holds at most max_size entries.
+    """
+
+    def __init__(self, max_size=CACHE_SIZE, ttl=CACHE_TTL, tolerance=HASH_TOLERANCE):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.tolerance = tolerance
+        self._entries = {}         # collection -> OrderedDict(hash -> (name, similarity, stored_at))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, collection_name, crop_hash, now=None):
+        """Return (name, similarity) of a cached near-identical crop, or None"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entries = self._entries.get(collection_name)
+            if entries:
+                for cached_hash in [h for h, entry in entries.items() if now - entry[2] > self.ttl]:
+                    del entries[cached_hash]
+                near = [h for h in entries if hamming(h, crop_hash) <= self.tolerance]
+                if near and len({entries[h][0] for h in near}) == 1:
+                    best = min(near, key=lambda h: hamming(h, crop_hash))
+                    entries.move_to_end(best)
+                    self.hits += 1
+                    name, similarity, _ = entries[best]
+                    return name, similarity
+            self.misses += 1
+            return None
+
+    def put(self, collection_name, crop_hash, name, similarity, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            entries = self._entries.setdefault(collection_name, OrderedDict())
+            entries[crop_hash] = (name, similarity, now)
+            entries.move_to_end(crop_hash)
+            while len(entries) > self.max_size:
+                entries.popitem(last=False)
+
+    def invalidate(self, collection_name):
+        """Drop every cached result of a collection whose faces have changed"""
+        with self._lock:
+            if self._entries.pop(collection_name, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'entries': sum(len(entries) for entries in self._entries.values()),
+                'invalidations': self.invalidations,
+            }
+
+
+# Shared by the search path and by everything that changes a collection
+search_cache = SearchCache()
@@ -0,0 +1,246 @@
+import io
+import os
+import csv
+import json
+import math
+import time
+import uuid
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from Face_Engine import recognize_faces
+from Face_Tracker import FaceTracker
+from Rate_Controller import rate_controller
+
+# ================= Settings =================
+SAMPLE_FPS = 1.0           # frames per second of video sent to recognition
+CHUNK_SECONDS = 120        # length of the slice of video decoded by one worker
+MAX_WORKERS = os.cpu_count() or 2
+ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv', 'webm'}
+
+
+def video_info(path):
+    """Return (fps, frame_count) of a video file"""
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video file {path}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        return fps, int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        cap.release()
+
+
+def plan_chunks(frame_count, fps, chunk_seconds=CHUNK_SECONDS):
+    """Split [0, frame_count) into (start, end) frame ranges of chunk_seconds each"""
+    size = max(1, int(fps * chunk_seconds))
+    return [(start, min(start + size, frame_count)) for start in range(0, frame_count, size)]
+
+
+def _init_worker(share):
+    """Runs first in every worker process: take its part of the API budget"""
+    rate_controller.set_share(share)
+
+
+def analyze_chunk(path, collection_name, start, end, step, fps):
+    """Decode frames [start, end) and recognize every step-th one.
+
+    Runs in a worker process. Frames that are not sampled are only grabbed,
+    not decoded to pixels. Returns (sightings, frames_read) where sightings
+    is a list of (seconds, [names]).
+    """
+    cap = cv2.VideoCapture(path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    tracker = FaceTracker()
+    sightings = []
+    index = start
+    try:
+        # sample on a grid shared by all chunks so their samples line up
+        first = start + (-start) % step
+        while index < end:
+            if not cap.grab():
+                break
+            if index >= first and (index - first) % step == 0:
+                ret, frame = cap.retrieve()
+                if ret:
+                    seconds = index / fps
+                    try:
+                        # the tracker ages tracks by video time, not by how fast the chunk decodes
+                        faces = recognize_faces(frame, collection_name, tracker, now=seconds)
+                    except Exception as e:
+                        print(f"⚠ Rekognition error at {seconds:.1f}s: {e}")
+                        faces = []
+                    names = sorted({name for box, name in faces
+                                    if name and name not in ('Not recognized', 'Error')})
+                    sightings.append((seconds, names))
+            index += 1
+    finally:
+        cap.release()
+    return sightings, index - start
+
+
+def build_timeline(sightings, sample_interval):
+    """Turn (seconds, [names]) samples into a per-person presence summary.
+
+    Every sample in which a person is seen counts for one sample interval
+    of presence.
+    """
+    timeline = {}
+    for seconds, names in sorted(sightings):
+        for name in names:
+            entry = timeline.setdefault(name, {'name': name, 'first_seen': seconds,
+                                               'last_seen': seconds, 'seconds_present': 0.0})
+            entry['last_seen'] = seconds
+            entry['seconds_present'] += sample_interval
+    for entry in timeline.values():
+        entry['seconds_present'] = round(entry['seconds_present'], 2)
+        entry['first_seen'] = round(entry['first_seen'], 2)
+        entry['last_seen'] = round(entry['last_seen'], 2)
+    return sorted(timeline.values(), key=lambda e: e['first_seen'])
+
+
+def check_sample_fps(sample_fps):
+    """Return sample_fps as a positive float, raising ValueError otherwise"""
+    sample_fps = float(sample_fps)
+    if not math.isfinite(sample_fps) or sample_fps <= 0:
+        raise ValueError(f"sample_fps must be a positive number, not {sample_fps}")
+    return sample_fps
+
+
+def analyze_video(path, collection_name, sample_fps=SAMPLE_FPS, workers=MAX_WORKERS,
+                  chunk_seconds=CHUNK_SECONDS, progress=None):
+    """Analyze a recorded video across a process pool and return (timeline, stats).
+
+    Workers are spawned, not forked: a forked child would inherit the
+    parent's thread pools in whatever state they are in and can hang on
+    its first face search. Each worker keeps to an equal part of the
+    calls_per_minute / cost_per_hour budget.
+    """
+    sample_fps = check_sample_fps(sample_fps)
+    fps, frame_count = video_info(path)
+    step = max(1, int(round(fps / sample_fps)))
+    # some containers do not report a frame count; decode those in one chunk
+    chunks = plan_chunks(frame_count, fps, chunk_seconds) if frame_count > 0 else [(0, float('inf'))]
+    sightings = []
+    frames_read = 0
+    started = time.monotonic()
+
+    workers = min(workers, max(1, len(chunks)))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(1 / workers,)) as pool:
+        futures = [pool.submit(analyze_chunk, path, collection_name, start, end, step, fps)
+                   for start, end in chunks]
+        for done, future in enumerate(as_completed(futures), 1):
+            chunk_sightings, chunk_frames = future.result()
+            sightings.extend(chunk_sightings)
+            frames_read += chunk_frames
+            elapsed = time.monotonic() - started
+            stats = {
+                'chunks_done': done,
+                'chunks_total': len(chunks),
+                'frames_read': frames_read,
+                'frame_count': frame_count,
+                'frames_sampled': len(sightings),
+                'frames_per_second': round(frames_read / max(elapsed, 1e-6), 1),
+                'elapsed_seconds': round(elapsed, 1),
+            }
+            if progress:
+                progress(stats)
+
+    stats['duration_seconds'] = round(frame_count / fps, 1)
+    return build_timeline(sightings, step / fps), stats
+
+
+def timeline_csv(timeline):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=['name', 'first_seen', 'last_seen', 'seconds_present'])
+    writer.writeheader()
+    writer.writerows(timeline)
+    return buffer.getvalue()
+
+
+def write_csv(timeline, path):
+    with open(path, 'w', newline='') as f:
+        f.write(timeline_csv(timeline))
+
+
+def write_json(timeline, stats, path):
+    with open(path, 'w') as f:
+        json.dump({'timeline': timeline, 'stats': stats}, f, indent=2)
+
+
+def print_progress(stats):
+    print(f"{stats['chunks_done']}/{stats['chunks_total']} chunks, "
+          f"{stats['frames_read']}/{stats['frame_count']} frames, "
+          f"{stats['frames_per_second']} frames/s")
+
+
+# ================= Background jobs for the Flask app =================
+jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def allowed_video(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_VIDEO_EXTENSIONS
+
+
+def start_job(path, collection_name, sample_fps=SAMPLE_FPS, remove_video=True):
+    """Analyze a saved video on a background thread and return its job id.
+
+    The video is deleted when the job ends unless remove_video is false.
+    """
+    sample_fps = check_sample_fps(sample_fps)
+    job_id = uuid.uuid4().hex
+    job = {'id': job_id, 'status': 'running', 'video': os.path.basename(path),
+           'collection': collection_name, 'progress': None, 'timeline': None, 'error': None}
+    with _jobs_lock:
+        jobs[job_id] = job
+
+    def run():
+        result = {'status': 'failed'}
+        try:
+            timeline, stats = analyze_video(path, collection_name, sample_fps,
+                                            progress=lambda s: job.update(progress=s))
+            result = {'status': 'done', 'timeline': timeline, 'progress': stats}
+        except Exception as e:
+            print(f"⚠ Video analysis failed for {path}: {e}")
+            result['error'] = str(e)
+        finally:
+            # the video is gone by the time the job reports that it ended
+            if remove_video and os.path.exists(path):
+                os.remove(path)
+            job.update(result)
+
+    threading.Thread(target=run, name=f'video-job-{job_id}', daemon=True).start()
+    return job_id
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        return jobs.get(job_id)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build a per-person presence timeline from a recorded video')
+    parser.add_argument('video')
+    parser.add_argument('collection')
+    parser.add_argument('--sample-fps', type=float, default=SAMPLE_FPS)
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--chunk-seconds', type=float, default=CHUNK_SECONDS)
+    parser.add_argument('--csv', help='write the timeline as CSV to this path')
+    parser.add_argument('--json', help='write the timeline and stats as JSON to this path')
+    args = parser.parse_args()
+
+    timeline, stats = analyze_video(args.video, args.collection, args.sample_fps,
+                                    args.workers, args.chunk_seconds, progress=print_progress)
+    if args.csv:
+        write_csv(timeline, args.csv)
+    if args.json:
+        write_json(timeline, stats, args.json)
+    for entry in timeline:
+        print(f"{entry['name']}: first seen {entry['first_seen']}s, last seen {entry['last_seen']}s, "
+              f"present {entry['seconds_present']}s")
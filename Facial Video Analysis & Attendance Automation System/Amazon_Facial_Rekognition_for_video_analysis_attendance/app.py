@@ -1,31 +1,80 @@
 import os
-import io
-import cv2
-import numpy as np
-from flask import Flask, request, render_template, jsonify, Response
+import uuid
+import tempfile
+from flask import Flask, Request, request, render_template, jsonify, Response
 from werkzeug.utils import secure_filename
 from PIL import Image
 
 # Import your existing modules
-from Create_Collection import list_collections, create, delete
+from Create_Collection import list_collections, create, delete, collection_registry
 from Register_Faces import add_face_to_collection
-from Face_recognize import face_recognition_saving_image
+from Face_recognize import face_recognition_saving_image, describe_face
+from Camera_Hub import CameraHub
+import Video_File_Analysis
+import Bulk_Register
+import Batch_Recognize
+import Multi_Camera
+from Attendance_Store import AttendanceStore, parse_time
+from Image_Payload import image_request, payload_stats, MAX_ENROLL_SIDE
+import Metrics
+import Face_Engine
+from Local_Embeddings import local_matcher
 
 UPLOAD_FOLDER = 'static/uploads/'
 
+
+
+class UploadRequest(Request):
+    """Allow recorded lectures to be larger than the image upload limit"""
+
+    @property
+    def max_content_length(self):
+        if self.endpoint in ('analyze_video', 'bulk_register', 'recognize_batch'):
+            return app.config['MAX_VIDEO_CONTENT_LENGTH']
+        return app.config['MAX_CONTENT_LENGTH']
+
+
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.secret_key = "secret key"
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+app.config['MAX_VIDEO_CONTENT_LENGTH'] = 8 * 1024 * 1024 * 1024
 ALLOWED_EXTENSIONS = set(['png', 'jpg', 'jpeg', 'gif'])
 
-# Webcam
-camera = cv2.VideoCapture(0)
-
 # Global variable to hold recognized names
 recognized_faces = []
 
 
+# Attendance log fed by the live feed
+attendance_store = AttendanceStore()
+
+
+# Called with (collection_name, faces) after every live recognition, e.g. by Async_App
+recognition_listeners = []
+
+
+def update_recognized(collection_name, faces):
+    global recognized_faces
+    recognized_faces = [describe_face(name) for box, name in faces]
+    attendance_store.record(collection_name, [name for box, name in faces
+                                              if name not in ('Not recognized', 'Error')])
+    for listener in recognition_listeners:
+        listener(collection_name, faces)
+
+
+# Webcam, opened when the first viewer connects and shared by all of them
+camera_hub = CameraHub(0, on_result=update_recognized)
+
+# Further cameras from the camera_sources setting, recognized with one shared budget
+multi_camera = Multi_Camera.from_settings(on_result=update_recognized)
+if multi_camera is not None:
+    multi_camera.start()
+
+# Load the collection list in the background so no page render waits for AWS
+collection_registry.refresh_async()
+
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -88,11 +137,9 @@ def register_faces():
             save_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
             file.save(save_path)
 
-            # Open and convert to bytes
+            # Open and convert to a compact JPEG payload
             Register_image = Image.open(save_path)
-            bytes_array = io.BytesIO()
-            Register_image.save(bytes_array, format="PNG")
-            source_image_bytes = bytes_array.getvalue()
+            source_image_bytes = image_request(Register_image, 'index_faces', MAX_ENROLL_SIDE)['Bytes']
 
             # Register in AWS Rekognition
             res = add_face_to_collection(source_image_bytes, name, COLLECTION_NAME)
@@ -105,6 +152,33 @@ def register_faces():
     return render_template('register.html', lst=lst, reg_lst=registration_result, filename=saved_filenames)
 
 
+@app.route('/bulk_register', methods=['POST'])
+def bulk_register():
+    """Enroll a zip of face images (one folder per person, or a manifest.csv) in the background"""
+    file = request.files.get('file')
+    if not file or not file.filename.lower().endswith('.zip'):
+        return jsonify({"error": "Upload a .zip archive of face images"}), 400
+    collection_name = request.form.get('collection', '')
+    if not Bulk_Register.is_collection_id(collection_name):
+        return jsonify({"error": "Invalid collection name"}), 400
+    # spooled to disk rather than read into memory; the job deletes it when done
+    fd, archive_path = tempfile.mkstemp(prefix='bulk-', suffix='.zip')
+    os.close(fd)
+    file.save(archive_path)
+    job_id = Bulk_Register.start_job(archive_path, collection_name)
+    return jsonify({"job_id": job_id, "status_url": f"/bulk_register/{job_id}"}), 202
+
+
+@app.route('/bulk_register/<job_id>')
+def bulk_register_status(job_id):
+    job = Bulk_Register.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "No such job"}), 404
+    if request.args.get('format') == 'csv' and job['report'] is not None:
+        return Response(Bulk_Register.report_csv(job['report']), mimetype='text/csv')
+    return jsonify(job)
+
+
 # ================= RECOGNIZE STATIC ===================
 @app.route('/recognize_page')
 def recognize_page():
@@ -127,16 +201,19 @@ def recognize_faces():
 
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+        with Metrics.timer('save_upload'):
+            file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
         Register_image = Image.open('static/uploads/' + filename)
 
         COLLECTION_NAME = request.form['collection']
         count, lst = list_collections()
 
         path = "result/" + filename
-        result_img, res_lst = face_recognition_saving_image(Register_image, COLLECTION_NAME)
+        with Metrics.timer('recognize_image'):
+            result_img, res_lst = face_recognition_saving_image(Register_image, COLLECTION_NAME)
         os.makedirs("static/result", exist_ok=True)
-        result_img.save('static/' + path)
+        with Metrics.timer('save_result'):
+            result_img.save('static/' + path)
 
         return render_template('recognize.html', lst=lst, filename=path, res_lst=res_lst)
     else:
@@ -145,29 +222,48 @@ def recognize_faces():
         return render_template('recognize.html', lst=lst, statement=statement)
 
 
-# ================= LIVE RECOGNITION ===================
-def gen_frames(collection_name):
-    global recognized_faces
-    while True:
-        success, frame = camera.read()
-        if not success:
-            break
-        else:
-            # Convert frame (OpenCV BGR -> PIL RGB)
-            img_pil = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            result_img, res_lst = face_recognition_saving_image(img_pil, collection_name)
-
-            # Update recognized names
-            recognized_faces = res_lst
+@app.route('/recognize_batch', methods=['POST'])
+def recognize_batch():
+    """Recognize many images (files and zip archives) in memory, streaming one NDJSON line per image"""
+    files = [f for f in request.files.getlist('files') if f.filename]
+    if not files:
+        return jsonify({"error": "No images selected for uploading"}), 400
+    collection_name = request.form['collection']
+    # the request closes its files before the response has streamed, so copy them to temporary
+    # files on disk, read one image at a time and deleted once the last result is sent
+    uploads = []
+    for f in files:
+        spool = tempfile.TemporaryFile()
+        f.save(spool)
+        spool.seek(0)
+        uploads.append((f.filename, spool))
+    annotate = None
+    if request.form.get('annotate') in ('1', 'true', 'on', 'yes'):
+        annotate = Batch_Recognize.store_annotations(Batch_Recognize.new_batch_id(), '/recognize_batch')
+
+    def results():
+        try:
+            yield from Batch_Recognize.ndjson(Batch_Recognize.recognize_batch(
+                Batch_Recognize.upload_source(uploads), collection_name, annotate=annotate))
+        finally:
+            for _, spool in uploads:
+                spool.close()
+
+    return Response(results(), mimetype='application/x-ndjson')
+
+
+@app.route('/recognize_batch/<batch_id>/<int:index>.jpg')
+def recognize_batch_image(batch_id, index):
+    jpeg_bytes = Batch_Recognize.annotation_store.render(f'{batch_id}/{index}')
+    if jpeg_bytes is None:
+        return jsonify({"error": "No such image"}), 404
+    return Response(jpeg_bytes, mimetype='image/jpeg')
 
-            # Convert back to OpenCV BGR
-            result_frame = cv2.cvtColor(np.array(result_img), cv2.COLOR_RGB2BGR)
 
-            # Encode JPEG
-            ret, buffer = cv2.imencode('.jpg', result_frame)
-            frame = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
+# ================= LIVE RECOGNITION ===================
+def gen_frames(collection_name):
+    """Stream the shared webcam; recognition and encoding happen once for all viewers"""
+    return camera_hub.stream(collection_name)
 
 
 @app.route('/recognize_live')
@@ -189,6 +285,108 @@ def recognized_names():
     return jsonify({"names": recognized_faces})
 
 
+@app.route('/cameras')
+def cameras():
+    if multi_camera is None:
+        return jsonify({"sources": []})
+    return jsonify(multi_camera.stats())
+
+
+@app.route('/cameras/<name>/feed')
+def camera_feed(name):
+    if multi_camera is None or name not in multi_camera.sources:
+        return jsonify({"error": "No such camera"}), 404
+    return Response(multi_camera.stream(name),
+                    mimetype='multipart/x-mixed-replace; boundary=frame')
+
+
+# ================= RECORDED VIDEO ===================
+@app.route('/analyze_video', methods=['POST'])
+def analyze_video():
+    file = request.files.get('file')
+    if not file or file.filename == '':
+        return jsonify({"error": "No video selected for uploading"}), 400
+    if not Video_File_Analysis.allowed_video(file.filename):
+        return jsonify({"error": "Allowed video types are -> " + ", ".join(sorted(Video_File_Analysis.ALLOWED_VIDEO_EXTENSIONS))}), 400
+
+    try:
+        sample_fps = Video_File_Analysis.check_sample_fps(request.form.get('sample_fps', Video_File_Analysis.SAMPLE_FPS))
+    except ValueError:
+        return jsonify({"error": "sample_fps must be a positive number"}), 400
+
+    # a unique name per job, so concurrent uploads of the same file name do not overwrite each other
+    filename = f'{uuid.uuid4().hex}_{secure_filename(file.filename)}'
+    save_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    file.save(save_path)
+    job_id = Video_File_Analysis.start_job(save_path, request.form['collection'], sample_fps)
+    return jsonify({"job_id": job_id, "status_url": f"/analyze_video/{job_id}"}), 202
+
+
+@app.route('/analyze_video/<job_id>')
+def analyze_video_status(job_id):
+    job = Video_File_Analysis.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "No such job"}), 404
+    if request.args.get('format') == 'csv' and job['timeline'] is not None:
+        return Response(Video_File_Analysis.timeline_csv(job['timeline']), mimetype='text/csv')
+    return jsonify(job)
+
+
+# ================= ATTENDANCE ===================
+def attendance_query(default_limit):
+    """(start, end, limit) of an attendance query string; raises ValueError for bad values"""
+    return (parse_time(request.args.get('start')), parse_time(request.args.get('end')),
+            int(request.args.get('limit', default_limit)))
+
+
+@app.route('/attendance/sessions')
+def attendance_sessions():
+    try:
+        start, end, limit = attendance_query(100)
+    except ValueError:
+        return jsonify({"error": "start and end must be epoch seconds or ISO dates, limit a number"}), 400
+    sessions = attendance_store.sessions(request.args.get('collection'), start, end, limit)
+    return jsonify({"sessions": sessions})
+
+
+@app.route('/attendance/sessions/<int:session_id>')
+def attendance_session(session_id):
+    result = attendance_store.session_attendance(session_id)
+    if result is None:
+        return jsonify({"error": "No such session"}), 404
+    return jsonify(result)
+
+
+@app.route('/attendance/events')
+def attendance_events():
+    try:
+        start, end, limit = attendance_query(1000)
+    except ValueError:
+        return jsonify({"error": "start and end must be epoch seconds or ISO dates, limit a number"}), 400
+    events = attendance_store.events(start, end, request.args.get('collection'), request.args.get('name'), limit)
+    return jsonify({"events": events, "stats": attendance_store.stats()})
+
+
+# ================= METRICS ===================
+@app.route('/metrics')
+def metrics():
+    return Response(Metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/pipeline_stats')
+def pipeline_stats():
+    """Counters of the stages that answer frames without a Rekognition call"""
+    return jsonify({'local_detector': Face_Engine.local_detector.stats(),
+                    'search_cache': Face_Engine.search_cache.stats(),
+                    'payloads': payload_stats(),
+                    'video_feed': camera_hub.stats()})
+
+
+@app.route('/local_embeddings')
+def local_embeddings():
+    return jsonify(local_matcher.stats())
+
+
 # ================= CACHE DISABLE ===================
 @app.after_request
 def add_header(response):
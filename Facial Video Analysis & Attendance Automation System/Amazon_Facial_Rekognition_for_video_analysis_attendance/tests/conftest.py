@@ -0,0 +1,33 @@
+import os
+import sys
+import atexit
+import shutil
+import tempfile
+
+import pytest
+
+# Every test runs against the offline Fake_Rekognition backend; settings are
+# read once per process, so the environment is set before any app import.
+TEST_DIR = tempfile.mkdtemp(prefix='facial-analysis-tests-')
+atexit.register(shutil.rmtree, TEST_DIR, True)
+os.environ['REKOGNITION_BACKEND'] = 'fake'
+os.environ['REKOGNITION_FAKE_LATENCY'] = 'off'
+os.environ['FACIAL_ANALYSIS_CONFIG'] = os.path.join(TEST_DIR, 'missing.ini')
+os.environ['ATTENDANCE_DB'] = os.path.join(TEST_DIR, 'attendance.db')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import AWS_Client
+from Fake_Rekognition import FakeRekognition
+
+PEOPLE = ['Ann_Lee', 'Bob', 'Cy']
+
+
+@pytest.fixture
+def fake_client():
+    """A fresh fake client with one 'classroom' collection, installed as the process client"""
+    from Search_Cache import search_cache
+    client = FakeRekognition('off', fixtures={'collections': {'classroom': PEOPLE}, 'faces_per_image': 3})
+    AWS_Client.use_client(client)
+    search_cache.invalidate('classroom')
+    yield client
+    AWS_Client.use_client(None)
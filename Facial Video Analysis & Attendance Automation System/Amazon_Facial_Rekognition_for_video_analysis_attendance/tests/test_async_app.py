@@ -0,0 +1,79 @@
+import json
+import asyncio
+
+import app as flask_app
+from Async_App import AsyncApp
+
+BOX = {'Left': 0.1, 'Top': 0.1, 'Width': 0.2, 'Height': 0.2}
+
+
+def serve(monkeypatch, scope, interact):
+    """Run one ASGI connection; interact(app, incoming, sent) drives it and returns when done"""
+    monkeypatch.setattr(flask_app, 'recognition_listeners', [])
+    application = AsyncApp(hub=None)
+
+    async def main():
+        incoming, sent = asyncio.Queue(), []
+
+        async def send(message):
+            sent.append(message)
+        connection = asyncio.ensure_future(application(scope, incoming.get, send))
+        await interact(application, incoming, sent)
+        await asyncio.wait_for(connection, 5)
+        return sent
+    return asyncio.run(main())
+
+
+async def wait_until(condition, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError('timed out')
+
+
+async def publish(collection_name, name):
+    """Report a recognition the way the camera hub's worker thread does"""
+    await asyncio.get_running_loop().run_in_executor(
+        None, flask_app.update_recognized, collection_name, [(BOX, name)])
+
+
+def test_sse_clients_get_the_recognitions_of_their_collection(monkeypatch):
+    async def interact(application, incoming, sent):
+        await wait_until(lambda: application.events and application.events.subscribers)
+        await publish('office', 'Dee')
+        await publish('classroom', 'Ann_Lee')
+        await wait_until(lambda: any(b'event: recognition' in m.get('body', b'') for m in sent))
+        await incoming.put({'type': 'http.disconnect'})
+
+    sent = serve(monkeypatch, {'type': 'http', 'method': 'GET', 'path': '/events',
+                               'query_string': b'collection=classroom', 'headers': []}, interact)
+    assert sent[0]['headers'][0] == (b'content-type', b'text/event-stream')
+    events = [json.loads(m['body'].decode().split('data: ', 1)[1]) for m in sent[1:]
+              if m.get('body', b'').startswith(b'event: recognition')]
+    assert [event['faces'][0]['name'] for event in events] == ['Ann_Lee']
+
+
+def test_websocket_clients_get_every_recognition(monkeypatch):
+    async def interact(application, incoming, sent):
+        await incoming.put({'type': 'websocket.connect'})
+        await wait_until(lambda: application.events and application.events.subscribers)
+        await publish('office', 'Dee')
+        await wait_until(lambda: any(m['type'] == 'websocket.send' for m in sent))
+        await incoming.put({'type': 'websocket.disconnect'})
+
+    sent = serve(monkeypatch, {'type': 'websocket', 'path': '/ws', 'query_string': b'', 'headers': []}, interact)
+    assert sent[0]['type'] == 'websocket.accept'
+    event = json.loads(sent[1]['text'])
+    assert event['collection'] == 'office' and event['names'] == ['A face has been recognized. Name: Dee']
+
+
+def test_other_routes_are_served_by_flask(monkeypatch):
+    async def interact(application, incoming, sent):
+        await incoming.put({'type': 'http.request', 'body': b'', 'more_body': False})
+
+    sent = serve(monkeypatch, {'type': 'http', 'method': 'GET', 'path': '/local_embeddings', 'query_string': b'',
+                               'headers': [], 'http_version': '1.1', 'scheme': 'http',
+                               'server': ('testserver', 80)}, interact)
+    assert sent[0]['status'] == 200
+    assert json.loads(b''.join(m.get('body', b'') for m in sent[1:]))['enabled'] is False
@@ -0,0 +1,101 @@
+import time
+import sqlite3
+
+import pytest
+
+from Attendance_Store import AttendanceStore, parse_time
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = AttendanceStore(str(tmp_path / 'attendance.db'), dedup_window=60, session_gap=600,
+                            flush_interval=0.01)
+    yield store
+    store.close()
+
+
+def flushed(store):
+    """Close the store so every queued event is written"""
+    store.close()
+    return store
+
+
+def test_repeat_sightings_within_the_window_are_deduplicated(store):
+    store.record('classroom', ['Ann_Lee', 'Bob'], ts=1000)
+    store.record('classroom', ['Ann_Lee'], ts=1030)
+    store.record('classroom', ['Ann_Lee'], ts=1100)
+    flushed(store)
+    assert [(e['ts'], e['name']) for e in store.events()] == [(1000, 'Ann_Lee'), (1000, 'Bob'), (1100, 'Ann_Lee')]
+    assert store.stats()['events_deduplicated'] == 1
+    session = store.sessions()[0]
+    attendance = store.session_attendance(session['id'])['attendance']
+    assert {(a['name'], a['sightings'], a['first_seen'], a['last_seen']) for a in attendance} == {
+        ('Ann_Lee', 3, 1000, 1100), ('Bob', 1, 1000, 1000)}
+
+
+def test_a_gap_longer_than_session_gap_starts_a_new_session(store):
+    store.record('classroom', ['Ann_Lee'], ts=1000)
+    store.record('classroom', ['Ann_Lee'], ts=5000)
+    flushed(store)
+    assert [s['started_at'] for s in store.sessions()] == [5000, 1000]
+
+
+def test_a_failed_write_does_not_suppress_the_next_sighting(store, monkeypatch):
+    batches = []
+
+    class FailingConnection:
+        """Wrap the writer's connection so its first batch fails to insert events"""
+
+        def __init__(self, conn):
+            self.conn = conn
+
+        def __getattr__(self, name):
+            return getattr(self.conn, name)
+
+        def __enter__(self):
+            return self.conn.__enter__()
+
+        def __exit__(self, *exc):
+            return self.conn.__exit__(*exc)
+
+        def executemany(self, sql, rows):
+            if sql.startswith('INSERT INTO events') and not batches:
+                batches.append(rows)
+                raise sqlite3.OperationalError('disk I/O error')
+            return self.conn.executemany(sql, rows)
+
+    write = store._write
+    monkeypatch.setattr(store, '_write', lambda conn, batch: write(FailingConnection(conn), batch))
+    store.record('classroom', ['Ann_Lee'], ts=1000)
+    deadline = time.monotonic() + 5
+    while not batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert batches, 'the first write should have failed'
+    assert store._last_logged == {}
+
+    store.record('classroom', ['Ann_Lee'], ts=1010)
+    flushed(store)
+    assert [e['ts'] for e in store.events()] == [1010]
+
+
+def test_close_is_idempotent(store):
+    store.close()
+    store.close()
+    assert not store._writer.is_alive()
+
+
+def test_parse_time_accepts_epoch_and_iso_and_rejects_the_rest():
+    assert parse_time('1700000000') == 1700000000.0
+    assert parse_time('') is None
+    assert isinstance(parse_time('2024-01-02T08:30:00'), float)
+    with pytest.raises(ValueError):
+        parse_time('yesterday')
+
+
+@pytest.mark.parametrize('query', ['start=yesterday', 'end=not-a-date', 'limit=ten'])
+def test_attendance_routes_return_400_for_bad_query_strings(query):
+    import app
+    client = app.app.test_client()
+    assert client.get('/attendance/events?' + query).status_code == 400
+    assert client.get('/attendance/sessions?' + query).status_code == 400
+    assert client.get('/attendance/events?start=2024-01-01').status_code == 200
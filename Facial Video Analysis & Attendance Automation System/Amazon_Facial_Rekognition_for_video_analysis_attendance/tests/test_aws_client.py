@@ -0,0 +1,31 @@
+import AWS_Client
+from Fake_Rekognition import FakeRekognition
+
+
+def test_environment_overrides_the_config_file_which_overrides_the_defaults(tmp_path, monkeypatch):
+    config = tmp_path / 'settings.ini'
+    config.write_text('[rekognition]\nregion = eu-west-1\nread_timeout = 30\nmax_pool_connections = 8\n')
+    monkeypatch.setattr(AWS_Client, 'CONFIG_FILE', str(config))
+    monkeypatch.setenv('REKOGNITION_READ_TIMEOUT', '45')
+    settings = AWS_Client.load_settings()
+    assert settings['region'] == 'eu-west-1'
+    assert settings['read_timeout'] == 45.0 and settings['max_pool_connections'] == 8
+    assert settings['connect_timeout'] == AWS_Client.DEFAULTS['connect_timeout']
+
+
+def test_legacy_credentials_are_only_a_fallback(tmp_path, monkeypatch):
+    csv = tmp_path / 'accessKeys.csv'
+    csv.write_text('Access key ID,Secret access key\nAKIALEGACY,secret\n', encoding='utf-8-sig')
+    monkeypatch.setattr(AWS_Client, 'LEGACY_CREDENTIALS_FILE', str(csv))
+    monkeypatch.delenv('AWS_ACCESS_KEY_ID', raising=False)
+    assert AWS_Client.load_settings()['access_key_id'] == 'AKIALEGACY'
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'AKIAPROFILE')
+    assert AWS_Client.load_settings()['access_key_id'] == ''
+
+
+def test_the_client_is_created_once_and_shared(monkeypatch):
+    monkeypatch.setattr(AWS_Client, '_client', None)
+    monkeypatch.setattr(AWS_Client, '_settings', None)
+    client = AWS_Client.get_client()
+    assert AWS_Client.get_client() is client
+    assert isinstance(AWS_Client.create_client(AWS_Client.get_settings()), FakeRekognition)
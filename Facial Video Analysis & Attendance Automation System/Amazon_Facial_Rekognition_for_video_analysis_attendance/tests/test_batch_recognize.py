@@ -0,0 +1,85 @@
+import io
+import json
+import zipfile
+
+import numpy as np
+from PIL import Image
+
+import Batch_Recognize
+from Batch_Recognize import AnnotationStore, recognize_batch, upload_source
+
+
+def jpeg(seed):
+    pixels = np.random.default_rng(seed).integers(0, 255, (120, 160, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def archive(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+
+class CountingFile(io.BytesIO):
+    reads = 0
+
+    def read(self, *args):
+        CountingFile.reads += 1
+        return super().read(*args)
+
+
+def test_uploads_are_read_only_when_their_image_is_recognized():
+    CountingFile.reads = 0
+    source = upload_source([('a.jpg', CountingFile(jpeg(1))), ('notes.txt', CountingFile(b'x')),
+                            ('more.zip', archive({'b.jpg': jpeg(2), 'c.png': jpeg(3)}))])
+    entries = list(source)
+    assert [key for key, _, _ in entries] == ['a.jpg', 'b.jpg', 'c.png']
+    assert CountingFile.reads == 0
+    assert entries[0][2]() == jpeg(1)
+
+
+def test_recognize_batch_reports_every_image_and_a_summary(fake_client):
+    source = upload_source([(f'{i}.jpg', io.BytesIO(jpeg(i))) for i in range(5)] + [('bad.jpg', io.BytesIO(b'no'))])
+    results = list(recognize_batch(source, 'classroom', workers=2))
+    summary = results.pop()
+    assert sorted(result['index'] for result in results) == list(range(6))
+    assert summary['images'] == 6 and summary['recognized'] == 5 and summary['failed'] == 1
+    assert summary['faces'] == sum(len(result['faces']) for result in results)
+
+
+def test_annotation_store_is_bounded_by_bytes():
+    store = AnnotationStore(max_size=10, max_bytes=100)
+    store.put('a', b'x' * 40, [])
+    store.put('b', b'x' * 40, [])
+    store.put('c', b'x' * 40, [])
+    assert list(store._entries) == ['b', 'c'] and store.size_bytes == 80
+    store.put('c', b'x' * 10, [])
+    assert store.size_bytes == 50
+    store.put('huge', b'x' * 101, [])
+    assert 'huge' not in store._entries and store.size_bytes == 50
+
+
+def test_route_streams_results_and_serves_annotated_images(fake_client, monkeypatch):
+    import app
+    monkeypatch.setattr(Batch_Recognize, 'annotation_store', AnnotationStore())
+    client = app.app.test_client()
+    response = client.post('/recognize_batch', content_type='multipart/form-data', data={
+        'collection': 'classroom', 'annotate': 'on',
+        'files': [(io.BytesIO(jpeg(1)), 'a.jpg'), (archive({'b.jpg': jpeg(2)}), 'more.zip')]})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    summary = lines.pop()
+    assert summary['recognized'] == 2
+    image = client.get(lines[0]['annotated_url'])
+    assert image.status_code == 200 and image.data[:2] == b'\xff\xd8'
+
+
+def test_route_needs_files(fake_client):
+    import app
+    response = app.app.test_client().post('/recognize_batch', data={'collection': 'classroom'})
+    assert response.status_code == 400
@@ -0,0 +1,42 @@
+import pytest
+
+import AWS_Client
+import Benchmark
+from Benchmark import compare, run_scenario
+
+
+def result(fps=50.0, p95_ms=10.0, calls_per_frame=0.2, spread=None, target='gen_frames'):
+    entry = {'target': target, 'size': '640x480', 'faces': 4,
+             'fps': fps, 'p95_ms': p95_ms, 'calls_per_frame': calls_per_frame}
+    if spread is not None:
+        entry['spread'] = spread
+    return {'results': [entry]}
+
+
+@pytest.fixture
+def restore_client():
+    yield
+    AWS_Client.use_client(None)
+
+
+def test_changes_within_the_measured_spread_are_not_regressions():
+    noisy = {'fps': 0.12, 'p95_ms': 0.3, 'calls_per_frame': 0.02}
+    assert compare(result(spread=noisy), result(fps=42.0, p95_ms=14.0, calls_per_frame=0.24, spread=noisy)) == []
+    assert compare(result(spread=noisy), result(fps=35.0, spread=noisy)) == [('gen_frames', '640x480', 4)]
+    assert compare(result(spread=noisy), result(calls_per_frame=0.3, spread=noisy)) == [('gen_frames', '640x480', 4)]
+
+
+def test_calls_have_a_small_tolerance_and_baselines_without_spread_still_compare():
+    assert compare(result(), result(calls_per_frame=0.205)) == []
+    assert compare(result(), result(calls_per_frame=0.25)) == [('gen_frames', '640x480', 4)]
+    assert compare(result(), result(fps=40.0)) == [('gen_frames', '640x480', 4)]
+
+
+def test_repeated_passes_report_medians_and_their_spread(restore_client):
+    first = run_scenario('frame', (320, 240), 2, frames_count=4, latency='off', memory=False, repeats=3)
+    second = run_scenario('frame', (320, 240), 2, frames_count=4, latency='off', memory=False, repeats=3)
+    assert first['repeats'] == 3 and set(first['spread']) == {'fps', 'p95_ms', 'calls_per_frame'}
+    # the frame target makes the same calls on every run, so its calls never look like a regression
+    assert first['spread']['calls_per_frame'] == 0.0
+    assert first['calls_per_frame'] == second['calls_per_frame'] > 0
+    assert first['frames'] == 4
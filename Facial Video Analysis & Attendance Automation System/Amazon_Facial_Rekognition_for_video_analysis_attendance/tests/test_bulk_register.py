@@ -0,0 +1,140 @@
+import io
+import os
+import json
+import time
+import zipfile
+
+import pytest
+from botocore.exceptions import EndpointConnectionError
+from PIL import Image
+
+import Bulk_Register
+from Bulk_Register import _name_from_path, zip_source, directory_source, bulk_enroll, start_job, get_job
+
+
+def jpeg_bytes(shade=120):
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (shade, shade, shade)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def make_zip(path, members):
+    with zipfile.ZipFile(path, 'w') as archive:
+        for name in members:
+            archive.writestr(name, jpeg_bytes())
+    return path
+
+
+def names(source):
+    return {key: name for key, name, read in source}
+
+
+def test_name_from_path_follows_both_documented_layouts():
+    assert _name_from_path('people/Ann_Lee/front.jpg') == 'Ann_Lee'
+    assert _name_from_path('people/Ann_Lee.jpg') == 'Ann_Lee'
+
+
+def test_name_from_path_without_a_root_folder():
+    assert _name_from_path('Ann_Lee/front.jpg', 0) == 'Ann_Lee'
+    assert _name_from_path('Ann_Lee.jpg', 0) == 'Ann_Lee'
+    assert _name_from_path('Ann_Lee.jpg') == 'Ann_Lee'
+
+
+def test_zip_with_a_file_per_person_in_a_roster_folder(tmp_path):
+    archive = make_zip(tmp_path / 'roster.zip', ['people/Ann_Lee.jpg', 'people/Bob.png'])
+    assert names(zip_source(str(archive))) == {'people/Ann_Lee.jpg': 'Ann_Lee', 'people/Bob.png': 'Bob'}
+
+
+def test_zip_with_a_folder_per_person_in_a_roster_folder(tmp_path):
+    archive = make_zip(tmp_path / 'roster.zip', ['people/Ann_Lee/front.jpg', 'people/Bob/left.jpg'])
+    assert set(names(zip_source(str(archive))).values()) == {'Ann_Lee', 'Bob'}
+
+
+def test_zip_with_person_folders_at_the_root(tmp_path):
+    archive = make_zip(tmp_path / 'roster.zip', ['Ann_Lee/front.jpg', 'Bob/front.jpg', 'Cy.jpg'])
+    assert names(zip_source(str(archive))) == {'Ann_Lee/front.jpg': 'Ann_Lee', 'Bob/front.jpg': 'Bob',
+                                               'Cy.jpg': 'Cy'}
+
+
+def test_directory_source_uses_the_folder_per_person(tmp_path):
+    (tmp_path / 'Ann_Lee').mkdir()
+    (tmp_path / 'Ann_Lee' / 'front.jpg').write_bytes(jpeg_bytes())
+    (tmp_path / 'Bob.jpg').write_bytes(jpeg_bytes())
+    assert set(names(directory_source(str(tmp_path))).values()) == {'Ann_Lee', 'Bob'}
+
+
+def test_bulk_enroll_indexes_every_image_and_resumes_from_the_checkpoint(fake_client, tmp_path):
+    archive = make_zip(tmp_path / 'roster.zip', ['people/Dee.jpg', 'people/Eve/front.jpg', 'people/Eve/left.jpg'])
+    checkpoint = str(tmp_path / 'checkpoint.jsonl')
+    report, stats = bulk_enroll(zip_source(str(archive)), 'classroom', checkpoint, workers=2)
+    assert stats['indexed'] == 3 and stats['failed'] == 0
+    assert {entry['name']: entry['indexed'] for entry in report} == {'Dee': 1, 'Eve': 2}
+    assert sorted(fake_client.collections['classroom'].values()).count('Eve') == 2
+
+    report, stats = bulk_enroll(zip_source(str(archive)), 'classroom', checkpoint, workers=2)
+    assert stats['skipped'] == 3
+    assert fake_client.calls['index_faces'] == 3
+
+
+def test_bulk_enroll_reports_failures_without_retrying_them_itself(fake_client, tmp_path):
+    archive = make_zip(tmp_path / 'roster.zip', ['people/Dee.jpg'])
+    report, stats = bulk_enroll(zip_source(str(archive)), 'missing_collection', workers=1)
+    assert stats['failed'] == 1
+    assert report[0]['errors'][0].startswith('people/Dee.jpg: ResourceNotFoundException')
+    assert fake_client.calls['index_faces'] == 1
+
+
+def test_connection_errors_are_checkpointed_as_failures(fake_client, tmp_path, monkeypatch):
+    archive = make_zip(tmp_path / 'roster.zip', [f'people/P{i}.jpg' for i in range(4)])
+    checkpoint = str(tmp_path / 'checkpoint.jsonl')
+    index_faces = fake_client.index_faces
+
+    def flaky_index_faces(**kwargs):
+        if kwargs['ExternalImageId'] == 'P1':
+            raise EndpointConnectionError(endpoint_url='https://rekognition.example')
+        return index_faces(**kwargs)
+
+    monkeypatch.setattr(fake_client, 'index_faces', flaky_index_faces)
+    report, stats = bulk_enroll(zip_source(str(archive)), 'classroom', checkpoint, workers=4)
+    assert stats['indexed'] == 3 and stats['failed'] == 1
+    assert report[1]['errors'][0].startswith('people/P1.jpg: EndpointConnectionError')
+    with open(checkpoint) as f:
+        assert len(f.readlines()) == 4
+
+    monkeypatch.setattr(fake_client, 'index_faces', index_faces)
+    report, stats = bulk_enroll(zip_source(str(archive)), 'classroom', checkpoint, workers=4)
+    assert stats['skipped'] == 3 and stats['indexed'] == 1
+    assert sorted(fake_client.collections['classroom'].values()).count('P0') == 1
+
+
+@pytest.mark.parametrize('name', ['../../x', 'a/b', '', '..', 'has space'])
+def test_start_job_rejects_collection_names_that_are_not_ids(tmp_path, name):
+    archive = make_zip(tmp_path / 'roster.zip', ['people/Dee.jpg'])
+    with pytest.raises(ValueError):
+        start_job(str(archive), name)
+
+
+def test_start_job_enrolls_from_disk_and_removes_the_archive(fake_client, tmp_path, monkeypatch):
+    monkeypatch.setattr(Bulk_Register, 'CHECKPOINT_DIR', str(tmp_path / 'checkpoints'))
+    archive = make_zip(tmp_path / 'roster.zip', ['people/Dee.jpg', 'people/Eve.jpg'])
+    job_id = start_job(str(archive), 'classroom')
+    deadline = time.monotonic() + 5
+    while get_job(job_id)['status'] == 'running' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    job = get_job(job_id)
+    assert job['status'] == 'done'
+    assert [entry['name'] for entry in job['report']] == ['Dee', 'Eve']
+    assert not os.path.exists(archive)
+    checkpoints = os.listdir(tmp_path / 'checkpoints')
+    assert len(checkpoints) == 1 and checkpoints[0].startswith('classroom_')
+    with open(tmp_path / 'checkpoints' / checkpoints[0]) as f:
+        assert len([json.loads(line) for line in f]) == 2
+
+
+def test_bulk_register_route_rejects_bad_collection_names(tmp_path):
+    import app
+    archive = make_zip(tmp_path / 'roster.zip', ['people/Dee.jpg'])
+    with open(archive, 'rb') as f:
+        response = app.app.test_client().post('/bulk_register', data={'collection': '../../x', 'file': (f, 'r.zip')},
+                                              content_type='multipart/form-data')
+    assert response.status_code == 400
@@ -0,0 +1,84 @@
+import time
+import threading
+
+import pytest
+from botocore.exceptions import EndpointConnectionError
+
+import Create_Collection
+from Create_Collection import CollectionRegistry
+
+
+class SlowFetch:
+    """fetch_collections stand-in that blocks until released and counts its calls"""
+
+    def __init__(self, collections):
+        self.collections = collections
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        assert self.release.wait(5)
+        return list(self.collections)
+
+
+@pytest.fixture
+def slow_fetch(monkeypatch):
+    fetch = SlowFetch(['classroom', 'office'])
+    monkeypatch.setattr(Create_Collection, 'fetch_collections', fetch)
+    yield fetch
+    fetch.release.set()
+
+
+def test_lists_every_page_of_the_fake_backend(fake_client):
+    assert CollectionRegistry().collections() == ['classroom']
+
+
+def test_first_fetch_is_shared_by_concurrent_callers(slow_fetch):
+    registry = CollectionRegistry()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.collections())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    assert slow_fetch.started.wait(5)
+    slow_fetch.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert slow_fetch.calls == 1
+    assert results == [['classroom', 'office']] * 8
+
+
+def test_a_fetch_in_flight_does_not_undo_create_and_delete(slow_fetch):
+    registry = CollectionRegistry()
+    slow_fetch.release.set()
+    assert registry.collections() == ['classroom', 'office']
+
+    slow_fetch.release.clear()
+    slow_fetch.started.clear()
+    registry.refresh_async()
+    assert slow_fetch.started.wait(5)
+    registry.add('library')
+    registry.remove('office')
+    slow_fetch.release.set()
+    deadline = time.monotonic() + 5
+    while registry._refreshing and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert slow_fetch.calls == 2
+    assert registry.collections() == ['classroom', 'library']
+
+
+def test_connection_errors_keep_the_old_list(monkeypatch):
+    registry = CollectionRegistry()
+
+    def unreachable():
+        raise EndpointConnectionError(endpoint_url='https://rekognition.example')
+
+    monkeypatch.setattr(Create_Collection, 'fetch_collections', unreachable)
+    assert registry.collections() is None
+    monkeypatch.setattr(Create_Collection, 'fetch_collections', lambda: ['classroom'])
+    assert registry.refresh()
+    monkeypatch.setattr(Create_Collection, 'fetch_collections', unreachable)
+    assert not registry.refresh()
+    assert registry.collections() == ['classroom']
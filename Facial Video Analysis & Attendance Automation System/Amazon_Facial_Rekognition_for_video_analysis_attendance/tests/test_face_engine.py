@@ -0,0 +1,55 @@
+import threading
+
+import numpy as np
+from PIL import Image
+
+import Face_Engine
+from Face_recognize import face_recognition_saving_image
+
+
+def box(left, top=0.2, size=0.2):
+    return {'Left': left, 'Top': top, 'Width': size, 'Height': size}
+
+
+def noise_image(width=640, height=480, seed=0):
+    """An image whose face crops all differ, so none is answered from the search cache"""
+    pixels = np.random.default_rng(seed).integers(0, 256, (height, width, 3), np.uint8)
+    return Image.fromarray(pixels)
+
+
+def test_faces_of_one_image_are_searched_concurrently_and_keep_their_order(monkeypatch):
+    started = threading.Barrier(3, timeout=5)
+
+    def search_face(box, image, collection_name):
+        started.wait()  # only returns once all three searches run at the same time
+        return box['Left']
+    monkeypatch.setattr(Face_Engine, 'search_face', search_face)
+    assert Face_Engine.search_faces([box(0.1), box(0.4), box(0.7)], noise_image(), 'classroom') == [0.1, 0.4, 0.7]
+
+
+def test_saving_image_searches_every_face(fake_client):
+    image, descriptions = face_recognition_saving_image(noise_image(), 'classroom')
+    assert len(descriptions) == 3
+    assert fake_client.stats()['calls']['search_faces_by_image'] == 3
+
+
+def test_one_detect_call_per_image_and_only_searchable_faces_are_searched(fake_client, monkeypatch):
+    detect_faces = fake_client.detect_faces
+
+    def with_poor_faces(**kwargs):
+        response = detect_faces(**kwargs)
+        response['FaceDetails'][1]['Confidence'] = 50.0
+        response['FaceDetails'][2]['Pose']['Yaw'] = 80.0
+        return response
+    monkeypatch.setattr(fake_client, 'detect_faces', with_poor_faces)
+    faces = Face_Engine.recognize_faces(noise_image(), 'classroom')
+    assert [bool(name) for _, name in faces] == [True, False, False]
+    calls = fake_client.stats()['calls']
+    assert calls['detect_faces'] == 1 and calls['search_faces_by_image'] == 1
+
+
+def test_is_searchable_applies_the_search_filter():
+    good = {'Confidence': 99.0, 'Quality': {'Sharpness': 80, 'Brightness': 80}, 'Pose': {'Yaw': 10, 'Pitch': 5}}
+    assert Face_Engine.is_searchable(good)
+    assert not Face_Engine.is_searchable(dict(good, Quality={'Sharpness': 2, 'Brightness': 80}))
+    assert not Face_Engine.is_searchable(dict(good, Pose={'Yaw': 10, 'Pitch': 60}))
@@ -0,0 +1,104 @@
+from PIL import Image
+
+from Face_Engine import recognize_faces
+from Face_Tracker import FaceTracker, IDENTITY_TTL, UNKNOWN_TTL, MAX_TRACK_AGE
+
+
+def box(left, top=0.2, size=0.2):
+    return {'Left': left, 'Top': top, 'Width': size, 'Height': size}
+
+
+def searched(tracker, boxes, now, name='Ann_Lee'):
+    """Run one frame through the tracker and return how many of its faces needed a search"""
+    tracks = tracker.update(boxes, now)
+    pending = tracker.pending(tracks, [True] * len(boxes), now)
+    for track in pending:
+        tracker.set_identity(track, name, now)
+    return len(pending)
+
+
+def test_a_still_face_is_searched_again_only_when_its_identity_expires():
+    tracker = FaceTracker()
+    seconds = list(range(0, IDENTITY_TTL + 1, MAX_TRACK_AGE))
+    assert [searched(tracker, [box(0.1)], now) for now in seconds] == [1] + [0] * (len(seconds) - 1)
+    assert searched(tracker, [box(0.11)], IDENTITY_TTL + 1) == 1
+    assert tracker.searches == 2 and tracker.reused == len(seconds) - 1
+
+
+def test_unrecognized_faces_expire_sooner():
+    tracker = FaceTracker()
+    assert searched(tracker, [box(0.1)], 0, 'Not recognized') == 1
+    assert searched(tracker, [box(0.1)], UNKNOWN_TTL + 1, 'Not recognized') == 1
+
+
+def test_a_face_that_moved_is_searched_again():
+    tracker = FaceTracker()
+    positions = [0.1, 0.13, 0.16, 0.19, 0.22, 0.25]  # small steps keep the track, the total shift does not
+    assert [searched(tracker, [box(left)], i) for i, left in enumerate(positions)] == [1, 0, 0, 0, 1, 0]
+    assert len(tracker.tracks) == 1
+
+
+def test_faces_keep_their_own_tracks_and_stale_tracks_are_dropped():
+    tracker = FaceTracker()
+    first = tracker.update([box(0.1), box(0.6)], 0)
+    second = tracker.update([box(0.6), box(0.1)], 1)
+    assert [t.track_id for t in second] == [first[1].track_id, first[0].track_id]
+    tracker.update([box(0.1)], 5)
+    tracker.update([box(0.1)], 2 + MAX_TRACK_AGE)
+    assert [t.track_id for t in tracker.tracks] == [first[0].track_id]
+
+
+def test_recognize_faces_reuses_tracked_names(fake_client):
+    image = Image.new('RGB', (320, 240), 'white')
+    tracker = FaceTracker()
+    first = recognize_faces(image, 'classroom', tracker, now=0)
+    searches = fake_client.stats()['calls']['search_faces_by_image']
+    assert recognize_faces(image, 'classroom', tracker, now=1) == first
+    assert fake_client.stats()['calls']['search_faces_by_image'] == searches
+    assert tracker.reused == len(first)
+
+
+def test_local_false_positives_are_blank_and_not_searched_again(fake_client, monkeypatch):
+    import Face_Engine
+
+    def no_face(**kwargs):
+        raise fake_client.exceptions.InvalidParameterException(
+            'There are no faces in the image. Should be at least 1.', 'SearchFacesByImage')
+    monkeypatch.setattr(fake_client, 'search_faces_by_image', no_face)
+    monkeypatch.setattr(Face_Engine, 'detect_searchable_faces', lambda image: ([box(0.1)], [True]))
+    false_positives = Face_Engine.local_detector.stats()['false_positives']
+    image = Image.new('RGB', (320, 240), 'white')
+    tracker = FaceTracker()
+    assert recognize_faces(image, 'classroom', tracker, now=0) == [(box(0.1), '')]
+    assert recognize_faces(image, 'classroom', tracker, now=1) == [(box(0.1), '')]
+    assert tracker.searches == 1
+    assert Face_Engine.local_detector.stats()['false_positives'] == false_positives + 1
+
+
+def test_pipeline_stats_route_reports_the_local_detector():
+    import app
+    stats = app.app.test_client().get('/pipeline_stats').get_json()
+    assert stats['local_detector']['mode'] == 'off'
+    assert 'false_positives' in stats['local_detector']
+
+
+def test_pipeline_stats_route_reports_search_cache_hits(fake_client):
+    import app
+    from Search_Cache import search_cache
+    image = Image.new('RGB', (320, 240), 'white')
+    hits = search_cache.stats()['hits']
+    recognize_faces(image, 'classroom')
+    recognize_faces(image, 'classroom')
+    stats = app.app.test_client().get('/pipeline_stats').get_json()
+    assert stats['search_cache']['hits'] > hits
+    assert {'misses', 'hit_rate', 'entries'} <= set(stats['search_cache'])
+
+
+def test_pipeline_stats_route_reports_payload_sizes(fake_client):
+    import app
+    from Image_Payload import payload_stats
+    before = payload_stats().get('detect_faces', {'calls': 0, 'bytes': 0})
+    recognize_faces(Image.new('RGB', (1920, 1080), 'white'), 'classroom')
+    payloads = app.app.test_client().get('/pipeline_stats').get_json()['payloads']
+    assert payloads['detect_faces']['calls'] == before['calls'] + 1
+    assert 0 < payloads['detect_faces']['bytes'] - before['bytes'] < 1920 * 1080
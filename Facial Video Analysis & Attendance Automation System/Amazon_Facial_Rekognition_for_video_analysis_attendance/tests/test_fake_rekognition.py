@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from Fake_Rekognition import FakeRekognition, parse_latency, parse_latencies
+
+IMAGE = {'Bytes': b'\xff\xd8 not really a jpeg'}
+
+
+def test_latency_specs():
+    rng = random.Random(0)
+    assert parse_latency('off')(rng) == 0.0
+    assert parse_latency('fixed:250')(rng) == 0.25
+    assert 0.1 <= parse_latency('uniform:100:200')(rng) <= 0.2
+    latencies = parse_latencies('fixed:10;detect_faces=fixed:20')
+    assert latencies['detect_faces'](rng) == 0.02 and latencies['index_faces'](rng) == 0.01
+    with pytest.raises(ValueError):
+        parse_latency('gamma:1')
+
+
+def test_indexed_faces_are_found_and_answers_are_repeatable():
+    client = FakeRekognition('off', fixtures={'match_rate': 1.0})
+    client.create_collection(CollectionId='office')
+    client.index_faces(CollectionId='office', Image=IMAGE, ExternalImageId='Dee')
+    first = client.search_faces_by_image(CollectionId='office', Image=IMAGE)
+    assert first['FaceMatches'][0]['Face']['ExternalImageId'] == 'Dee'
+    assert client.search_faces_by_image(CollectionId='office', Image=IMAGE) == first
+    assert client.stats()['collections'] == {'office': 1}
+
+
+def test_errors_have_the_shape_of_the_real_client():
+    client = FakeRekognition('off', fixtures={'collections': {'classroom': ['Ann_Lee']}})
+    with pytest.raises(client.exceptions.ResourceAlreadyExistsException):
+        client.create_collection(CollectionId='classroom')
+    with pytest.raises(client.exceptions.ResourceNotFoundException):
+        client.search_faces_by_image(CollectionId='office', Image=IMAGE)
+    with pytest.raises(client.exceptions.InvalidParameterException) as error:
+        client.detect_faces(Image={'Bytes': b''})
+    assert error.value.response['Error']['Code'] == 'InvalidParameterException'
+
+
+def test_throttle_rate_fails_calls_with_throttling_exceptions():
+    client = FakeRekognition('off', throttle_rate=1.0)
+    with pytest.raises(client.exceptions.ThrottlingException):
+        client.detect_faces(Image=IMAGE)
+    assert client.stats()['throttled'] == {'detect_faces': 1}
+
+
+def test_collections_are_listed_in_pages():
+    client = FakeRekognition('off', fixtures={'collections': {name: [] for name in 'abc'}})
+    page = client.list_collections(MaxResults=2)
+    assert page['CollectionIds'] == ['a', 'b']
+    assert client.list_collections(MaxResults=2, NextToken=page['NextToken'])['CollectionIds'] == ['c']
@@ -0,0 +1,26 @@
+import numpy as np
+
+from Frame_Draw import draw_faces, encode_frame, BOX_COLOR
+from Image_Payload import face_crop
+from Video_Analysis import recognize_faces_in_frame
+
+
+def test_faces_are_drawn_onto_the_frame_in_place_and_blank_names_are_skipped():
+    frame = np.zeros((240, 320, 3), np.uint8)
+    box = {'Left': 0.25, 'Top': 0.25, 'Width': 0.5, 'Height': 0.5}
+    assert draw_faces(frame, [(box, '')]) is frame and not frame.any()
+    draw_faces(frame, [(box, 'Ann_Lee')])
+    assert tuple(frame[60, 160]) == BOX_COLOR
+    assert encode_frame(frame).startswith(b'\xff\xd8')
+
+
+def test_face_crops_of_frames_are_views():
+    frame = np.zeros((480, 640, 3), np.uint8)
+    crop = face_crop(frame, {'Left': 0.25, 'Top': 0.25, 'Width': 0.5, 'Height': 0.5})
+    assert np.shares_memory(crop, frame)
+
+
+def test_frames_are_recognized_without_conversion(fake_client):
+    frame = np.random.default_rng(0).integers(0, 256, (480, 640, 3), np.uint8)
+    result, names = recognize_faces_in_frame(frame, 'classroom')
+    assert result is frame and len(names) == 3
@@ -0,0 +1,102 @@
+import threading
+
+import cv2
+import numpy as np
+
+from Frame_Pipeline import DropQueue, LivePipeline
+
+
+def test_drop_queue_keeps_the_newest_items():
+    queue = DropQueue(2)
+    for item in range(5):
+        queue.put(item)
+    assert queue.dropped == 3
+    assert [queue.get(0), queue.get(0), queue.get(0)] == [3, 4, None]
+
+
+def test_closing_wakes_a_waiting_consumer():
+    queue = DropQueue(1)
+    results = []
+    consumer = threading.Thread(target=lambda: results.append(queue.get()))
+    consumer.start()
+    queue.close()
+    consumer.join(5)
+    assert not consumer.is_alive() and results == [None]
+
+
+def test_live_pipeline_streams_a_video_until_it_ends(fake_client, tmp_path):
+    path = str(tmp_path / 'feed.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+    for i in range(10):
+        writer.write(np.full((48, 64, 3), i * 20, np.uint8))
+    writer.release()
+
+    pipeline = LivePipeline('classroom', source=path)
+    parts = list(pipeline.start().frames())
+    # a camera faster than the encoder loses its oldest frames, never blocks
+    assert parts and len(parts) + pipeline.encoder_frames.dropped == pipeline.capture.frames_read == 10
+    assert all(part.startswith(b'--frame\r\nContent-Type: image/jpeg\r\n\r\n\xff\xd8') for part in parts)
+    assert not pipeline.capture.is_alive() and not pipeline.worker.is_alive()
+
+
+def test_camera_hub_reports_the_motion_gate_of_each_channel(fake_client, tmp_path, monkeypatch):
+    import app
+    import Camera_Hub
+    path = str(tmp_path / 'feed.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+    for i in range(10):
+        writer.write(np.full((48, 64, 3), 100, np.uint8))
+    writer.release()
+
+    subscribed = threading.Event()
+
+    class HeldCapture(Camera_Hub.CaptureThread):
+        def run(self):
+            subscribed.wait(5)  # a short file could otherwise end before the channel subscribes
+            super().run()
+    monkeypatch.setattr(Camera_Hub, 'CaptureThread', HeldCapture)
+    hub = Camera_Hub.CameraHub(path)
+    monkeypatch.setattr(app, 'camera_hub', hub)
+    try:
+        channel, queue = hub.subscribe('classroom')
+        subscribed.set()
+        for _ in iter(queue.get, None):
+            pass
+        channel.pipeline.worker.join(5)
+        gate = app.app.test_client().get('/pipeline_stats').get_json()['video_feed']['channels'][0]['motion_gate']
+        assert gate == channel.pipeline.worker.gate.stats()
+        assert gate['frames_seen'] > 0 and gate['frames_processed'] + gate['frames_gated'] == gate['frames_seen']
+    finally:
+        hub.close()
+
+
+def test_camera_hub_shares_one_camera_and_closes_it_once_idle(fake_client, tmp_path, monkeypatch):
+    import Camera_Hub
+    path = str(tmp_path / 'feed.avi')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+    writer.write(np.zeros((48, 64, 3), np.uint8))
+    writer.release()
+
+    class IdleCamera(Camera_Hub.CaptureThread):
+        def run(self):
+            self._stop_event.wait()  # a camera that stays open until it is stopped
+            super().run()
+    monkeypatch.setattr(Camera_Hub, 'CaptureThread', IdleCamera)
+    hub = Camera_Hub.CameraHub(path, idle_timeout=0)
+    try:
+        classroom, first = hub.subscribe('classroom')
+        same, second = hub.subscribe('classroom')
+        office, third = hub.subscribe('office')
+        assert same is classroom and office is not classroom and len(classroom.subscribers) == 2
+        assert classroom.pipeline.capture is office.pipeline.capture is hub.capture
+        camera = hub.capture
+
+        classroom.remove(first)
+        office.remove(third)
+        hub.close_idle()
+        assert list(hub.channels) == ['classroom'] and camera.is_alive()
+        classroom.remove(second)
+        hub.close_idle()
+        assert hub.channels == {} and hub.capture is None and not camera.is_alive()
+    finally:
+        hub.close()
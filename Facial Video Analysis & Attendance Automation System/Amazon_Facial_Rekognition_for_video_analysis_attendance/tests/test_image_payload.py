@@ -0,0 +1,37 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from Image_Payload import encode_jpeg, image_request, payload_stats, face_crop, MIN_CROP_SIDE
+
+
+def decoded(payload):
+    image = Image.open(io.BytesIO(payload))
+    return image.format, image.size
+
+
+def test_pil_images_are_downscaled_to_jpeg():
+    assert decoded(encode_jpeg(Image.new('RGBA', (2560, 1440)), max_side=1280)) == ('JPEG', (1280, 720))
+    assert decoded(encode_jpeg(Image.new('RGB', (640, 480)), max_side=1280)) == ('JPEG', (640, 480))
+
+
+def test_numpy_frames_are_downscaled_to_jpeg():
+    frame = np.zeros((1080, 1920, 3), np.uint8)
+    assert decoded(encode_jpeg(frame, max_side=960)) == ('JPEG', (960, 540))
+
+
+def test_image_request_accounts_for_its_payload():
+    before = payload_stats().get('test_operation', {'calls': 0, 'bytes': 0})
+    request = image_request(Image.new('RGB', (320, 240)), 'test_operation')
+    after = payload_stats()['test_operation']
+    assert after['calls'] == before['calls'] + 1
+    assert after['bytes'] - before['bytes'] == len(request['Bytes'])
+
+
+def test_small_face_crops_are_upscaled_to_the_minimum_size():
+    image = Image.new('RGB', (640, 480))
+    crop = face_crop(image, {'Left': 0.5, 'Top': 0.5, 'Width': 0.05, 'Height': 0.05})
+    assert min(crop.size) == MIN_CROP_SIDE
+    crop = face_crop(image, {'Left': 0.25, 'Top': 0.25, 'Width': 0.5, 'Height': 0.5}, margin=0)
+    assert crop.size == (320, 240)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+import Face_Engine
+from Local_Detector import LocalDetector
+
+
+def blank_frame():
+    return np.full((480, 640, 3), 128, np.uint8)
+
+
+def detector(monkeypatch, mode, faces=()):
+    """A LocalDetector installed in Face_Engine that finds faces, given in pixels at 640 px wide"""
+    local = LocalDetector(mode)
+    monkeypatch.setattr(local, '_detect_haar', lambda frame: list(faces))
+    monkeypatch.setattr(Face_Engine, 'local_detector', local)
+    return local
+
+
+def test_unknown_modes_are_rejected():
+    with pytest.raises(ValueError):
+        LocalDetector('always')
+
+
+def test_the_haar_cascade_finds_nothing_in_a_blank_frame():
+    local = LocalDetector('gate')
+    assert local.detect(blank_frame()) == []
+    assert local.stats()['frames_without_faces'] == 1
+
+
+def test_gate_mode_skips_detect_faces_without_candidates(fake_client, monkeypatch):
+    local = detector(monkeypatch, 'gate')
+    assert Face_Engine.recognize_faces(blank_frame(), 'classroom') == []
+    assert 'detect_faces' not in fake_client.stats()['calls']
+    assert local.stats()['detect_calls_skipped'] == 1
+
+
+def test_gate_mode_still_calls_detect_faces_with_candidates(fake_client, monkeypatch):
+    detector(monkeypatch, 'gate', [(64, 48, 128, 128)])
+    assert len(Face_Engine.recognize_faces(blank_frame(), 'classroom')) == 3
+    assert fake_client.stats()['calls']['detect_faces'] == 1
+
+
+def test_local_mode_searches_the_local_boxes(fake_client, monkeypatch):
+    local = detector(monkeypatch, 'local', [(64, 48, 128, 96)])
+    faces = Face_Engine.recognize_faces(blank_frame(), 'classroom')
+    assert [box for box, _ in faces] == [{'Left': 0.1, 'Top': 0.1, 'Width': 0.2, 'Height': 0.2}]
+    calls = fake_client.stats()['calls']
+    assert 'detect_faces' not in calls and calls['search_faces_by_image'] == 1
+    assert local.stats()['detect_calls_skipped'] == 1
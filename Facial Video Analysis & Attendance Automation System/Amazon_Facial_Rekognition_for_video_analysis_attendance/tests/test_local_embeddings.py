@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import Face_Engine
+import Local_Embeddings
+from Local_Embeddings import EmbeddingIndex, LocalMatcher, INITIAL_CAPACITY, EMBEDDING_SIZE
+from Search_Cache import search_cache
+
+
+def unit(seed):
+    vector = np.random.default_rng(seed).normal(size=EMBEDDING_SIZE).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class StubMatcher(LocalMatcher):
+    """LocalMatcher whose 'images' are the seeds of their embeddings, as the ONNX models are not shipped"""
+
+    def __init__(self, directory, **kwargs):
+        super().__init__(True, 'sface.onnx', 'yunet.onnx', directory=str(directory), **kwargs)
+
+    def embed(self, image):
+        return unit(image) if isinstance(image, int) else unit(0)
+
+
+def test_index_grows_its_buffer_without_copying_per_face(tmp_path):
+    index = EmbeddingIndex(str(tmp_path / 'classroom.npz'))
+    buffers = set()
+    for i in range(INITIAL_CAPACITY * 2 + 1):
+        index.add(f'p{i}', unit(i))
+        buffers.add(id(index._rows))
+    assert len(buffers) == 3
+    assert index.best(unit(70)) == ('p70', pytest.approx(1.0))
+    index.save()
+    loaded = EmbeddingIndex(index.path)
+    assert loaded.names == index.names and np.array_equal(loaded.matrix, index.matrix)
+
+
+def test_enrollments_are_saved_together_after_a_delay(tmp_path, monkeypatch):
+    writes = []
+    write_index = Local_Embeddings.write_index
+    monkeypatch.setattr(Local_Embeddings, 'write_index', lambda *args: writes.append(args[0]) or write_index(*args))
+    matcher = StubMatcher(tmp_path, save_delay=60)
+    for i in range(20):
+        assert matcher.enroll(i, f'p{i}', 'classroom')
+    assert writes == []
+    matcher.flush()
+    assert writes == [str(tmp_path / 'classroom.npz')]
+    assert len(EmbeddingIndex(writes[0])) == 20
+    matcher.flush()
+    assert len(writes) == 1
+
+
+def test_index_is_reloaded_when_another_process_rewrites_it(tmp_path):
+    reader = StubMatcher(tmp_path)
+    writer = StubMatcher(tmp_path)
+    writer.enroll(1, 'Ann_Lee', 'classroom')
+    writer.flush()
+    assert reader.match(1, 'classroom') == ('Ann_Lee', pytest.approx(100.0))
+    writer.enroll(2, 'Bob', 'classroom')
+    writer.flush()
+    path = tmp_path / 'classroom.npz'
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))  # coarse file system clocks
+    assert reader.match(2, 'classroom') == ('Bob', pytest.approx(100.0))
+
+
+def test_drop_forgets_pending_enrollments(tmp_path):
+    matcher = StubMatcher(tmp_path, save_delay=60)
+    matcher.enroll(1, 'Ann_Lee', 'classroom')
+    matcher.drop('classroom')
+    matcher.flush()
+    assert not (tmp_path / 'classroom.npz').exists()
+
+
+def test_local_matches_are_cached_and_counted_against_every_search(fake_client, tmp_path, monkeypatch):
+    matcher = StubMatcher(tmp_path)
+    matcher.enroll(0, 'Ann_Lee', 'classroom')
+    monkeypatch.setattr(Face_Engine, 'local_matcher', matcher)
+    image = Image.new('RGB', (200, 200), 'white')
+    box = {'Left': 0.25, 'Top': 0.25, 'Width': 0.5, 'Height': 0.5}
+    assert Face_Engine.search_face(box, image, 'classroom') == 'Ann_Lee'
+    assert Face_Engine.search_face(box, image, 'classroom') == 'Ann_Lee'
+    stats = matcher.stats()
+    assert stats['searches'] == 2 and stats['lookups'] == 1 and stats['local_matches'] == 1
+    assert stats['calls_avoided_share'] == 0.5
+    assert fake_client.stats()['calls'].get('search_faces_by_image', 0) == 0
+    search_cache.invalidate('classroom')
@@ -0,0 +1,59 @@
+import pytest
+from botocore.exceptions import ReadTimeoutError
+
+import Metrics
+from Fake_Rekognition import FakeRekognition
+
+
+@pytest.fixture
+def metrics():
+    was_enabled = Metrics.enabled
+    Metrics.set_enabled(True)
+    Metrics.reset()
+    yield Metrics
+    Metrics.reset()
+    Metrics.set_enabled(was_enabled)
+
+
+def counter(name, **labels):
+    return Metrics._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+
+def detect(client):
+    return client.detect_faces(Image={'Bytes': b'frame'})
+
+
+def test_only_successful_calls_are_billed(metrics):
+    fake = FakeRekognition('off', throttle_rate=1.0)
+    client = Metrics.InstrumentedClient(fake)
+    for _ in range(3):
+        with pytest.raises(fake.exceptions.ThrottlingException):
+            detect(client)
+    assert counter('api_calls_total', operation='detect_faces') == 3
+    assert counter('api_throttles_total', operation='detect_faces') == 3
+    assert counter('api_estimated_cost_usd_total') == 0
+
+    fake.throttle_rate = 0.0
+    detect(client)
+    assert counter('api_estimated_cost_usd_total') == pytest.approx(Metrics.PRICE_PER_CALL['detect_faces'])
+
+
+def test_free_operations_cost_nothing(metrics):
+    client = Metrics.InstrumentedClient(FakeRekognition('off'))
+    client.list_collections()
+    assert counter('api_calls_total', operation='list_collections') == 1
+    assert counter('api_estimated_cost_usd_total') == 0
+    assert 'api_estimated_cost_usd_total' not in Metrics.render()
+
+
+def test_network_errors_are_counted_by_exception_name(metrics, monkeypatch):
+    fake = FakeRekognition('off')
+
+    def timed_out(**kwargs):
+        raise ReadTimeoutError(endpoint_url='https://rekognition.example')
+
+    monkeypatch.setattr(fake, 'detect_faces', timed_out)
+    with pytest.raises(ReadTimeoutError):
+        detect(Metrics.InstrumentedClient(fake))
+    assert counter('api_errors_total', operation='detect_faces', code='ReadTimeoutError') == 1
+    assert counter('api_estimated_cost_usd_total') == 0
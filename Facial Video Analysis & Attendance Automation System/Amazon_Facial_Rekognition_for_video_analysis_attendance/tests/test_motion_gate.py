@@ -0,0 +1,53 @@
+import numpy as np
+
+from Motion_Gate import MotionGate
+
+
+def frame(square_at=None):
+    """A grey 320x240 frame, with a white square when square_at is an x position"""
+    image = np.full((240, 320, 3), 100, np.uint8)
+    if square_at is not None:
+        image[80:160, square_at:square_at + 80] = 255
+    return image
+
+
+class SlowController:
+    """Rate controller stand-in asking for one frame every interval seconds"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.frames = 0
+
+    def sample_interval(self):
+        return self.interval
+
+    def note_frame(self):
+        self.frames += 1
+
+
+def test_unchanged_frames_are_gated_until_the_max_interval():
+    gate = MotionGate(min_interval=0.2, max_interval=10)
+    assert gate.should_process(frame(), now=0)
+    assert not any(gate.should_process(frame(), now=t) for t in (1, 5, 9.9))
+    assert gate.should_process(frame(), now=10)
+    assert gate.stats()['triggered_by_timeout'] == 1 and gate.stats()['frames_gated'] == 3
+
+
+def test_a_scene_change_is_processed_once_the_min_interval_passed():
+    gate = MotionGate(min_interval=0.2, max_interval=10)
+    assert gate.should_process(frame(), now=0)
+    assert not gate.should_process(frame(40), now=0.1)
+    assert gate.should_process(frame(40), now=0.3)
+    assert gate.last_change >= gate.changed_fraction
+    # compared with the last processed frame, not the last frame seen
+    assert not gate.should_process(frame(40), now=0.6)
+    assert gate.should_process(frame(200), now=0.9)
+
+
+def test_a_slow_controller_stretches_the_min_interval():
+    controller = SlowController(2.0)
+    gate = MotionGate(min_interval=0.2, controller=controller)
+    assert gate.should_process(frame(), now=0)
+    assert not gate.should_process(frame(40), now=1)
+    assert gate.should_process(frame(40), now=2)
+    assert controller.frames == 2
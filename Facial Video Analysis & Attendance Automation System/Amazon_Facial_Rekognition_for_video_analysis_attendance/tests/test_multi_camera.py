@@ -0,0 +1,49 @@
+import time
+import threading
+
+import cv2
+import numpy as np
+
+from Multi_Camera import MultiCamera, parse_sources
+
+
+def write_video(path, frames=20):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+    for i in range(frames):
+        writer.write(np.full((48, 64, 3), (i * 12) % 255, np.uint8))
+    writer.release()
+    return str(path)
+
+
+def test_parse_sources():
+    assert parse_sources('room101=0@class_a; room102=rtsp://cam2/stream@class_b;') == [
+        ('room101', 0, 'class_a'), ('room102', 'rtsp://cam2/stream', 'class_b')]
+
+
+def test_every_source_is_recognized_and_viewers_stop_with_the_camera(fake_client, tmp_path):
+    results = []
+    cameras = MultiCamera([('a', write_video(tmp_path / 'a.avi'), 'classroom'),
+                           ('b', write_video(tmp_path / 'b.avi'), 'classroom')],
+                          workers=2, on_result=lambda collection, faces: results.append(collection))
+    parts = []
+    viewer = threading.Thread(target=lambda: parts.extend(cameras.stream('a')))
+    viewer.start()
+    while len(cameras.sources['a'].capture.subscribers) < 2:   # the scheduler's and the viewer's
+        time.sleep(0.01)
+    cameras.start()
+    try:
+        viewer.join(5)                         # returns once camera a has no more frames
+        assert not viewer.is_alive()
+        deadline = time.monotonic() + 5
+        sources = cameras.sources.values()
+        while time.monotonic() < deadline and any(
+                s.capture.is_alive() or s.busy or not s.frames_recognized for s in sources):
+            time.sleep(0.01)
+    finally:
+        cameras.stop()
+    stats = {entry['name']: entry for entry in cameras.stats()['sources']}
+    assert parts
+    assert stats['a']['frames_read'] == stats['b']['frames_read'] == 20
+    assert stats['a']['frames_recognized'] >= 1 and stats['b']['frames_recognized'] >= 1
+    assert stats['a']['errors'] == stats['b']['errors'] == 0
+    assert len(results) == cameras.dispatched
@@ -0,0 +1,127 @@
+import pytest
+from botocore.exceptions import (ClientError, EndpointConnectionError, ConnectTimeoutError, ReadTimeoutError,
+                                 ConnectionClosedError)
+
+import Rate_Controller
+from Rate_Controller import RateController, RateLimitedClient, DEFAULT_OPERATION_RATE, RECOVERY_STEP
+from Fake_Rekognition import FakeRekognition
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(Rate_Controller, 'BACKOFF_BASE', 0.0)
+
+
+def limited(throttle_rate, retries=2):
+    fake = FakeRekognition('off', throttle_rate, {'collections': {'classroom': ['Ann_Lee']}})
+    controller = RateController(retries=retries)
+    return fake, controller, RateLimitedClient(fake, controller)
+
+
+def test_throttle_halves_the_operation_rate_on_every_attempt():
+    fake, controller, client = limited(throttle_rate=1.0)
+    with pytest.raises(fake.exceptions.ThrottlingException):
+        client.list_collections()
+    assert fake.calls['list_collections'] == 3
+    assert controller.throttles == 3
+    assert controller.buckets['list_collections'].rate == DEFAULT_OPERATION_RATE / 8
+    assert controller.pressure == 8
+
+
+def test_retries_are_bounded_by_throttle_retries():
+    fake, controller, client = limited(throttle_rate=1.0, retries=0)
+    with pytest.raises(fake.exceptions.ThrottlingException):
+        client.list_collections()
+    assert fake.calls['list_collections'] == 1
+
+
+def test_success_recovers_the_rate_additively_up_to_the_maximum():
+    fake, controller, client = limited(throttle_rate=1.0)
+    with pytest.raises(fake.exceptions.ThrottlingException):
+        client.list_collections()
+    bucket = controller.buckets['list_collections']
+    throttled_rate = bucket.rate
+    fake.throttle_rate = 0.0
+    for _ in range(5):
+        client.list_collections()
+    assert bucket.rate == pytest.approx(throttled_rate + 5 * RECOVERY_STEP)
+    assert controller.pressure < 8
+
+    bucket.set_rate(DEFAULT_OPERATION_RATE - RECOVERY_STEP / 2)
+    client.list_collections()
+    client.list_collections()
+    assert bucket.rate == DEFAULT_OPERATION_RATE
+
+
+def test_throttled_attempts_are_retried_until_they_succeed():
+    fake, controller, client = limited(throttle_rate=0.3, retries=10)
+    for _ in range(20):
+        assert client.list_collections()['CollectionIds'] == ['classroom']
+    assert fake.throttled['list_collections'] > 0
+    assert controller.retried == controller.throttles == fake.throttled['list_collections']
+    assert fake.calls['list_collections'] == 20 + controller.retried
+
+
+def test_transient_errors_are_retried_without_slowing_down():
+    controller = RateController()
+    failures = iter([True, False])
+
+    def flaky():
+        if next(failures):
+            raise ClientError({'Error': {'Code': 'ServiceUnavailableException', 'Message': 'busy'}}, 'ListCollections')
+        return {'CollectionIds': []}
+
+    assert controller.call('list_collections', flaky) == {'CollectionIds': []}
+    assert controller.throttles == 0
+    assert controller.retried == 1
+    assert controller.buckets['list_collections'].rate == DEFAULT_OPERATION_RATE
+
+
+@pytest.mark.parametrize('error', [EndpointConnectionError, ConnectTimeoutError, ReadTimeoutError, ConnectionClosedError])
+def test_connection_errors_are_retried_with_backoff(error, monkeypatch):
+    fake, controller, client = limited(throttle_rate=0.0)
+    list_collections = fake.list_collections
+    failures = iter([True, True, False])
+
+    def flaky(**kwargs):
+        if next(failures):
+            raise error(endpoint_url='https://rekognition.example')
+        return list_collections(**kwargs)
+
+    monkeypatch.setattr(fake, 'list_collections', flaky)
+    assert client.list_collections()['CollectionIds'] == ['classroom']
+    assert controller.retried == 2 and controller.throttles == 0
+    failures = iter([True] * 3)
+    with pytest.raises(error):
+        client.list_collections()
+    assert controller.retried == 4
+
+
+def test_other_errors_are_not_retried():
+    fake, controller, client = limited(throttle_rate=0.0)
+    with pytest.raises(fake.exceptions.ResourceNotFoundException):
+        client.search_faces_by_image(CollectionId='missing', Image={'Bytes': b'x'})
+    assert fake.calls['search_faces_by_image'] == 1
+
+
+def test_get_client_disables_botocore_retries(monkeypatch):
+    import AWS_Client
+    seen = {}
+    monkeypatch.setattr(AWS_Client, 'create_client', lambda settings, max_attempts=None: seen.update(
+        max_attempts=max_attempts) or FakeRekognition('off'))
+    AWS_Client.use_client(None)
+    try:
+        client = AWS_Client.get_client()
+    finally:
+        AWS_Client.use_client(None)
+    assert seen['max_attempts'] == 1
+    assert isinstance(client, RateLimitedClient)
+
+
+def test_a_share_of_the_budget_scales_every_ceiling():
+    controller = RateController(calls_per_minute=600, cost_per_hour=3.6, operation_rates={'detect_faces': 20})
+    controller.set_share(0.25)
+    assert controller.calls_bucket.rate == 2.5
+    assert controller.cost_bucket.rate == 0.00025
+    assert controller._bucket('detect_faces').rate == 5
+    assert controller._bucket('list_collections').rate == DEFAULT_OPERATION_RATE / 4
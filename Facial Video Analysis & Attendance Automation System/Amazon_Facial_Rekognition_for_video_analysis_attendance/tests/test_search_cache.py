@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+
+from Search_Cache import SearchCache, phash, hamming, HASH_TOLERANCE
+
+
+def face(eye_y=60, eye_dx=20, mouth_w=20, shade=190, nose=10):
+    """A synthetic face crop; different arguments draw a different face"""
+    img = np.full((160, 128, 3), 60, np.uint8)
+    cv2.ellipse(img, (64, 80), (48, 64), 0, 0, 360, (shade, shade, shade), -1)
+    for side in (-1, 1):
+        cv2.circle(img, (64 + side * eye_dx, eye_y), 8, (30, 30, 30), -1)
+    cv2.line(img, (64, eye_y + 10), (64, eye_y + 10 + nose * 3), (90, 90, 90), 3)
+    cv2.ellipse(img, (64, 120), (mouth_w, 8), 0, 0, 180, (40, 40, 90), 3)
+    return img
+
+
+def test_two_distinct_faces_do_not_collide():
+    cache = SearchCache()
+    ann, bob, cy = face(), face(eye_y=66, eye_dx=24, mouth_w=26, shade=175, nose=12), face(eye_dx=21, shade=185)
+    cache.put('classroom', phash(ann), 'Ann_Lee', 99.0)
+    assert cache.get('classroom', phash(bob)) is None
+    # only a few bits apart, which the old tolerance of 6 returned as Ann_Lee
+    assert HASH_TOLERANCE < hamming(phash(ann), phash(cy)) <= 6
+    assert cache.get('classroom', phash(cy)) is None
+
+
+def test_the_same_crop_hits_and_brightness_changes_do_not_matter():
+    cache = SearchCache()
+    ann = face()
+    cache.put('classroom', phash(ann), 'Ann_Lee', 99.0)
+    assert cache.get('classroom', phash(ann)) == ('Ann_Lee', 99.0)
+    assert cache.get('classroom', phash(cv2.convertScaleAbs(ann, alpha=1.1, beta=10))) == ('Ann_Lee', 99.0)
+    assert cache.stats()['hits'] == 2
+
+
+def test_conflicting_near_entries_are_a_miss():
+    cache = SearchCache(tolerance=2)
+    cache.put('classroom', 0b0000, 'Ann_Lee', 99.0)
+    cache.put('classroom', 0b0011, 'Bob', 99.0)
+    assert cache.get('classroom', 0b0001) is None
+    assert cache.get('classroom', 0b0101) is None
+    assert cache.get('classroom', 0b1100) == ('Ann_Lee', 99.0)
+
+
+def test_entries_expire_and_are_evicted_least_recently_used_first():
+    cache = SearchCache(max_size=2, ttl=10, tolerance=0)
+    cache.put('classroom', 1, 'Ann_Lee', 99.0, now=0)
+    cache.put('classroom', 2, 'Bob', 99.0, now=0)
+    assert cache.get('classroom', 1, now=1) == ('Ann_Lee', 99.0)
+    cache.put('classroom', 3, 'Cy', 99.0, now=1)
+    assert cache.get('classroom', 2, now=1) is None
+    assert cache.get('classroom', 1, now=20) is None
+
+
+def test_invalidate_drops_one_collection():
+    cache = SearchCache(tolerance=0)
+    cache.put('classroom', 1, 'Ann_Lee', 99.0)
+    cache.put('office', 1, 'Bob', 99.0)
+    cache.invalidate('classroom')
+    assert cache.get('classroom', 1) is None
+    assert cache.get('office', 1) == ('Bob', 99.0)
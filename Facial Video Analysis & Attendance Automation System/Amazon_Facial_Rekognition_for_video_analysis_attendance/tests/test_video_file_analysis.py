@@ -0,0 +1,101 @@
+import os
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import Face_Engine
+import Video_File_Analysis
+from Video_File_Analysis import analyze_chunk, build_timeline, plan_chunks, check_sample_fps
+from Face_Tracker import IDENTITY_TTL
+
+
+def write_video(path, frames, fps):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), fps, (64, 48))
+    for _ in range(frames):
+        writer.write(np.full((48, 64, 3), 128, np.uint8))
+    writer.release()
+    return str(path)
+
+
+def test_plan_chunks_covers_every_frame():
+    assert plan_chunks(250, 25, chunk_seconds=4) == [(0, 100), (100, 200), (200, 250)]
+
+
+def test_build_timeline_counts_one_interval_per_sighting():
+    timeline = build_timeline([(0.0, ['Ann_Lee']), (1.0, ['Ann_Lee', 'Bob']), (2.0, ['Bob'])], 1.0)
+    assert timeline == [{'name': 'Ann_Lee', 'first_seen': 0.0, 'last_seen': 1.0, 'seconds_present': 2.0},
+                        {'name': 'Bob', 'first_seen': 1.0, 'last_seen': 2.0, 'seconds_present': 2.0}]
+
+
+@pytest.mark.parametrize('value', ['0', '-1', 'abc', 'nan', 'inf'])
+def test_invalid_sample_fps_is_rejected(value):
+    with pytest.raises(ValueError):
+        check_sample_fps(value)
+
+
+def test_tracks_age_by_video_time_not_decode_speed(fake_client, tmp_path, monkeypatch):
+    searched = []
+
+    def search_faces(boxes, image, collection_name):
+        searched.extend(boxes)
+        return ['Ann_Lee'] * len(boxes)
+
+    monkeypatch.setattr(Face_Engine, 'search_faces', search_faces)
+    seconds = IDENTITY_TTL + 10
+    path = write_video(tmp_path / 'lecture.avi', seconds, fps=1)
+    sightings, frames = analyze_chunk(path, 'classroom', 0, seconds, 1, 1.0)
+    assert frames == seconds
+    # three faces searched on the first frame and again once their identity expired in video time
+    assert len(searched) == 6
+    assert all(names == ['Ann_Lee'] for _, names in sightings)
+
+
+def test_analyze_video_route_validates_sample_fps_and_names_uploads_uniquely(tmp_path, monkeypatch):
+    import app
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'static' / 'uploads').mkdir(parents=True)
+    saved = []
+    monkeypatch.setattr(Video_File_Analysis, 'start_job', lambda path, collection, fps: saved.append(path) or 'job')
+    client = app.app.test_client()
+    video = write_video(tmp_path / 'lecture.avi', 2, fps=1)
+
+    def post(sample_fps):
+        with open(video, 'rb') as f:
+            return client.post('/analyze_video', data={'collection': 'classroom', 'sample_fps': sample_fps,
+                                                       'file': (f, 'lecture.avi')},
+                               content_type='multipart/form-data')
+
+    assert post('abc').status_code == 400
+    assert post('0').status_code == 400
+    assert post('1').status_code == 202
+    assert post('1').status_code == 202
+    assert len(set(saved)) == 2
+    assert all(path.endswith('_lecture.avi') for path in saved)
+
+
+def wait_for_job(job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while Video_File_Analysis.get_job(job_id)['status'] == 'running' and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return Video_File_Analysis.get_job(job_id)
+
+
+def test_analyze_video_runs_after_the_face_search_pool_was_used(fake_client, tmp_path):
+    # a forked worker would inherit this pool's idle count and never start a search thread
+    list(Face_Engine.face_search_pool.map(time.sleep, [0.05] * 8))
+    path = write_video(tmp_path / 'lecture.avi', 6, fps=2)
+    job = wait_for_job(Video_File_Analysis.start_job(path, 'classroom', sample_fps=2, remove_video=False), timeout=30)
+    assert job['status'] == 'done', job['error']
+    assert job['progress']['frames_read'] == 6 and job['progress']['frames_sampled'] == 6
+
+
+def test_uploaded_video_is_deleted_when_the_job_ends(fake_client, tmp_path):
+    path = write_video(tmp_path / 'lecture.avi', 2, fps=1)
+    assert wait_for_job(Video_File_Analysis.start_job(path, 'classroom'))['status'] == 'done'
+    assert not os.path.exists(path)
+    missing = str(tmp_path / 'missing.avi')
+    open(missing, 'wb').close()
+    assert wait_for_job(Video_File_Analysis.start_job(missing, 'classroom'))['status'] == 'failed'
+    assert not os.path.exists(missing)